@@ -0,0 +1,83 @@
+from datetime import datetime
+
+
+# ==================== REGISTRO DE ALTERAÇÕES ====================
+# Triggers (migração 8) registram em etiquetas_alteracoes cada criação,
+# edição, exclusão e reativação, e mantêm etiquetas.atualizado_em. O id
+# do registro é crescente: serve de cursor para o feed e de ponto de
+# retomada para "imprimir alterações", sem a ambiguidade de timestamps
+# com resolução de segundos.
+
+# Etiquetas ativas com alguma alteração registrada depois do cursor
+SQL_ALTERADAS = '''SELECT * FROM etiquetas
+                   WHERE ativo = 1 AND user_id = ? AND id IN (
+                       SELECT etiqueta_id FROM etiquetas_alteracoes
+                       WHERE user_id = ? AND {condicao}
+                   )'''
+
+
+def validar_momento(texto):
+    """Normaliza 'AAAA-MM-DD[ HH:MM[:SS]]' (UTC, como CURRENT_TIMESTAMP); ValueError se inválido"""
+    try:
+        momento = datetime.fromisoformat(texto.strip())
+    except ValueError:
+        raise ValueError(f'Data inválida: {texto} (use AAAA-MM-DD ou AAAA-MM-DD HH:MM)')
+    return momento.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def ultima_alteracao(conn, user_id):
+    """Id do registro mais recente do usuário (0 se nenhum)"""
+    return conn.execute(
+        'SELECT COALESCE(MAX(id), 0) FROM etiquetas_alteracoes WHERE user_id = ?',
+        (user_id,)
+    ).fetchone()[0]
+
+
+def ponto_atual(conn, user_id):
+    """Último registro já impresso pelo usuário (0 se nunca imprimiu alterações)"""
+    linha = conn.execute(
+        'SELECT alteracao_id FROM pontos_alteracoes WHERE user_id = ?',
+        (user_id,)
+    ).fetchone()
+    return linha['alteracao_id'] if linha else 0
+
+
+def registrar_ponto(conn, user_id, alteracao_id):
+    conn.execute(
+        '''INSERT INTO pontos_alteracoes (user_id, alteracao_id) VALUES (?, ?)
+           ON CONFLICT (user_id) DO UPDATE SET
+               alteracao_id = MAX(alteracao_id, excluded.alteracao_id),
+               registrado_em = CURRENT_TIMESTAMP''',
+        (user_id, alteracao_id)
+    )
+    conn.commit()
+
+
+def consulta_alteradas(user_id, apos=0, desde=None):
+    """(sql, parametros) das etiquetas alteradas depois do registro `apos`
+    ou, se `desde` for informado, a partir desse momento (inclusive).
+
+    O SQL fica sem ORDER BY, como o de consulta_filtrada.
+    """
+    if desde:
+        return SQL_ALTERADAS.format(condicao='alterada_em >= ?'), (user_id, user_id, validar_momento(desde))
+    return SQL_ALTERADAS.format(condicao='id > ?'), (user_id, user_id, apos)
+
+
+def listar(conn, user_id, apos=0, limite=100):
+    """Página do feed: registros do usuário depois do id `apos`, em ordem"""
+    return conn.execute(
+        '''SELECT id, etiqueta_id, operacao, alterada_em FROM etiquetas_alteracoes
+           WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?''',
+        (user_id, apos, limite)
+    ).fetchall()
+
+
+def avancar_ao_final(partes, conn, user_id, alteracao_id):
+    """Repassa as partes do arquivo e só registra o ponto quando todas saíram.
+
+    Um download interrompido não avança o ponto: as mesmas alterações
+    entram na próxima impressão.
+    """
+    yield from partes
+    registrar_ponto(conn, user_id, alteracao_id)
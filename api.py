@@ -0,0 +1,309 @@
+import hashlib
+import json
+import os
+import secrets
+import sqlite3
+
+from flask import Blueprint, Response, g, jsonify, request, stream_with_context
+
+import alteracoes
+import exportacao_dados
+import importacao
+from banco import get_db_connection
+from busca import consulta_filtrada, ORDEM_RELEVANCIA
+from layout_pdf import gerar_pdf_incremental, invalidar_etiqueta, FOLHAS, FOLHA_PADRAO
+from paginacao import paginar, limite_pagina
+
+
+# ==================== CONFIGURAÇÕES ====================
+
+# Itens aceitos por requisição nas operações em lote
+API_LOTE_MAX = int(os.environ.get('API_LOTE_MAX', 1000))
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+# ==================== TOKENS ====================
+# Autenticação por "Authorization: Bearer <token>" em vez do cookie de
+# sessão. Tokens são criados pelo comando `flask --app app criar-token`.
+
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def criar_token(conn, user_id, descricao=None):
+    """Gera um token para o usuário e retorna o valor em claro (única vez)"""
+    token = secrets.token_urlsafe(32)
+    conn.execute(
+        'INSERT INTO api_tokens (user_id, token_hash, descricao) VALUES (?, ?, ?)',
+        (user_id, hash_token(token), descricao)
+    )
+    conn.commit()
+    return token
+
+
+def revogar_token(conn, token_id):
+    cursor = conn.execute(
+        'UPDATE api_tokens SET revogado_em = CURRENT_TIMESTAMP WHERE id = ? AND revogado_em IS NULL',
+        (token_id,)
+    )
+    conn.commit()
+    return cursor.rowcount
+
+
+class ErroApi(Exception):
+    def __init__(self, status, mensagem, detalhes=None):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+        self.detalhes = detalhes
+
+
+@api.errorhandler(ErroApi)
+def responder_erro(erro):
+    corpo = {'erro': erro.mensagem}
+    if erro.detalhes:
+        corpo['detalhes'] = erro.detalhes
+    return jsonify(corpo), erro.status
+
+
+@api.before_request
+def autenticar():
+    tipo, _, token = request.headers.get('Authorization', '').partition(' ')
+    if tipo.lower() != 'bearer' or not token:
+        raise ErroApi(401, 'Token ausente: use o cabeçalho Authorization: Bearer <token>')
+
+    linha = get_db_connection().execute(
+        'SELECT user_id FROM api_tokens WHERE token_hash = ? AND revogado_em IS NULL',
+        (hash_token(token.strip()),)
+    ).fetchone()
+    if linha is None:
+        raise ErroApi(401, 'Token inválido ou revogado')
+    g.api_user_id = linha['user_id']
+
+
+# ==================== AUXILIARES ====================
+
+def _compacta(etiqueta):
+    return {coluna: etiqueta[coluna] for coluna in exportacao_dados.COLUNAS}
+
+
+def _corpo():
+    corpo = request.get_json(silent=True)
+    if not isinstance(corpo, dict):
+        raise ErroApi(400, 'Corpo da requisição deve ser um objeto JSON')
+    return corpo
+
+
+def _lote(corpo, chave):
+    """Lista `chave` do corpo, validada quanto a presença e tamanho"""
+    itens = corpo.get(chave)
+    if not isinstance(itens, list) or not itens:
+        raise ErroApi(400, f'Envie "{chave}" com uma lista de ao menos um item')
+    if len(itens) > API_LOTE_MAX:
+        raise ErroApi(413, f'Lote maior que o limite de {API_LOTE_MAX} itens')
+    return itens
+
+
+def _ids(valores):
+    if not all(isinstance(valor, int) and not isinstance(valor, bool) for valor in valores):
+        raise ErroApi(400, 'Os ids devem ser números inteiros')
+    if len(set(valores)) != len(valores):
+        raise ErroApi(400, 'Há ids repetidos no lote')
+    return valores
+
+
+def _por_ids(conn, ids):
+    """Etiquetas ativas do usuário com os ids pedidos, em uma única consulta"""
+    linhas = conn.execute(
+        '''SELECT * FROM etiquetas
+           WHERE ativo = 1 AND user_id = ? AND id IN (SELECT value FROM json_each(?))''',
+        (g.api_user_id, json.dumps(ids))
+    ).fetchall()
+    return {linha['id']: linha for linha in linhas}
+
+
+def _ids_por_codigo(conn, codigos):
+    return dict(conn.execute(
+        'SELECT codigo, id FROM etiquetas WHERE codigo IN (SELECT value FROM json_each(?))',
+        (json.dumps(codigos),)
+    ).fetchall())
+
+
+# ==================== ETIQUETAS ====================
+# Cada lote é uma transação: ou todos os itens são gravados, ou nenhum, e
+# a resposta de erro aponta o índice de cada item problemático.
+
+@api.get('/etiquetas')
+def listar():
+    """Lista paginada por cursor, com os filtros da busca (q, categoria, desde, ate)"""
+    try:
+        sql, parametros, ordem = consulta_filtrada(
+            g.api_user_id, request.args.get('q'), request.args.get('categoria'),
+            request.args.get('desde'), request.args.get('ate')
+        )
+    except ValueError as e:
+        raise ErroApi(400, str(e))
+
+    pagina = paginar(
+        get_db_connection(), sql, parametros,
+        cursor=request.args.get('cursor'),
+        direcao=request.args.get('direcao', 'proxima'),
+        limite=limite_pagina(request.args.get('limite')),
+        ordem=ordem,
+        decrescente=ordem != ORDEM_RELEVANCIA
+    )
+    return jsonify(
+        etiquetas=[_compacta(etiqueta) for etiqueta in pagina['etiquetas']],
+        proximo=pagina['proximo'],
+        anterior=pagina['anterior']
+    )
+
+
+@api.get('/etiquetas/<int:id>')
+def obter(id):
+    etiqueta = _por_ids(get_db_connection(), [id]).get(id)
+    if etiqueta is None:
+        raise ErroApi(404, 'Etiqueta não encontrada')
+    return jsonify(_compacta(etiqueta))
+
+
+@api.post('/etiquetas')
+def criar_lote():
+    """Cria as etiquetas de {"etiquetas": [...]}; retorna os ids na mesma ordem"""
+    itens = _lote(_corpo(), 'etiquetas')
+
+    valores, detalhes = [], []
+    for indice, item in enumerate(itens):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError('Item deve ser um objeto')
+            valores.append(importacao.validar_linha(item) + (g.api_user_id,))
+        except ValueError as e:
+            detalhes.append({'indice': indice, 'erro': str(e)})
+
+    codigos = [linha[2] for linha in valores]
+    if not detalhes:
+        vistos = set()
+        for indice, codigo in enumerate(codigos):
+            if codigo in vistos:
+                detalhes.append({'indice': indice, 'erro': 'Código repetido no lote'})
+            vistos.add(codigo)
+    if detalhes:
+        raise ErroApi(422, 'Lote inválido: nenhuma etiqueta foi criada', detalhes)
+
+    conn = get_db_connection()
+    try:
+        conn.executemany(importacao.SQL_INSERIR, valores)
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        existentes = _ids_por_codigo(conn, codigos)
+        raise ErroApi(409, 'Códigos já existem: nenhuma etiqueta foi criada', [
+            {'indice': indice, 'erro': 'Código já existe!'}
+            for indice, codigo in enumerate(codigos) if codigo in existentes
+        ])
+
+    ids = _ids_por_codigo(conn, codigos)
+    conn.commit()
+    return jsonify(ids=[ids[codigo] for codigo in codigos]), 201
+
+
+@api.patch('/etiquetas')
+def atualizar_lote():
+    """Atualiza parcialmente as etiquetas de {"etiquetas": [{"id": 1, ...}]}"""
+    itens = _lote(_corpo(), 'etiquetas')
+    if not all(isinstance(item, dict) for item in itens):
+        raise ErroApi(400, 'Cada item deve ser um objeto com "id"')
+    ids = _ids([item.get('id') for item in itens])
+
+    conn = get_db_connection()
+    atuais = _por_ids(conn, ids)
+
+    valores, detalhes = [], []
+    for indice, item in enumerate(itens):
+        atual = atuais.get(item['id'])
+        if atual is None:
+            detalhes.append({'indice': indice, 'erro': 'Etiqueta não encontrada'})
+            continue
+        dados = {coluna: item.get(coluna, atual[coluna]) for coluna in importacao.COLUNAS}
+        try:
+            valores.append(importacao.validar_linha(dados) + (item['id'], g.api_user_id))
+        except ValueError as e:
+            detalhes.append({'indice': indice, 'erro': str(e)})
+    if detalhes:
+        raise ErroApi(422, 'Lote inválido: nenhuma etiqueta foi alterada', detalhes)
+
+    try:
+        conn.executemany(
+            '''UPDATE etiquetas
+               SET nome = ?, descricao = ?, codigo = ?, categoria = ?, preco = ?, tamanho = ?, simbologia = ?
+               WHERE id = ? AND user_id = ?''',
+            valores
+        )
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        existentes = _ids_por_codigo(conn, [linha[2] for linha in valores])
+        raise ErroApi(409, 'Códigos já existem: nenhuma etiqueta foi alterada', [
+            {'indice': indice, 'erro': 'Código já existe!'}
+            for indice, linha in enumerate(valores) if existentes.get(linha[2], linha[7]) != linha[7]
+        ])
+    conn.commit()
+
+    for etiqueta in atuais.values():
+        invalidar_etiqueta(etiqueta)
+    return jsonify(atualizadas=len(valores))
+
+
+@api.delete('/etiquetas')
+def remover_lote():
+    """Exclusão lógica das etiquetas de {"ids": [...]}"""
+    ids = _ids(_lote(_corpo(), 'ids'))
+
+    conn = get_db_connection()
+    atuais = _por_ids(conn, ids)
+    conn.execute(
+        '''UPDATE etiquetas SET ativo = 0
+           WHERE ativo = 1 AND user_id = ? AND id IN (SELECT value FROM json_each(?))''',
+        (g.api_user_id, json.dumps(ids))
+    )
+    conn.commit()
+
+    for etiqueta in atuais.values():
+        invalidar_etiqueta(etiqueta)
+    return jsonify(removidas=len(atuais), nao_encontradas=[id for id in ids if id not in atuais])
+
+
+@api.post('/etiquetas/pdf')
+def pdf_lote():
+    """PDF das etiquetas de {"ids": [...], "folha": "a4", "impressao": false}, na ordem pedida"""
+    corpo = _corpo()
+    ids = _ids(_lote(corpo, 'ids'))
+    folha = corpo.get('folha', FOLHA_PADRAO)
+    if folha not in FOLHAS:
+        raise ErroApi(400, f"Folha inválida: use {', '.join(FOLHAS)}")
+
+    atuais = _por_ids(get_db_connection(), ids)
+    faltando = [id for id in ids if id not in atuais]
+    if faltando:
+        raise ErroApi(404, 'Etiquetas não encontradas', faltando)
+
+    return Response(
+        stream_with_context(gerar_pdf_incremental([atuais[id] for id in ids], folha,
+                                                  impressao=bool(corpo.get('impressao')))),
+        mimetype='application/pdf',
+        headers={'Content-Disposition': 'attachment; filename=etiquetas.pdf'}
+    )
+
+
+# ==================== ALTERAÇÕES ====================
+
+@api.get('/alteracoes')
+def feed_alteracoes():
+    """Registros de alteração depois do id `apos`; `proximo` é o próximo `apos`"""
+    apos = request.args.get('apos', 0, type=int)
+    registros = alteracoes.listar(get_db_connection(), g.api_user_id, apos,
+                                  limite_pagina(request.args.get('limite')))
+    return jsonify(
+        alteracoes=[dict(registro) for registro in registros],
+        proximo=registros[-1]['id'] if registros else apos
+    )
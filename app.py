@@ -1,19 +1,42 @@
-from flask import Flask, render_template, request, redirect, url_for, send_file, flash
+from flask import (Flask, render_template, request, redirect, url_for, send_file, flash, jsonify,
+                   Response, stream_with_context)
+import click
+import itertools
+import json
 import sqlite3
 from datetime import datetime
 import os
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import mm
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-import qrcode
+import time
 from io import BytesIO
 
+import banco
+from banco import get_db_connection
+from migracoes import migrar_com_trava, verificar_planos
+from paginacao import paginar, limite_pagina
+from layout_pdf import (renderizar, gerar_pdf_incremental, iterar_lotes, desenhar_etiqueta, iniciar_pagina,
+                        geometria, chave_etiqueta, invalidar_etiqueta, TAMANHOS, FOLHAS, FOLHA_PADRAO)
+from codigo_barras import SIMBOLOGIAS, SIMBOLOGIA_PADRAO, normalizar_codigo
+from cache import cache_pdf, cache_qr, cache_usuarios, chave_conteudo
+from pdf_incremental import CanvasIncremental
+import exportacoes
+import importacao
+import exportacao_dados
+import termica
+import alteracoes
+import arquivo
+import metricas
+import modelos_etiqueta
+from api import api, criar_token, revogar_token
+from busca import expressao_fts, sql_busca, consulta_filtrada, reconstruir_indice, ORDEM_RELEVANCIA
+
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 
 app = Flask(__name__)
 app.secret_key = 'sua_chave_secreta_aqui_2024'
+banco.init_app(app)
+metricas.init_app(app)
+app.register_blueprint(api)
 
 # ==================== FLASK LOGIN ====================
 
@@ -31,76 +54,137 @@ class User(UserMixin):
 
 @login_manager.user_loader
 def load_user(user_id):
-    conn = get_db_connection()
-    user = conn.execute(
-        'SELECT * FROM usuarios WHERE id = ?',
-        (user_id,)
-    ).fetchone()
-    conn.close()
+    dados = cache_usuarios.obter(int(user_id))
+    if dados is None:
+        inicio = time.perf_counter()
+        conn = get_db_connection()
+        user = conn.execute(
+            'SELECT * FROM usuarios WHERE id = ?',
+            (user_id,)
+        ).fetchone()
+        cache_usuarios.registrar_custo(time.perf_counter() - inicio)
 
-    if user:
-        return User(user['id'], user['username'], user['email'])
-    return None
+        if user is None:
+            return None
+        dados = (user['id'], user['username'], user['email'])
+        cache_usuarios.guardar(user['id'], dados)
 
+    return User(*dados)
 
-# ==================== CONFIGURAÇÕES ====================
 
-DATABASE = 'etiquetas.db'
-UPLOAD_FOLDER = 'static/uploads'
+def invalidar_usuario(user_id):
+    """Descarta o usuário do cache; chame após alterar a conta ou a senha"""
+    cache_usuarios.remover(int(user_id))
 
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
 
+# ==================== CONFIGURAÇÕES ====================
 
-# ==================== BANCO DE DADOS ====================
+# A partir de quantas etiquetas o gerar_pdf_todas envia o PDF em streaming
+EXPORT_STREAM_MINIMO = int(os.environ.get('EXPORT_STREAM_MINIMO', 2000))
 
-def get_db_connection():
-    """Cria conexão com banco de dados SQLite"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
 
+# ==================== BANCO DE DADOS ====================
 
 def init_db():
-    """Inicializa o banco de dados com as tabelas necessárias"""
+    """Inicializa o banco de dados aplicando as migrações pendentes"""
     try:
-        conn = get_db_connection()
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS usuarios (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS etiquetas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome TEXT NOT NULL,
-                descricao TEXT,
-                codigo TEXT UNIQUE NOT NULL,
-                categoria TEXT,
-                preco REAL,
-                tamanho TEXT DEFAULT 'medio',
-                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                ativo INTEGER DEFAULT 1,
-                user_id INTEGER,
-                FOREIGN KEY (user_id) REFERENCES usuarios (id)
-            )
-        ''')
-        conn.commit()
-        conn.close()
-        print("✅ Banco de dados inicializado com sucesso!")
+        conn = banco.pool.adquirir()
+        try:
+            aplicadas = migrar_com_trava(conn, banco.DATABASE)
+        finally:
+            banco.pool.devolver(conn)
+        if aplicadas:
+            print(f"✅ Banco de dados migrado (versões {', '.join(map(str, aplicadas))})")
+        else:
+            print("✅ Banco de dados inicializado com sucesso!")
     except Exception as e:
         print(f"❌ Erro ao inicializar banco: {e}")
 
+
+@app.cli.command('verificar-indices')
+def verificar_indices():
+    """Falha se alguma consulta crítica não usar índice (EXPLAIN QUERY PLAN)"""
+    conn = get_db_connection()
+    problemas = verificar_planos(conn)
+    for nome, plano in problemas.items():
+        print(f"❌ {nome}: {' | '.join(plano)}")
+    if problemas:
+        raise SystemExit(1)
+    print("✅ Todas as consultas críticas usam índice")
+
+
+@app.cli.command('reindexar-busca')
+def reindexar_busca():
+    """Reconstrói o índice FTS5 da busca a partir da tabela etiquetas"""
+    total = reconstruir_indice(get_db_connection())
+    print(f"✅ Índice de busca reconstruído ({total} etiquetas)")
+
+
+@app.cli.command('criar-token')
+@click.argument('username')
+@click.option('--descricao', default=None, help='Identificação do uso do token')
+def criar_token_api(username, descricao):
+    """Cria um token da API para o usuário e o exibe (só desta vez)"""
+    conn = get_db_connection()
+    user = conn.execute('SELECT id FROM usuarios WHERE username = ?', (username,)).fetchone()
+    if user is None:
+        print(f"❌ Usuário {username} não encontrado")
+        raise SystemExit(1)
+    print(criar_token(conn, user['id'], descricao))
+
+
+@app.cli.command('revogar-token')
+@click.argument('token_id', type=int)
+def revogar_token_api(token_id):
+    """Revoga um token da API pelo id"""
+    if not revogar_token(get_db_connection(), token_id):
+        print(f"❌ Token {token_id} não encontrado ou já revogado")
+        raise SystemExit(1)
+    print(f"✅ Token {token_id} revogado")
+
+
+@app.cli.command('validar-modelos')
+def validar_modelos():
+    """Valida e compila os modelos de etiqueta da pasta de modelos"""
+    falhas = 0
+    for nome in modelos_etiqueta.disponiveis():
+        try:
+            modelo = modelos_etiqueta.carregar(nome, TAMANHOS)
+        except (ValueError, OSError) as e:
+            print(f"❌ {e}")
+            falhas += 1
+            continue
+        ativo = ' (ativo)' if nome == modelos_etiqueta.MODELO_ETIQUETA else ''
+        print(f"✅ {nome}{ativo}: {modelo.descricao}")
+    if falhas:
+        raise SystemExit(1)
+
+
 # Garantir que o banco existe a cada conexão
 def ensure_db():
     """Garante que as tabelas existem antes de qualquer operação"""
     init_db()
 
 
+@app.before_request
+def agendar_manutencao():
+    # Na primeira requisição de cada worker (após o fork do gunicorn)
+    arquivo.iniciar_agendador()
+
+
+@app.cli.command('manutencao')
+@click.option('--vacuum/--sem-vacuum', default=None,
+              help='Força ou impede o VACUUM (padrão: só com muitas páginas livres)')
+@click.option('--retencao-dias', type=int, default=arquivo.ARQUIVO_RETENCAO_DIAS, show_default=True,
+              help='Arquiva as etiquetas excluídas há mais dias que isso')
+def manutencao(vacuum, retencao_dias):
+    """Arquiva etiquetas excluídas antigas e roda ANALYZE (e VACUUM, se preciso)"""
+    resumo = arquivo.manutencao(get_db_connection(), vacuum, retencao_dias)
+    print(f"✅ {resumo['arquivadas']} etiquetas arquivadas; "
+          f"páginas livres {resumo['fracao_livre']:.0%}; "
+          f"VACUUM {'executado' if resumo['vacuum'] else 'dispensado'}")
+
+
 
 
 # ==================== AUTENTICAÇÃO ====================
@@ -116,7 +200,6 @@ def login():
             'SELECT * FROM usuarios WHERE username = ?',
             (username,)
         ).fetchone()
-        conn.close()
 
         if user and check_password_hash(user['password'], password):
             user_obj = User(user['id'], user['username'], user['email'])
@@ -150,7 +233,6 @@ def registro():
                 (username, email, password_hash)
             )
             conn.commit()
-            conn.close()
 
             flash('Registro realizado com sucesso! Faça login.', 'success')
             return redirect(url_for('login'))
@@ -161,6 +243,38 @@ def registro():
     return render_template('registro.html')
 
 
+@app.route('/conta/senha', methods=['GET', 'POST'])
+@login_required
+def alterar_senha():
+    if request.method == 'POST':
+        senha_atual = request.form['senha_atual']
+        password = request.form['password']
+        password_confirm = request.form['password_confirm']
+
+        conn = get_db_connection()
+        user = conn.execute(
+            'SELECT * FROM usuarios WHERE id = ?',
+            (current_user.id,)
+        ).fetchone()
+
+        if not check_password_hash(user['password'], senha_atual):
+            flash('Senha atual incorreta!', 'error')
+        elif password != password_confirm:
+            flash('As senhas não coincidem!', 'error')
+        else:
+            conn.execute(
+                'UPDATE usuarios SET password = ? WHERE id = ?',
+                (generate_password_hash(password), current_user.id)
+            )
+            conn.commit()
+            invalidar_usuario(current_user.id)
+
+            flash('Senha alterada com sucesso!', 'success')
+            return redirect(url_for('index'))
+
+    return render_template('senha.html')
+
+
 @app.route('/logout')
 @login_required
 def logout():
@@ -176,14 +290,16 @@ def logout():
 def index():
     conn = get_db_connection()
 
-    etiquetas = conn.execute(
-        'SELECT * FROM etiquetas WHERE ativo = 1 AND user_id = ? ORDER BY data_criacao DESC',
-        (current_user.id,)
-    ).fetchall()
-
-    conn.close()
+    pagina = paginar(
+        conn,
+        'SELECT * FROM etiquetas WHERE ativo = 1 AND user_id = ?',
+        (current_user.id,),
+        cursor=request.args.get('cursor'),
+        direcao=request.args.get('direcao', 'proxima'),
+        limite=limite_pagina(request.args.get('limite'))
+    )
 
-    return render_template('index.html', etiquetas=etiquetas)
+    return responder_listagem(pagina)
 
 
 @app.route('/criar', methods=['GET', 'POST'])
@@ -196,28 +312,33 @@ def criar():
         categoria = request.form.get('categoria', '')
         preco = request.form.get('preco', 0.0)
         tamanho = request.form.get('tamanho', 'medio')
+        simbologia = request.form.get('simbologia', SIMBOLOGIA_PADRAO)
 
         try:
+            codigo = normalizar_codigo(codigo, simbologia)
+
             conn = get_db_connection()
             conn.execute(
                 '''INSERT INTO etiquetas 
-                   (nome, descricao, codigo, categoria, preco, tamanho, user_id)
-                   VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                (nome, descricao, codigo, categoria, preco, tamanho, current_user.id)
+                   (nome, descricao, codigo, categoria, preco, tamanho, simbologia, user_id)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                (nome, descricao, codigo, categoria, preco, tamanho, simbologia, current_user.id)
             )
             conn.commit()
-            conn.close()
 
             flash('Etiqueta criada com sucesso!', 'success')
             return redirect(url_for('index'))
 
+        except ValueError as e:
+            flash(f'Erro: {e}', 'error')
+
         except sqlite3.IntegrityError:
             flash('Erro: Código já existe!', 'error')
 
         except Exception as e:
             flash(f'Erro ao criar etiqueta: {str(e)}', 'error')
 
-    return render_template('criar.html')
+    return render_template('criar.html', simbologias=SIMBOLOGIAS)
 
 
 @app.route('/editar/<int:id>', methods=['GET', 'POST'])
@@ -231,7 +352,6 @@ def editar(id):
     ).fetchone()
 
     if etiqueta is None:
-        conn.close()
         flash('Etiqueta não encontrada!', 'error')
         return redirect(url_for('index'))
 
@@ -242,60 +362,128 @@ def editar(id):
         categoria = request.form.get('categoria', '')
         preco = request.form.get('preco', 0.0)
         tamanho = request.form.get('tamanho', 'medio')
+        simbologia = request.form.get('simbologia', SIMBOLOGIA_PADRAO)
 
         try:
+            codigo = normalizar_codigo(codigo, simbologia)
+
             conn.execute(
                 '''UPDATE etiquetas 
-                   SET nome = ?, descricao = ?, codigo = ?, categoria = ?, preco = ?, tamanho = ?
+                   SET nome = ?, descricao = ?, codigo = ?, categoria = ?, preco = ?, tamanho = ?, simbologia = ?
                    WHERE id = ? AND user_id = ?''',
-                (nome, descricao, codigo, categoria, preco, tamanho, id, current_user.id)
+                (nome, descricao, codigo, categoria, preco, tamanho, simbologia, id, current_user.id)
             )
             conn.commit()
-            conn.close()
+            invalidar_etiqueta(etiqueta)
 
             flash('Etiqueta atualizada com sucesso!', 'success')
             return redirect(url_for('index'))
 
+        except ValueError as e:
+            flash(f'Erro: {e}', 'error')
+
         except sqlite3.IntegrityError:
             flash('Erro: Código já existe!', 'error')
 
         except Exception as e:
             flash(f'Erro ao atualizar etiqueta: {str(e)}', 'error')
 
-    conn.close()
-    return render_template('editar.html', etiqueta=etiqueta)
+    return render_template('editar.html', etiqueta=etiqueta, simbologias=SIMBOLOGIAS)
 
 @app.route('/deletar/<int:id>')
 @login_required
 def deletar(id):
     conn = get_db_connection()
+    etiqueta = conn.execute(
+        'SELECT * FROM etiquetas WHERE id = ? AND user_id = ?',
+        (id, current_user.id)
+    ).fetchone()
+
     conn.execute(
         'UPDATE etiquetas SET ativo = 0 WHERE id = ? AND user_id = ?',
         (id, current_user.id)
     )
     conn.commit()
-    conn.close()
+
+    if etiqueta is not None:
+        invalidar_etiqueta(etiqueta)
 
     flash('Etiqueta deletada com sucesso!', 'success')
     return redirect(url_for('index'))
 
 
+@app.route('/lixeira')
+@login_required
+def lixeira():
+    return render_template('lixeira.html', etiquetas=arquivo.excluidas(get_db_connection(), current_user.id),
+                           retencao_dias=arquivo.ARQUIVO_RETENCAO_DIAS)
+
+
+@app.route('/restaurar/<int:id>', methods=['POST'])
+@login_required
+def restaurar(id):
+    try:
+        restaurada = arquivo.restaurar(get_db_connection(), current_user.id, id)
+    except ValueError as e:
+        flash(f'Erro: {e}', 'error')
+        return redirect(url_for('lixeira'))
+
+    if restaurada:
+        flash('Etiqueta restaurada com sucesso!', 'success')
+    else:
+        flash('Etiqueta não encontrada na lixeira!', 'error')
+    return redirect(url_for('lixeira'))
+
+
 @app.route('/buscar')
 @login_required
 def buscar():
     termo = request.args.get('q', '')
 
+    expressao = expressao_fts(termo)
+
+    if not expressao:
+        return index()
+
     conn = get_db_connection()
-    etiquetas = conn.execute(
-        '''SELECT * FROM etiquetas 
-           WHERE ativo = 1 AND user_id = ? 
-           AND (nome LIKE ? OR codigo LIKE ? OR categoria LIKE ?)
-           ORDER BY data_criacao DESC''',
-        (current_user.id, f'%{termo}%', f'%{termo}%', f'%{termo}%')
-    ).fetchall()
-    conn.close()
+    sql, parametros = sql_busca(expressao)
+    pagina = paginar(
+        conn,
+        sql + ' AND user_id = ?',
+        parametros + (current_user.id,),
+        cursor=request.args.get('cursor'),
+        direcao=request.args.get('direcao', 'proxima'),
+        limite=limite_pagina(request.args.get('limite')),
+        ordem=ORDEM_RELEVANCIA,
+        decrescente=False
+    )
+
+    return responder_listagem(pagina, termo)
 
-    return render_template('index.html', etiquetas=etiquetas, termo_busca=termo)
+
+def filtros_busca(origem=None):
+    """(q, categoria, desde, ate) da query string ou do formulário informado"""
+    origem = request.args if origem is None else origem
+    return origem.get('q'), origem.get('categoria'), origem.get('desde'), origem.get('ate')
+
+
+def responder_listagem(pagina, termo=None):
+    """Renderiza uma página da listagem em HTML ou JSON (?formato=json)"""
+    if request.args.get('formato') == 'json':
+        return jsonify(
+            etiquetas=[dict(etiqueta) for etiqueta in pagina['etiquetas']],
+            proximo=pagina['proximo'],
+            anterior=pagina['anterior']
+        )
+
+    return render_template(
+        'index.html',
+        etiquetas=pagina['etiquetas'],
+        pagina=pagina,
+        termo_busca=termo,
+        limite=request.args.get('limite'),
+        folhas=FOLHAS
+    )
 
 
 # ==================== GERAÇÃO DE PDF ====================
@@ -308,135 +496,387 @@ def gerar_pdf(id):
         'SELECT * FROM etiquetas WHERE id = ? AND user_id = ?',
         (id, current_user.id)
     ).fetchone()
-    conn.close()
 
     if etiqueta is None:
         flash('Etiqueta não encontrada!', 'error')
         return redirect(url_for('index'))
 
-    buffer = BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=A4)
+    impressao = pedido_impressao()
+    chave = chave_etiqueta(etiqueta)
+    if impressao:
+        chave = chave_conteudo(chave, 'impressao')
+    conteudo = cache_pdf.obter(chave)
+    if conteudo is None:
+        with metricas.medir_fase('pdf'):
+            conteudo = renderizar_pdf_etiqueta(etiqueta, impressao)
+        cache_pdf.guardar(chave, conteudo)
+
+    return send_file(
+        BytesIO(conteudo),
+        as_attachment=True,
+        download_name=f"etiqueta_{etiqueta['codigo']}.pdf",
+        mimetype='application/pdf'
+    )
+
+
+def pedido_impressao():
+    """Se o PDF deve sair preparado para a gráfica (CMYK, sangria e TrimBox)"""
+    return request.values.get('impressao') == '1'
 
-    tamanhos = {
-        'pequeno': (50 * mm, 30 * mm),
-        'medio': (80 * mm, 50 * mm),
-        'grande': (100 * mm, 70 * mm)
-    }
 
-    largura, altura = tamanhos.get(etiqueta['tamanho'], tamanhos['medio'])
+def renderizar_pdf_etiqueta(etiqueta, impressao=False):
+    """Gera o PDF de uma etiqueta e retorna os bytes"""
+    pdf = CanvasIncremental(impressao=impressao)
 
+    largura, altura = TAMANHOS.get(etiqueta['tamanho'], TAMANHOS['medio'])
+
+    # Canto superior esquerdo da etiqueta na página A4
     x_start = 50
     y_start = 750
 
-    pdf.setStrokeColor(colors.black)
-    pdf.setLineWidth(1)
-    pdf.rect(x_start, y_start - altura, largura, altura)
-
-    padding = 8
+    iniciar_pagina(pdf)
+    desenhar_etiqueta(pdf, etiqueta, x_start, y_start - altura, geometria(largura, altura))
 
-    pdf.setFont("Helvetica-Bold", 12)
-    pdf.drawString(x_start + padding, y_start - padding - 10, etiqueta['nome'][:30])
+    pdf.save()
+    return pdf.retirar()
 
-    pdf.setFont("Helvetica", 9)
-    pdf.drawString(x_start + padding, y_start - padding - 25, f"Código: {etiqueta['codigo']}")
 
-    if etiqueta['categoria']:
-        pdf.drawString(x_start + padding, y_start - padding - 38, f"Categoria: {etiqueta['categoria']}")
+@app.route('/cache/estatisticas')
+@login_required
+def estatisticas_cache():
+    return jsonify(pdf=cache_pdf.estatisticas(), qr=cache_qr.estatisticas(), usuarios=cache_usuarios.estatisticas())
 
-    if etiqueta['preco'] and float(etiqueta['preco']) > 0:
-        pdf.setFont("Helvetica-Bold", 14)
-        pdf.drawString(x_start + padding, y_start - altura + 20, f"R$ {float(etiqueta['preco']):.2f}")
 
-    qr = qrcode.QRCode(version=1, box_size=2, border=1)
-    qr.add_data(f"Código: {etiqueta['codigo']}\nNome: {etiqueta['nome']}")
-    qr.make(fit=True)
-    qr_img = qr.make_image(fill_color="black", back_color="white")
+@app.route('/gerar_pdf_todas')
+@login_required
+def gerar_pdf_todas():
+    formato = request.args.get('folha', FOLHA_PADRAO)
+    impressao = pedido_impressao()
 
-    qr_path = os.path.join(UPLOAD_FOLDER, f'qr_{id}.png')
-    qr_img.save(qr_path)
+    conn = get_db_connection()
+    total = conn.execute(
+        'SELECT COUNT(*) FROM etiquetas WHERE ativo = 1 AND user_id = ?',
+        (current_user.id,)
+    ).fetchone()[0]
 
-    qr_size = altura * 0.6
+    if total == 0:
+        flash('Nenhuma etiqueta encontrada!', 'warning')
+        return redirect(url_for('index'))
 
-    pdf.drawImage(
-        qr_path,
-        x_start + largura - qr_size - padding,
-        y_start - altura + padding,
-        qr_size,
-        qr_size
+    cursor = conn.execute(
+        'SELECT * FROM etiquetas WHERE ativo = 1 AND user_id = ? ORDER BY nome',
+        (current_user.id,)
     )
 
-    pdf.save()
-    buffer.seek(0)
+    # Catálogos grandes saem página a página, sem montar o PDF em memória
+    if request.args.get('stream') == '1' or total >= EXPORT_STREAM_MINIMO:
+        return Response(
+            stream_with_context(gerar_pdf_incremental(iterar_lotes(cursor), formato, impressao=impressao)),
+            mimetype='application/pdf',
+            headers={'Content-Disposition': 'attachment; filename=todas_etiquetas.pdf'}
+        )
 
-    if os.path.exists(qr_path):
-        os.remove(qr_path)
+    pdf = CanvasIncremental(impressao=impressao)
+
+    with metricas.medir_fase('pdf'):
+        renderizar(pdf, iterar_lotes(cursor), formato)
+        pdf.save()
 
     return send_file(
-        buffer,
+        BytesIO(pdf.retirar()),
         as_attachment=True,
-        download_name=f'etiqueta_{etiqueta['codigo']}.pdf',
+        download_name='todas_etiquetas.pdf',
         mimetype='application/pdf'
     )
 
 
+def selecionar_lote():
+    """Etiquetas marcadas (ids) ou que atendem ao filtro da busca no formulário.
 
-@app.route('/gerar_pdf_todas')
+    Retorna um iterador que lê o cursor em lotes, ou None (com flash) se
+    não houver nenhuma etiqueta.
+    """
+    ids = [] if request.form.get('modo') == 'busca' else request.form.getlist('ids', type=int)
+    if request.form.get('modo') == 'ids' and not ids:
+        flash('Marque ao menos uma etiqueta!', 'warning')
+        return None
+
+    conn = get_db_connection()
+
+    if ids:
+        cursor = conn.execute(
+            '''SELECT * FROM etiquetas
+               WHERE ativo = 1 AND user_id = ? AND id IN (SELECT value FROM json_each(?))
+               ORDER BY nome''',
+            (current_user.id, json.dumps(ids))
+        )
+    else:
+        try:
+            sql, parametros, _ = consulta_filtrada(current_user.id, *filtros_busca(request.form))
+        except ValueError as e:
+            flash(str(e), 'error')
+            return None
+        cursor = conn.execute(sql + ' ORDER BY nome', parametros)
+
+    primeira = cursor.fetchone()
+    if primeira is None:
+        flash('Nenhuma etiqueta encontrada!', 'warning')
+        return None
+    return itertools.chain([primeira], iterar_lotes(cursor))
+
+
+@app.route('/gerar_pdf_lote', methods=['POST'])
 @login_required
-def gerar_pdf_todas():
+def gerar_pdf_lote():
+    """Um PDF com as etiquetas marcadas ou com as que atendem ao filtro da busca"""
+    etiquetas = selecionar_lote()
+    if etiquetas is None:
+        return redirect(url_for('index'))
+
+    return Response(
+        stream_with_context(gerar_pdf_incremental(etiquetas, request.form.get('folha', FOLHA_PADRAO),
+                                                  impressao=pedido_impressao())),
+        mimetype='application/pdf',
+        headers={'Content-Disposition': 'attachment; filename=etiquetas_selecionadas.pdf'}
+    )
+
+
+@app.route('/gerar_pdf_alteracoes', methods=['GET', 'POST'])
+@login_required
+def gerar_pdf_alteracoes():
+    """PDF só das etiquetas alteradas desde `desde` ou desde a última impressão de alterações.
+
+    Só o POST sem `desde` avança o ponto, e apenas quando o PDF termina
+    de ser enviado; o GET permite conferir antes sem marcar nada.
+    """
     conn = get_db_connection()
-    etiquetas = conn.execute(
+    desde = request.values.get('desde')
+    # Lido antes da consulta: o que mudar durante o envio fica para a próxima
+    ultima = alteracoes.ultima_alteracao(conn, current_user.id)
+
+    try:
+        sql, parametros = alteracoes.consulta_alteradas(
+            current_user.id, alteracoes.ponto_atual(conn, current_user.id), desde
+        )
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('index'))
+
+    cursor = conn.execute(sql + ' ORDER BY nome', parametros)
+    primeira = cursor.fetchone()
+    if primeira is None:
+        flash('Nenhuma etiqueta alterada no período!', 'info')
+        return redirect(url_for('index'))
+
+    partes = gerar_pdf_incremental(itertools.chain([primeira], iterar_lotes(cursor)),
+                                   request.values.get('folha', FOLHA_PADRAO), impressao=pedido_impressao())
+    if request.method == 'POST' and not desde:
+        partes = alteracoes.avancar_ao_final(partes, conn, current_user.id, ultima)
+
+    return Response(
+        stream_with_context(partes),
+        mimetype='application/pdf',
+        headers={'Content-Disposition': 'attachment; filename=etiquetas_alteradas.pdf'}
+    )
+
+
+# ==================== IMPRESSÃO TÉRMICA (ZPL / EPL) ====================
+
+def opcoes_termica(origem):
+    """(linguagem, dpi) pedidos; ValueError se inválidos"""
+    linguagem = origem.get('linguagem', 'zpl')
+    dpi = origem.get('dpi', termica.TERMICA_DPI, type=int)
+    if linguagem not in termica.LINGUAGENS:
+        raise ValueError(f"Linguagem inválida: use {', '.join(termica.LINGUAGENS)}")
+    if dpi is None or not 100 <= dpi <= 600:
+        raise ValueError('Resolução inválida: use de 100 a 600 dpi')
+    return linguagem, dpi
+
+
+def responder_termica(etiquetas, linguagem, dpi, nome):
+    return Response(
+        stream_with_context(termica.gerar_termica(etiquetas, linguagem, dpi)),
+        mimetype='application/octet-stream',
+        headers={'Content-Disposition': f'attachment; filename={nome}.{linguagem}'}
+    )
+
+
+@app.route('/gerar_termica/<int:id>')
+@login_required
+def gerar_termica(id):
+    try:
+        linguagem, dpi = opcoes_termica(request.args)
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('index'))
+
+    etiqueta = get_db_connection().execute(
+        'SELECT * FROM etiquetas WHERE id = ? AND user_id = ?',
+        (id, current_user.id)
+    ).fetchone()
+
+    if etiqueta is None:
+        flash('Etiqueta não encontrada!', 'error')
+        return redirect(url_for('index'))
+
+    return responder_termica([etiqueta], linguagem, dpi, f"etiqueta_{etiqueta['codigo']}")
+
+
+@app.route('/gerar_termica_todas')
+@login_required
+def gerar_termica_todas():
+    try:
+        linguagem, dpi = opcoes_termica(request.args)
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('index'))
+
+    cursor = get_db_connection().execute(
         'SELECT * FROM etiquetas WHERE ativo = 1 AND user_id = ? ORDER BY nome',
         (current_user.id,)
-    ).fetchall()
-    conn.close()
-
-    if not etiquetas:
+    )
+    primeira = cursor.fetchone()
+    if primeira is None:
         flash('Nenhuma etiqueta encontrada!', 'warning')
         return redirect(url_for('index'))
+    return responder_termica(itertools.chain([primeira], iterar_lotes(cursor)), linguagem, dpi, 'todas_etiquetas')
 
-    buffer = BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=A4)
 
-    x_margin = 50
-    y_start = 750
-    etiqueta_altura = 100
-    y_current = y_start
+@app.route('/gerar_termica_lote', methods=['POST'])
+@login_required
+def gerar_termica_lote():
+    """Arquivo ZPL/EPL com as etiquetas marcadas ou com as que atendem ao filtro da busca"""
+    try:
+        linguagem, dpi = opcoes_termica(request.form)
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('index'))
 
-    for etiqueta in etiquetas:
-        if y_current < 100:
-            pdf.showPage()
-            y_current = y_start
+    etiquetas = selecionar_lote()
+    if etiquetas is None:
+        return redirect(url_for('index'))
+    return responder_termica(etiquetas, linguagem, dpi, 'etiquetas_selecionadas')
 
-        pdf.setStrokeColor(colors.black)
-        pdf.setLineWidth(0.5)
-        pdf.rect(x_margin, y_current - etiqueta_altura, 500, etiqueta_altura)
 
-        pdf.setFont("Helvetica-Bold", 12)
-        pdf.drawString(x_margin + 10, y_current - 25, etiqueta['nome'])
+# ==================== EXPORTAÇÃO DE DADOS ====================
 
-        pdf.setFont("Helvetica", 9)
-        pdf.drawString(x_margin + 10, y_current - 45, f"Código: {etiqueta['codigo']}")
+@app.route('/exportar/<formato>')
+@login_required
+def exportar_dados(formato):
+    """Exporta as etiquetas em CSV ou JSON Lines, em streaming.
 
-        if etiqueta['categoria']:
-            pdf.drawString(x_margin + 10, y_current - 60, f"Categoria: {etiqueta['categoria']}")
+    Aceita os mesmos filtros da busca: q (texto, ordenado por relevância),
+    categoria e o período desde/ate (AAAA-MM-DD) sobre data_criacao.
+    """
+    if formato not in exportacao_dados.GERADORES:
+        return jsonify(erro='Formato inválido: use csv ou ndjson'), 400
 
-        if etiqueta['preco'] and float(etiqueta['preco']) > 0:
-            pdf.setFont("Helvetica-Bold", 14)
-            pdf.drawString(x_margin + 10, y_current - 85, f"R$ {float(etiqueta['preco']):.2f}")
+    try:
+        sql, parametros, ordem = consulta_filtrada(current_user.id, *filtros_busca())
+    except ValueError as e:
+        return jsonify(erro=str(e)), 400
+
+    cursor = get_db_connection().execute(f"{sql} ORDER BY {', '.join(ordem)}", parametros)
+    return Response(
+        stream_with_context(exportacao_dados.GERADORES[formato](cursor)),
+        mimetype=exportacao_dados.TIPOS[formato],
+        headers={'Content-Disposition': f'attachment; filename=etiquetas.{formato}'}
+    )
 
-        y_current -= (etiqueta_altura + 10)
 
-    pdf.save()
-    buffer.seek(0)
+# ==================== EXPORTAÇÕES EM SEGUNDO PLANO ====================
+
+@app.route('/exportacoes', methods=['POST'])
+@login_required
+def nova_exportacao():
+    conn = get_db_connection()
+    exportacoes.limpar_exportacoes(conn)
+    job_id = exportacoes.criar_exportacao(conn, current_user.id, request.form.get('folha', FOLHA_PADRAO),
+                                          impressao=pedido_impressao())
+
+    if request.args.get('formato') == 'json':
+        return jsonify(id=job_id, status=url_for('exportacao', job_id=job_id)), 202
+    return redirect(url_for('exportacao', job_id=job_id))
+
+
+@app.route('/exportacoes/<job_id>')
+@login_required
+def exportacao(job_id):
+    job = exportacoes.obter_exportacao(get_db_connection(), job_id, current_user.id)
+
+    if job is None:
+        flash('Exportação não encontrada ou expirada!', 'error')
+        return redirect(url_for('index'))
+
+    if request.args.get('formato') == 'json':
+        return jsonify(
+            id=job['id'],
+            status=job['status'],
+            feitos=job['feitos'],
+            total=job['total'],
+            erro=job['erro'],
+            expira_em=job['expira_em'],
+            download=url_for('baixar_exportacao', job_id=job_id) if job['status'] == 'concluida' else None
+        )
+    return render_template('exportacao.html', job=job)
+
+
+@app.route('/exportacoes/<job_id>/download')
+@login_required
+def baixar_exportacao(job_id):
+    job = exportacoes.obter_exportacao(get_db_connection(), job_id, current_user.id)
+
+    if job is None or job['status'] != 'concluida' or not os.path.exists(job['arquivo']):
+        flash('Exportação não encontrada ou expirada!', 'error')
+        return redirect(url_for('index'))
 
     return send_file(
-        buffer,
+        job['arquivo'],
         as_attachment=True,
         download_name='todas_etiquetas.pdf',
         mimetype='application/pdf'
     )
 
 
+@app.cli.command('limpar-exportacoes')
+def limpar_exportacoes():
+    """Remove exportações expiradas e seus arquivos"""
+    total = exportacoes.limpar_exportacoes(get_db_connection())
+    print(f"✅ {total} exportações expiradas removidas")
+
+
+# ==================== IMPORTAÇÃO EM LOTE ====================
+
+@app.route('/importar', methods=['GET', 'POST'])
+@login_required
+def importar():
+    resumo = None
+
+    if request.method == 'POST':
+        enviado = request.files.get('arquivo')
+        upsert = request.form.get('upsert') == '1'
+
+        if not enviado or not enviado.filename:
+            flash('Selecione um arquivo CSV ou XLSX!', 'error')
+            return render_template('importar.html', resumo=None)
+
+        try:
+            linhas = importacao.ler_linhas(enviado.stream, enviado.filename)
+            resumo = importacao.importar(get_db_connection(), linhas, current_user.id, upsert)
+        except importacao.ErroImportacao as e:
+            if request.args.get('formato') == 'json':
+                return jsonify(erro=str(e)), 400
+            flash(f'Erro ao importar: {e}', 'error')
+            return render_template('importar.html', resumo=None)
+
+        if request.args.get('formato') == 'json':
+            return jsonify(resumo)
+        flash(f"Importação concluída: {resumo['inseridas']} criadas, {resumo['atualizadas']} atualizadas, "
+              f"{resumo['total_erros']} com erro.", 'success' if not resumo['total_erros'] else 'error')
+
+    return render_template('importar.html', resumo=resumo)
+
+
 # ==================== INICIALIZAÇÃO ====================
 
 if __name__ == '__main__':
@@ -0,0 +1,115 @@
+import os
+import time
+
+import qrcode
+from reportlab.pdfbase.pdfmetrics import getFont, stringWidth
+
+import banco
+from codigo_barras import modulos_barras
+from layout_pdf import TAMANHOS, modelo_ativo, geometria, desenhar_etiqueta, iniciar_pagina, dados_qr
+from pdf_incremental import FONTES, OperacoesPDF
+
+
+# ==================== CONFIGURAÇÕES ====================
+
+# 0 desativa o aquecimento dos workers (gunicorn.conf.py)
+AQUECIMENTO = os.environ.get('AQUECIMENTO', '1') == '1'
+
+# Conexões abertas de antemão por worker (no máximo o tamanho do pool)
+AQUECIMENTO_CONEXOES = int(os.environ.get('AQUECIMENTO_CONEXOES', 2))
+
+# Caracteres acentuados comuns nos nomes ("Pão de Açúcar"): carregam as
+# métricas e a tabela WinAnsi das fontes padrão, que cobrem todo o Latin-1
+AMOSTRA_TEXTO = 'Pão de Açúcar Maçã Feijão Água R$ 0123456789 ÁÉÍÓÚÂÊÔÀÇÑÜ áéíóúâêôàçñü'
+
+ETIQUETA_AMOSTRA = {
+    'nome': 'Pão de Açúcar', 'descricao': '', 'codigo': '789100000001',
+    'categoria': 'Mercearia', 'preco': 9.9, 'tamanho': 'medio', 'simbologia': 'ean13',
+}
+
+
+# ==================== AQUECIMENTO ====================
+# Sem isto o primeiro PDF de cada worker paga a leitura das métricas das
+# fontes, a compilação do modelo e dos templates Jinja, o primeiro QR e a
+# abertura das conexões. Com o preload do gunicorn, aquecer_processo()
+# roda uma vez no master e os workers herdam o resultado por
+# copy-on-write; aquecer_worker() cuida do que não atravessa o fork.
+
+def _etapa(tempos, nome, funcao, *args):
+    inicio = time.perf_counter()
+    funcao(*args)
+    tempos[nome] = time.perf_counter() - inicio
+
+
+def _fontes():
+    for fonte in FONTES:
+        getFont(fonte)
+        stringWidth(AMOSTRA_TEXTO, fonte, 10)
+    AMOSTRA_TEXTO.encode('cp1252')
+
+
+def _qr():
+    # Tabelas de Reed-Solomon e padrões de máscara do qrcode; a matriz não
+    # vai para o cache_qr para não poluir as estatísticas
+    qr = qrcode.QRCode(version=1, border=1)
+    qr.add_data(dados_qr(ETIQUETA_AMOSTRA))
+    qr.make(fit=True)
+    qr.get_matrix()
+    modulos_barras('AMOSTRA-128', 'code128')
+    modulos_barras(ETIQUETA_AMOSTRA['codigo'], 'ean13')
+
+
+def _desenho():
+    # Executa os planos do modelo em todos os tamanhos, com e sem a saída para gráfica
+    modelo_ativo()
+    for impressao in (False, True):
+        pdf = OperacoesPDF(impressao=impressao)
+        iniciar_pagina(pdf)
+        for nome, (largura, altura) in TAMANHOS.items():
+            for simbologia in ('ean13', 'code128'):
+                desenhar_etiqueta(pdf, dict(ETIQUETA_AMOSTRA, tamanho=nome, simbologia=simbologia),
+                                  0, 0, geometria(largura, altura))
+        pdf.conteudo_pagina()
+
+
+def _templates(app):
+    for nome in app.jinja_env.list_templates():
+        if nome.endswith('.html'):
+            app.jinja_env.get_template(nome)
+
+
+def _conexoes():
+    conexoes = [banco.pool.adquirir() for _ in range(min(AQUECIMENTO_CONEXOES, max(banco.DB_POOL_SIZE, 1)))]
+    for conn in conexoes:
+        # Lê o esquema e as primeiras páginas dos índices para o cache da conexão
+        conn.execute('SELECT COUNT(*) FROM etiquetas WHERE ativo = 1').fetchone()
+        conn.execute('SELECT 1 FROM usuarios LIMIT 1').fetchone()
+    for conn in conexoes:
+        banco.pool.devolver(conn)
+
+
+def aquecer_processo(app):
+    """Carrega o que pode ser compartilhado entre workers; retorna os tempos por etapa"""
+    tempos = {}
+    _etapa(tempos, 'fontes', _fontes)
+    _etapa(tempos, 'qr', _qr)
+    _etapa(tempos, 'desenho', _desenho)
+    _etapa(tempos, 'templates', _templates, app)
+    return tempos
+
+
+def aquecer_worker():
+    """Abre as conexões deste processo; retorna os tempos.
+
+    O pool de renderização não é aquecido: subir os processos custa
+    segundos por worker (e de novo a cada reciclagem), e só os PDFs em
+    lote o usam. Ele sobe no primeiro desses, já compilando o modelo no
+    initializer de cada processo.
+    """
+    tempos = {}
+    _etapa(tempos, 'conexoes', _conexoes)
+    return tempos
+
+
+def resumo(tempos):
+    return ', '.join(f'{etapa} {segundos * 1000:.0f} ms' for etapa, segundos in tempos.items())
@@ -0,0 +1,211 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import banco
+
+
+# ==================== CONFIGURAÇÕES ====================
+
+# Etiquetas excluídas há mais que isso saem da tabela principal
+ARQUIVO_RETENCAO_DIAS = int(os.environ.get('ARQUIVO_RETENCAO_DIAS', 30))
+
+# Linhas movidas por transação (mantém curtas as travas de escrita)
+ARQUIVO_LOTE = int(os.environ.get('ARQUIVO_LOTE', 1000))
+
+# Intervalo da manutenção automática em horas (0 desativa: use o comando da CLI)
+MANUTENCAO_INTERVALO_HORAS = float(os.environ.get('MANUTENCAO_INTERVALO_HORAS', 0))
+
+# VACUUM só quando as páginas livres passam desta fração do arquivo
+MANUTENCAO_VACUUM_LIVRE = float(os.environ.get('MANUTENCAO_VACUUM_LIVRE', 0.25))
+
+# De quanto em quanto tempo cada worker confere se a manutenção está devida
+MANUTENCAO_VERIFICACAO = 300
+
+COLUNAS = ('id', 'nome', 'descricao', 'codigo', 'categoria', 'preco', 'tamanho',
+           'simbologia', 'data_criacao', 'atualizado_em', 'user_id')
+
+logger = logging.getLogger('etiquetas.arquivo')
+
+
+# ==================== ARQUIVAMENTO ====================
+# deletar() só marca ativo = 0. Passada a retenção, as excluídas vão para
+# etiquetas_arquivo (migração 9) e saem da tabela principal, que fica com
+# as linhas que as listagens de fato leem. O momento da exclusão é o
+# atualizado_em mantido pelos triggers da migração 8.
+
+def arquivar(conn, retencao_dias=ARQUIVO_RETENCAO_DIAS, lote=ARQUIVO_LOTE):
+    """Move as excluídas há mais de `retencao_dias` para o arquivo; retorna quantas"""
+    colunas = ', '.join(COLUNAS)
+    total = 0
+    while True:
+        ids = [linha['id'] for linha in conn.execute(
+            '''SELECT id FROM etiquetas
+               WHERE ativo = 0 AND atualizado_em < datetime('now', ?) LIMIT ?''',
+            (f'-{retencao_dias} days', lote)
+        )]
+        if not ids:
+            return total
+
+        lista = json.dumps(ids)
+        conn.execute(
+            f'''INSERT OR REPLACE INTO etiquetas_arquivo ({colunas})
+                SELECT {colunas} FROM etiquetas WHERE id IN (SELECT value FROM json_each(?))''',
+            (lista,)
+        )
+        conn.execute('DELETE FROM etiquetas WHERE id IN (SELECT value FROM json_each(?))', (lista,))
+        conn.commit()
+        total += len(ids)
+
+
+def excluidas(conn, user_id, limite=200):
+    """Excluídas do usuário, ainda na tabela principal ou já arquivadas, mais recentes primeiro"""
+    return conn.execute(
+        '''SELECT id, nome, codigo, categoria, preco, atualizado_em AS excluida_em, 0 AS arquivada
+           FROM etiquetas WHERE ativo = 0 AND user_id = ?
+           UNION ALL
+           SELECT id, nome, codigo, categoria, preco, atualizado_em, 1
+           FROM etiquetas_arquivo WHERE user_id = ?
+           ORDER BY excluida_em DESC LIMIT ?''',
+        (user_id, user_id, limite)
+    ).fetchall()
+
+
+def restaurar(conn, user_id, id):
+    """Desfaz a exclusão, esteja a etiqueta na tabela principal ou no arquivo.
+
+    Retorna False se não houver excluída com esse id; ValueError se o
+    código já tiver sido usado por outra etiqueta depois do arquivamento.
+    """
+    cursor = conn.execute(
+        'UPDATE etiquetas SET ativo = 1 WHERE id = ? AND user_id = ? AND ativo = 0',
+        (id, user_id)
+    )
+    if cursor.rowcount:
+        conn.commit()
+        return True
+
+    arquivada = conn.execute(
+        'SELECT codigo FROM etiquetas_arquivo WHERE id = ? AND user_id = ?',
+        (id, user_id)
+    ).fetchone()
+    if arquivada is None:
+        return False
+
+    if conn.execute('SELECT 1 FROM etiquetas WHERE codigo = ?', (arquivada['codigo'],)).fetchone():
+        raise ValueError(f"O código {arquivada['codigo']} já está em uso por outra etiqueta")
+
+    colunas = ', '.join(COLUNAS)
+    conn.execute(
+        f'INSERT INTO etiquetas ({colunas}) SELECT {colunas} FROM etiquetas_arquivo WHERE id = ?',
+        (id,)
+    )
+    conn.execute('DELETE FROM etiquetas_arquivo WHERE id = ?', (id,))
+    conn.commit()
+    return True
+
+
+# ==================== MANUTENÇÃO ====================
+
+def fracao_livre(conn):
+    paginas = conn.execute('PRAGMA page_count').fetchone()[0]
+    livres = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    return livres / paginas if paginas else 0.0
+
+
+def manutencao(conn, vacuum=None, retencao_dias=ARQUIVO_RETENCAO_DIAS):
+    """Arquiva as excluídas antigas, atualiza as estatísticas e, se preciso, compacta o banco.
+
+    vacuum=None decide pela fração de páginas livres; True/False força.
+    Retorna o resumo gravado em manutencoes.
+    """
+    manutencao_id = conn.execute('INSERT INTO manutencoes DEFAULT VALUES').lastrowid
+    conn.commit()
+    return _executar(conn, manutencao_id, vacuum, retencao_dias)
+
+
+def _executar(conn, manutencao_id, vacuum, retencao_dias):
+    resumo = {'arquivadas': 0, 'vacuum': False, 'fracao_livre': 0.0}
+    try:
+        resumo['arquivadas'] = arquivar(conn, retencao_dias)
+
+        # analysis_limit: estatísticas por amostragem, rápidas em bancos grandes
+        conn.execute('PRAGMA analysis_limit = 1000')
+        conn.execute('ANALYZE')
+        conn.commit()
+
+        resumo['fracao_livre'] = fracao_livre(conn)
+        resumo['vacuum'] = resumo['fracao_livre'] >= MANUTENCAO_VACUUM_LIVRE if vacuum is None else vacuum
+        if resumo['vacuum']:
+            conn.execute('VACUUM')
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    except Exception as e:
+        conn.rollback()
+        conn.execute('UPDATE manutencoes SET erro = ? WHERE id = ?', (str(e), manutencao_id))
+        conn.commit()
+        raise
+
+    conn.execute(
+        '''UPDATE manutencoes SET concluida_em = CURRENT_TIMESTAMP, arquivadas = ?, vacuum = ?
+           WHERE id = ?''',
+        (resumo['arquivadas'], int(resumo['vacuum']), manutencao_id)
+    )
+    conn.commit()
+    return resumo
+
+
+# ==================== AGENDAMENTO ====================
+# Opcional (MANUTENCAO_INTERVALO_HORAS > 0). Cada worker do gunicorn tem a
+# sua thread, mas só um executa a cada intervalo: a vez é reivindicada com
+# um INSERT em manutencoes dentro de BEGIN IMMEDIATE, que serializa os
+# workers.
+
+_agendador = None
+_agendador_pid = None
+_agendador_lock = threading.Lock()
+
+
+def _reivindicar(conn, intervalo_horas):
+    """Registra o início de uma manutenção se nenhuma começou no intervalo; retorna o id ou None"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        recente = conn.execute(
+            "SELECT 1 FROM manutencoes WHERE iniciada_em > datetime('now', ?)",
+            (f'-{intervalo_horas} hours',)
+        ).fetchone()
+        manutencao_id = None if recente else conn.execute('INSERT INTO manutencoes DEFAULT VALUES').lastrowid
+        conn.commit()
+        return manutencao_id
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _laco(intervalo_horas):
+    while True:
+        time.sleep(MANUTENCAO_VERIFICACAO)
+        conn = banco.pool.adquirir()
+        try:
+            manutencao_id = _reivindicar(conn, intervalo_horas)
+            if manutencao_id is not None:
+                _executar(conn, manutencao_id, None, ARQUIVO_RETENCAO_DIAS)
+        except Exception:
+            logger.exception('Erro na manutenção do banco')
+        finally:
+            banco.pool.devolver(conn)
+
+
+def iniciar_agendador(intervalo_horas=MANUTENCAO_INTERVALO_HORAS):
+    """Inicia a thread de manutenção deste processo (uma vez por pid)"""
+    global _agendador, _agendador_pid
+    if intervalo_horas <= 0 or _agendador_pid == os.getpid():
+        return _agendador
+    with _agendador_lock:
+        if _agendador is None or _agendador_pid != os.getpid():
+            _agendador = threading.Thread(target=_laco, args=(intervalo_horas,),
+                                          name='manutencao', daemon=True)
+            _agendador.start()
+            _agendador_pid = os.getpid()
+        return _agendador
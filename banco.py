@@ -0,0 +1,157 @@
+import os
+import sqlite3
+import threading
+from queue import LifoQueue, Empty, Full
+
+from flask import g, has_app_context
+
+from metricas import medir_fase
+
+
+# ==================== CONFIGURAÇÕES ====================
+
+DATABASE = os.environ.get('DATABASE', 'etiquetas.db')
+
+# Tamanho máximo do pool por worker (0 desativa o pool: uma conexão por requisição)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+
+# Pragmas aplicados em toda conexão nova
+DB_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -16000)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 64 * 1024 * 1024)),
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+    'temp_store': os.environ.get('SQLITE_TEMP_STORE', 'MEMORY'),
+}
+
+
+# ==================== CONEXÃO INSTRUMENTADA ====================
+# Soma à fase 'db' da requisição o tempo de execute, fetch e commit, e
+# conta as consultas. Linhas lidas iterando o cursor diretamente (for
+# linha in cursor) contam só no execute.
+
+class CursorMedido(sqlite3.Cursor):
+    def execute(self, sql, parametros=()):
+        with medir_fase('db', consulta=True):
+            return super().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        with medir_fase('db', consulta=True):
+            return super().executemany(sql, parametros)
+
+    def fetchone(self):
+        with medir_fase('db'):
+            return super().fetchone()
+
+    def fetchmany(self, size=None):
+        with medir_fase('db'):
+            return super().fetchmany(self.arraysize if size is None else size)
+
+    def fetchall(self):
+        with medir_fase('db'):
+            return super().fetchall()
+
+
+class ConexaoMedida(sqlite3.Connection):
+    def cursor(self, factory=CursorMedido):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+    def commit(self):
+        with medir_fase('db'):
+            super().commit()
+
+
+# ==================== POOL DE CONEXÕES ====================
+
+class PoolConexoes:
+    """Pool de conexões SQLite por processo (worker do gunicorn).
+
+    Cada thread retira uma conexão exclusiva e a devolve ao final da
+    requisição. Após um fork o pool é descartado, pois conexões SQLite
+    não podem ser compartilhadas entre processos.
+    """
+
+    def __init__(self, caminho, tamanho=DB_POOL_SIZE, pragmas=None):
+        self.caminho = caminho
+        self.tamanho = tamanho
+        self.pragmas = dict(DB_PRAGMAS if pragmas is None else pragmas)
+        self._lock = threading.Lock()
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self._pid = os.getpid()
+        self._livres = LifoQueue(maxsize=max(self.tamanho, 1))
+
+    def conectar(self):
+        """Abre uma conexão nova já configurada com os pragmas"""
+        conn = sqlite3.connect(self.caminho, check_same_thread=False, factory=ConexaoMedida)
+        conn.row_factory = sqlite3.Row
+        for nome, valor in self.pragmas.items():
+            conn.execute(f'PRAGMA {nome} = {valor}')
+        return conn
+
+    def adquirir(self):
+        """Retira uma conexão livre do pool ou abre uma nova"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reiniciar()
+
+        if self.tamanho > 0:
+            try:
+                return self._livres.get_nowait()
+            except Empty:
+                pass
+        return self.conectar()
+
+    def devolver(self, conn):
+        """Devolve a conexão ao pool, desfazendo transações pendentes"""
+        if conn.in_transaction:
+            conn.rollback()
+
+        if self.tamanho > 0 and self._pid == os.getpid():
+            try:
+                self._livres.put_nowait(conn)
+                return
+            except Full:
+                pass
+        conn.close()
+
+    def fechar_todas(self):
+        """Fecha as conexões livres (usado ao reciclar workers e em testes)"""
+        while True:
+            try:
+                self._livres.get_nowait().close()
+            except Empty:
+                break
+
+
+pool = PoolConexoes(DATABASE)
+
+
+def get_db_connection():
+    """Retorna a conexão do pool vinculada ao contexto da aplicação"""
+    if not has_app_context():
+        return pool.adquirir()
+
+    if 'db' not in g:
+        g.db = pool.adquirir()
+    return g.db
+
+
+def liberar_conexao(exception=None):
+    """Devolve ao pool a conexão usada no contexto atual"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        pool.devolver(conn)
+
+
+def init_app(app):
+    app.teardown_appcontext(liberar_conexao)
@@ -0,0 +1,45 @@
+"""Reimpressão diária: catálogo inteiro (/gerar_pdf_todas) x só as alteradas (/gerar_pdf_alteracoes).
+
+Uso: python benchmarks/bench_alteracoes.py [etiquetas] [alteradas]
+"""
+import sys
+import time
+
+from comum import preparar_ambiente, criar_cliente, popular_etiquetas
+
+
+def cronometrar(titulo, funcao):
+    inicio = time.perf_counter()
+    resposta = funcao()
+    resposta.get_data()  # consome o streaming dentro da medição
+    duracao = time.perf_counter() - inicio
+    print(f'{titulo:<42} {duracao:8.3f} s   {len(resposta.data) / 1024:9.1f} KiB   status {resposta.status_code}')
+    return resposta
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    alteradas = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+    modulo_app = preparar_ambiente(RENDER_WORKERS=1)
+    cliente, user_id = criar_cliente(modulo_app)
+    popular_etiquetas(modulo_app, user_id, quantidade)
+    print(f'{quantidade} etiquetas, {alteradas} preços alterados\n')
+
+    # Primeira impressão de alterações: marca o ponto com o catálogo inteiro
+    cliente.post('/gerar_pdf_alteracoes').get_data()
+
+    with modulo_app.app.app_context():
+        conn = modulo_app.get_db_connection()
+        passo = max(quantidade // alteradas, 1)
+        conn.execute('UPDATE etiquetas SET preco = preco + 1 WHERE id % ? = 0', (passo,))
+        conn.commit()
+
+    modulo_app.cache_pdf.memoria.max_itens = modulo_app.cache_qr.max_itens = 0
+    cronometrar('GET /gerar_pdf_todas (stream)', lambda: cliente.get('/gerar_pdf_todas?stream=1'))
+    cronometrar('POST /gerar_pdf_alteracoes', lambda: cliente.post('/gerar_pdf_alteracoes'))
+    cronometrar('POST /gerar_pdf_alteracoes (sem novas)', lambda: cliente.post('/gerar_pdf_alteracoes'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Custo por item: formulários (criar/editar/deletar) x lotes da API JSON.
+
+Uso: python benchmarks/bench_api.py [itens] [tamanho_lote]
+"""
+import sys
+import time
+
+from comum import preparar_ambiente, criar_cliente, gerar_etiqueta
+
+CAMPOS = ('nome', 'descricao', 'codigo', 'categoria', 'preco', 'tamanho')
+
+
+def cronometrar(titulo, itens, funcao):
+    inicio = time.perf_counter()
+    funcao()
+    duracao = time.perf_counter() - inicio
+    print(f'{titulo:<32} {itens / duracao:10.0f} itens/s   {duracao / itens * 1e6:9.1f} µs/item')
+
+
+def main():
+    itens = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    tamanho_lote = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    modulo_app = preparar_ambiente()
+    cliente, user_id = criar_cliente(modulo_app)
+    with modulo_app.app.app_context():
+        token = modulo_app.criar_token(modulo_app.get_db_connection(), user_id, 'bench')
+    cabecalhos = {'Authorization': f'Bearer {token}'}
+
+    def dados(i, prefixo):
+        valores = dict(zip(CAMPOS, gerar_etiqueta(i, user_id)))
+        valores['codigo'] = f"{prefixo}-{valores['codigo']}"
+        return valores
+
+    def sem_flash(resposta):
+        # As mensagens acumuladas no cookie de sessão distorceriam a medição
+        with cliente.session_transaction() as sessao:
+            sessao.pop('_flashes', None)
+        return resposta
+
+    def formularios():
+        for i in range(itens):
+            sem_flash(cliente.post('/criar', data=dados(i, 'F')))
+
+    ids = []
+
+    def lotes_criacao():
+        for inicio in range(0, itens, tamanho_lote):
+            resposta = cliente.post('/api/v1/etiquetas', headers=cabecalhos, json={
+                'etiquetas': [dados(i, 'A') for i in range(inicio, min(inicio + tamanho_lote, itens))]
+            })
+            ids.extend(resposta.get_json()['ids'])
+
+    def lotes_atualizacao():
+        for inicio in range(0, itens, tamanho_lote):
+            cliente.patch('/api/v1/etiquetas', headers=cabecalhos, json={
+                'etiquetas': [{'id': id, 'preco': 9.99} for id in ids[inicio:inicio + tamanho_lote]]
+            })
+
+    def lotes_remocao():
+        for inicio in range(0, itens, tamanho_lote):
+            cliente.delete('/api/v1/etiquetas', headers=cabecalhos, json={'ids': ids[inicio:inicio + tamanho_lote]})
+
+    cronometrar('POST /criar (formulário)', itens, formularios)
+    with modulo_app.app.app_context():
+        ids_formulario = [linha['id'] for linha in modulo_app.get_db_connection().execute(
+            "SELECT id FROM etiquetas WHERE codigo LIKE 'F-%'")]
+    cronometrar('GET /deletar (formulário)', itens,
+                lambda: [sem_flash(cliente.get(f'/deletar/{id}')) for id in ids_formulario])
+
+    cronometrar(f'API POST lote de {tamanho_lote}', itens, lotes_criacao)
+    cronometrar(f'API PATCH lote de {tamanho_lote}', itens, lotes_atualizacao)
+    cronometrar(f'API DELETE lote de {tamanho_lote}', itens, lotes_remocao)
+
+
+if __name__ == '__main__':
+    main()
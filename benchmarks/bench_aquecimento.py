@@ -0,0 +1,76 @@
+"""Partida a frio: tempo de import do app e latência das primeiras requisições.
+
+Cada medição roda num processo Python novo, com e sem o aquecimento
+(aquecer_processo + aquecer_worker), para que nada venha de execuções anteriores.
+
+Uso: python benchmarks/bench_aquecimento.py [etiquetas]
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+from comum import RAIZ, preparar_ambiente, criar_cliente, popular_etiquetas
+
+ROTAS = ('/', '/buscar?q=Arroz', '/gerar_pdf/{id}', '/gerar_pdf_todas')
+
+# Executado no processo novo: importa o app, opcionalmente aquece e mede as rotas
+MEDICAO = '''
+import json, os, sys, time
+sys.path.insert(0, {raiz!r})
+inicio = time.perf_counter()
+import app as modulo_app
+importacao = time.perf_counter() - inicio
+aquecimento = 0.0
+if {aquecer}:
+    import aquecimento as modulo
+    inicio = time.perf_counter()
+    modulo.aquecer_processo(modulo_app.app)
+    modulo.aquecer_worker()
+    aquecimento = time.perf_counter() - inicio
+cliente = modulo_app.app.test_client()
+cliente.post('/login', data={{'username': 'bench', 'password': 'bench123'}})
+tempos = {{}}
+for rota in {rotas!r}:
+    for rodada in ('primeira', 'segunda'):
+        inicio = time.perf_counter()
+        resposta = cliente.get(rota)
+        resposta.get_data()
+        resposta.close()
+        tempos.setdefault(rota, {{}})[rodada] = time.perf_counter() - inicio
+print(json.dumps({{'importacao': importacao, 'aquecimento': aquecimento, 'rotas': tempos}}))
+'''
+
+
+def medir(aquecer, rotas, ambiente):
+    codigo = MEDICAO.format(raiz=RAIZ, aquecer=aquecer, rotas=rotas)
+    saida = subprocess.run([sys.executable, '-c', codigo], env=ambiente, capture_output=True, text=True, check=True)
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    modulo_app = preparar_ambiente()
+    _, user_id = criar_cliente(modulo_app)
+    popular_etiquetas(modulo_app, user_id, quantidade)
+    with modulo_app.app.app_context():
+        id = modulo_app.get_db_connection().execute('SELECT MIN(id) FROM etiquetas').fetchone()[0]
+    rotas = [rota.format(id=id) for rota in ROTAS]
+
+    # O cache em disco deixaria a segunda execução quente
+    ambiente = dict(os.environ, CACHE_DISCO_PASTA='')
+    for titulo, aquecer in (('sem aquecimento', False), ('com aquecimento', True)):
+        inicio = time.perf_counter()
+        resultado = medir(aquecer, rotas, ambiente)
+        total = time.perf_counter() - inicio
+        print(f"\n== {titulo} (processo: {total * 1000:.0f} ms) ==")
+        print(f"import do app        {resultado['importacao'] * 1000:8.1f} ms")
+        print(f"aquecimento          {resultado['aquecimento'] * 1000:8.1f} ms")
+        for rota, tempos in resultado['rotas'].items():
+            print(f"{rota:<20} 1ª {tempos['primeira'] * 1000:8.1f} ms   2ª {tempos['segunda'] * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Tabela principal com muitas excluídas, antes e depois da manutenção (arquivar + ANALYZE + VACUUM).
+
+Uso: python benchmarks/bench_arquivo.py [etiquetas] [fracao_excluida] [repeticoes]
+"""
+import os
+import sys
+import time
+
+from comum import preparar_ambiente, criar_cliente, popular_etiquetas, medir, imprimir
+
+
+def tamanho_banco(caminho):
+    return sum(os.path.getsize(caminho + sufixo) for sufixo in ('', '-wal') if os.path.exists(caminho + sufixo))
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    fracao = float(sys.argv[2]) if len(sys.argv) > 2 else 0.7
+    repeticoes = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    modulo_app = preparar_ambiente()
+    cliente, user_id = criar_cliente(modulo_app)
+    popular_etiquetas(modulo_app, user_id, quantidade)
+    caminho = os.environ['DATABASE']
+
+    with modulo_app.app.app_context():
+        conn = modulo_app.get_db_connection()
+        passo = round(1 / fracao) if fracao < 0.5 else None
+        if passo:
+            conn.execute('UPDATE etiquetas SET ativo = 0 WHERE id % ? = 0', (passo,))
+        else:
+            conn.execute('UPDATE etiquetas SET ativo = 0 WHERE id % 10 < ?', (round(fracao * 10),))
+        conn.execute("UPDATE etiquetas SET atualizado_em = datetime('now', '-60 days') WHERE ativo = 0")
+        conn.commit()
+        excluidas = conn.execute('SELECT COUNT(*) FROM etiquetas WHERE ativo = 0').fetchone()[0]
+    print(f'{quantidade} etiquetas, {excluidas} excluídas\n')
+
+    def catalogo():
+        with modulo_app.app.app_context():
+            modulo_app.get_db_connection().execute(
+                'SELECT * FROM etiquetas WHERE ativo = 1 AND user_id = ? ORDER BY nome', (user_id,)
+            ).fetchall()
+
+    def etapa(titulo):
+        print(f'{titulo}: banco {tamanho_banco(caminho) / 1024 / 1024:.1f} MiB')
+        imprimir('  rota /', medir(lambda: cliente.get('/'), repeticoes))
+        imprimir('  catálogo inteiro (gerar_pdf_todas)', medir(catalogo, max(repeticoes // 20, 3)))
+
+    etapa('antes')
+
+    inicio = time.perf_counter()
+    with modulo_app.app.app_context():
+        resumo = modulo_app.arquivo.manutencao(modulo_app.get_db_connection(), vacuum=True)
+    print(f"\nmanutenção: {resumo['arquivadas']} arquivadas em {time.perf_counter() - inicio:.2f} s\n")
+
+    etapa('depois')
+
+
+if __name__ == '__main__':
+    main()
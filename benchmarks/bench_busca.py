@@ -0,0 +1,47 @@
+"""Compara a busca FTS5 com a busca antiga por LIKE '%termo%'.
+
+Uso: python benchmarks/bench_busca.py [etiquetas] [repeticoes]
+"""
+import sys
+
+from comum import preparar_ambiente, criar_cliente, popular_etiquetas, medir, imprimir
+
+TERMOS = ['acucar', 'arroz integral', 'SKU-1-00042', 'maracuja']
+
+SQL_LIKE = '''SELECT * FROM etiquetas
+              WHERE ativo = 1 AND user_id = ?
+              AND (nome LIKE ? OR codigo LIKE ? OR categoria LIKE ?)
+              ORDER BY data_criacao DESC LIMIT 48'''
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    modulo_app = preparar_ambiente()
+    cliente, user_id = criar_cliente(modulo_app)
+    popular_etiquetas(modulo_app, user_id, quantidade)
+    print(f'{quantidade} etiquetas\n')
+
+    with modulo_app.app.app_context():
+        conn = modulo_app.get_db_connection()
+
+        for termo in TERMOS:
+            like = f'%{termo}%'
+            imprimir(f'LIKE  "{termo}"', medir(
+                lambda: conn.execute(SQL_LIKE, (user_id, like, like, like)).fetchall(),
+                repeticoes
+            ))
+
+            sql, parametros = modulo_app.sql_busca(modulo_app.expressao_fts(termo))
+            sql += ' AND user_id = ? ORDER BY relevancia, id LIMIT 48'
+            imprimir(f'FTS5  "{termo}"', medir(
+                lambda: conn.execute(sql, parametros + (user_id,)).fetchall(),
+                repeticoes
+            ))
+
+    imprimir('rota /buscar?q=acucar', medir(lambda: cliente.get('/buscar?q=acucar'), repeticoes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""Reimpressão da mesma etiqueta com e sem o cache de PDF/QR.
+
+Uso: python benchmarks/bench_cache.py [repeticoes]
+"""
+import sys
+
+from comum import preparar_ambiente, criar_cliente, popular_etiquetas, medir, imprimir
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    modulo_app = preparar_ambiente()
+    cliente, user_id = criar_cliente(modulo_app)
+    popular_etiquetas(modulo_app, user_id, 1)
+    with modulo_app.app.app_context():
+        conn = modulo_app.get_db_connection()
+        etiqueta = conn.execute('SELECT * FROM etiquetas').fetchone()
+
+    cache_pdf, cache_qr = modulo_app.cache_pdf, modulo_app.cache_qr
+    max_pdf, max_qr = cache_pdf.memoria.max_itens, cache_qr.max_itens
+
+    cache_pdf.memoria.max_itens = cache_qr.max_itens = 0
+    imprimir('renderização sem cache', medir(lambda: modulo_app.renderizar_pdf_etiqueta(etiqueta), repeticoes))
+    imprimir('rota /gerar_pdf sem cache', medir(lambda: cliente.get(f"/gerar_pdf/{etiqueta['id']}"), repeticoes))
+
+    cache_pdf.memoria.max_itens, cache_qr.max_itens = max_pdf, max_qr
+    chave = modulo_app.chave_etiqueta(etiqueta)
+
+    def consulta_cache():
+        conteudo = cache_pdf.obter(chave)
+        if conteudo is None:
+            cache_pdf.guardar(chave, modulo_app.renderizar_pdf_etiqueta(etiqueta))
+
+    imprimir('consulta ao cache (acerto)', medir(consulta_cache, repeticoes))
+    imprimir('rota /gerar_pdf com cache', medir(lambda: cliente.get(f"/gerar_pdf/{etiqueta['id']}"), repeticoes))
+    print(cliente.get('/cache/estatisticas').get_json())
+
+
+if __name__ == '__main__':
+    main()
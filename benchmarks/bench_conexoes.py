@@ -0,0 +1,48 @@
+"""Compara conexão por requisição com o pool de conexões.
+
+Uso: python benchmarks/bench_conexoes.py [repeticoes] [etiquetas]
+"""
+import itertools
+import sys
+
+from comum import preparar_ambiente, criar_cliente, popular_etiquetas, medir, imprimir
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    quantidade = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    modulo_app = preparar_ambiente()
+    banco = modulo_app.banco
+    cliente, user_id = criar_cliente(modulo_app)
+    popular_etiquetas(modulo_app, user_id, quantidade)
+
+    contador = itertools.count()
+
+    def criar():
+        n = next(contador)
+        cliente.post('/criar', data={'nome': f'Bench {n}', 'codigo': f'BENCH-{n}',
+                                     'categoria': 'Bench', 'preco': '9.90'})
+        # Sem seguir o redirect as mensagens flash se acumulariam no cookie
+        with cliente.session_transaction() as sessao:
+            sessao.pop('_flashes', None)
+
+    cenarios = [
+        ('sem pool (connect por requisição)', 0, {}),
+        (f'pool ({banco.DB_POOL_SIZE} conexões) + pragmas', banco.DB_POOL_SIZE, banco.DB_PRAGMAS),
+    ]
+    rotas = [('index', lambda: cliente.get('/')), ('criar', criar)]
+
+    # O index roda antes do criar para medir sempre a mesma quantidade de etiquetas
+    for rota, funcao in rotas:
+        for titulo, tamanho, pragmas in cenarios:
+            banco.pool.fechar_todas()
+            banco.pool.tamanho = tamanho
+            banco.pool.pragmas = dict(pragmas)
+            banco.pool._reiniciar()
+
+            imprimir(f'{rota:<7} | {titulo}', medir(funcao, repeticoes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""Pico de memória e vazão da exportação CSV/JSON Lines em streaming, por tamanho do catálogo.
+
+Uso: python benchmarks/bench_exportacao_dados.py [etiquetas,...]
+"""
+import sys
+import time
+import tracemalloc
+
+from comum import preparar_ambiente, criar_cliente, popular_etiquetas
+
+
+def main():
+    quantidades = [int(n) for n in sys.argv[1].split(',')] if len(sys.argv) > 1 else [10_000, 50_000, 200_000]
+
+    modulo_app = preparar_ambiente()
+
+    for quantidade in quantidades:
+        # Um usuário por tamanho de catálogo
+        cliente, user_id = criar_cliente(modulo_app, f'bench{quantidade}')
+        popular_etiquetas(modulo_app, user_id, quantidade)
+
+        for formato in ('csv', 'ndjson'):
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            resposta = cliente.get(f'/exportar/{formato}', buffered=False)
+            tamanho = sum(len(pedaco) for pedaco in resposta.response)
+            resposta.close()
+            duracao = time.perf_counter() - inicio
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f'{quantidade:>8} etiquetas {formato:<7} {quantidade / duracao:10.0f} linhas/s   '
+                  f'pico {pico / 2**20:6.2f} MiB   {tamanho / 2**20:7.1f} MiB exportados')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Pico de memória da exportação completa: fetchall + reportlab x streaming incremental.
+
+Uso: python benchmarks/bench_exportacao_memoria.py [etiquetas] [folha]
+"""
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+from comum import preparar_ambiente, criar_cliente, popular_etiquetas
+
+SQL = 'SELECT * FROM etiquetas WHERE ativo = 1 AND user_id = ? ORDER BY nome'
+
+
+def medir_memoria(titulo, funcao):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    tamanho, primeiro_byte = funcao(inicio)
+    duracao = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{titulo:<32} pico {pico / 2**20:8.1f} MiB   total {duracao:7.1f} s   '
+          f'primeiro byte {primeiro_byte:7.2f} s   {tamanho / 2**20:7.1f} MiB de PDF')
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    formato = sys.argv[2] if len(sys.argv) > 2 else 'a4'
+
+    modulo_app = preparar_ambiente()
+    _, user_id = criar_cliente(modulo_app)
+    popular_etiquetas(modulo_app, user_id, quantidade)
+    print(f'{quantidade} etiquetas, folha {formato}\n')
+
+    # Sem cache de QR para medir só a renderização
+    modulo_app.cache_qr.max_itens = 0
+
+    from reportlab.pdfgen import canvas
+
+    def em_memoria(inicio):
+        with modulo_app.app.app_context():
+            etiquetas = modulo_app.get_db_connection().execute(SQL, (user_id,)).fetchall()
+            buffer = BytesIO()
+            pdf = canvas.Canvas(buffer)
+            modulo_app.renderizar(pdf, etiquetas, formato)
+            pdf.save()
+            return buffer.getbuffer().nbytes, time.perf_counter() - inicio
+
+    def streaming(inicio):
+        tamanho, primeiro_byte = 0, None
+        with modulo_app.app.app_context():
+            cursor = modulo_app.get_db_connection().execute(SQL, (user_id,))
+            for dados in modulo_app.gerar_pdf_incremental(modulo_app.iterar_lotes(cursor), formato):
+                if primeiro_byte is None:
+                    primeiro_byte = time.perf_counter() - inicio
+                tamanho += len(dados)
+        return tamanho, primeiro_byte
+
+    medir_memoria('fetchall + canvas em BytesIO', em_memoria)
+    medir_memoria('streaming incremental', streaming)
+
+
+if __name__ == '__main__':
+    main()
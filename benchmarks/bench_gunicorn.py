@@ -0,0 +1,81 @@
+"""Clientes simultâneos: gunicorn padrão (1 worker sync) x gunicorn.conf.py.
+
+Um cliente baixa gerar_pdf_todas sem parar enquanto os demais navegam
+(listagem, busca, PDF individual). Mede a latência de quem navega e a
+vazão total em cada configuração.
+
+Uso: python benchmarks/bench_gunicorn.py [clientes] [segundos] [etiquetas]
+"""
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+from comum import RAIZ, preparar_ambiente, estatisticas
+from suite import (ClienteHTTP, cenario_index, cenario_buscar, cenario_gerar_pdf,
+                   iniciar_gunicorn, popular, porta_livre)
+
+CONFIGURACOES = (
+    ('padrão (Procfile anterior)', None),
+    ('gunicorn.conf.py', os.path.join(RAIZ, 'gunicorn.conf.py')),
+)
+
+
+def medir_configuracao(config, usuarios, clientes, segundos):
+    porta = porta_livre()
+    processo = iniciar_gunicorn(SimpleNamespace(config=config, workers=None), porta)
+    try:
+        base = f'http://127.0.0.1:{porta}'
+        tempos, pesadas = [], []
+        fim = time.perf_counter() + segundos
+
+        def navegar(usuario):
+            cliente = ClienteHTTP(base, usuario)
+            cenarios = (cenario_index, cenario_buscar, cenario_gerar_pdf)
+            i = 0
+            while time.perf_counter() < fim:
+                metodo, caminho, dados = cenarios[i % len(cenarios)](usuario)
+                inicio = time.perf_counter()
+                cliente.requisitar(metodo, caminho, dados)
+                tempos.append(time.perf_counter() - inicio)
+                i += 1
+
+        def exportar(usuario):
+            cliente = ClienteHTTP(base, usuario)
+            while time.perf_counter() < fim:
+                inicio = time.perf_counter()
+                cliente.requisitar('GET', '/gerar_pdf_todas', None)
+                pesadas.append(time.perf_counter() - inicio)
+
+        threads = [threading.Thread(target=exportar, args=(usuarios[0],))]
+        threads += [threading.Thread(target=navegar, args=(usuarios[i % len(usuarios)],))
+                    for i in range(clientes - 1)]
+        inicio = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return estatisticas(tempos, time.perf_counter() - inicio), len(pesadas)
+    finally:
+        processo.terminate()
+        processo.wait()
+
+
+def main():
+    clientes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    segundos = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    etiquetas = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+
+    modulo_app = preparar_ambiente()
+    usuarios = popular(modulo_app, SimpleNamespace(usuarios=2, etiquetas=etiquetas))
+
+    for titulo, config in CONFIGURACOES:
+        resultado, pesadas = medir_configuracao(config, usuarios, clientes, segundos)
+        print(f"{titulo:<28} {resultado['por_segundo']:>8.1f} req/s   p50 {resultado['p50_ms']:8.1f} ms"
+              f"   p95 {resultado['p95_ms']:8.1f} ms   p99 {resultado['p99_ms']:8.1f} ms"
+              f"   ({pesadas} gerar_pdf_todas)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Linhas por segundo da importação em lote por tamanho de lote (1 = commit por linha, como o criar()).
+
+Uso: python benchmarks/bench_importacao.py [linhas] [lotes,...]
+"""
+import csv
+import io
+import sys
+import time
+
+from comum import preparar_ambiente, criar_cliente, gerar_etiqueta
+
+
+def gerar_csv(quantidade, prefixo, user_id):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=';')
+    escritor.writerow(['nome', 'descricao', 'codigo', 'categoria', 'preco', 'tamanho'])
+    for i in range(quantidade):
+        nome, descricao, codigo, categoria, preco, tamanho, _ = gerar_etiqueta(i, user_id)
+        escritor.writerow([nome, descricao, f'{prefixo}-{codigo}', categoria, f'{preco:.2f}'.replace('.', ','), tamanho])
+    return buffer.getvalue().encode('utf-8')
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    lotes = [int(n) for n in sys.argv[2].split(',')] if len(sys.argv) > 2 else [1, 100, 1000, 5000]
+
+    modulo_app = preparar_ambiente()
+    cliente, user_id = criar_cliente(modulo_app)
+    import importacao
+    print(f'{quantidade} linhas por cenário\n')
+
+    for lote in lotes:
+        # Commit por linha é lento demais para o arquivo inteiro
+        linhas = min(quantidade, 5000) if lote == 1 else quantidade
+        dados = gerar_csv(linhas, f'L{lote}', user_id)
+        with modulo_app.app.app_context():
+            conn = modulo_app.get_db_connection()
+            inicio = time.perf_counter()
+            resumo = importacao.importar(conn, importacao.ler_linhas(io.BytesIO(dados), 'x.csv'), user_id, lote=lote)
+            duracao = time.perf_counter() - inicio
+        print(f'lote {lote:>5}   {linhas / duracao:10.0f} linhas/s   {duracao:7.2f} s   '
+              f"{resumo['inseridas']} inseridas, {resumo['total_erros']} erros")
+
+    # Mesmo arquivo de novo pelo endpoint: todas as linhas viram atualizações
+    dados = gerar_csv(quantidade, f'L{lotes[-1]}', user_id)
+    inicio = time.perf_counter()
+    resposta = cliente.post('/importar?formato=json', data={
+        'arquivo': (io.BytesIO(dados), 'etiquetas.csv'), 'upsert': '1',
+    }, content_type='multipart/form-data')
+    duracao = time.perf_counter() - inicio
+    resumo = resposta.get_json()
+    print(f'\nupsert via HTTP   {quantidade / duracao:10.0f} linhas/s   {duracao:7.2f} s   '
+          f"{resumo['atualizadas']} atualizadas, {resumo['total_erros']} erros")
+
+    # Reimportação sem upsert: todas as linhas são conflitos por linha
+    inicio = time.perf_counter()
+    resposta = cliente.post('/importar?formato=json', data={
+        'arquivo': (io.BytesIO(dados), 'etiquetas.csv'),
+    }, content_type='multipart/form-data')
+    duracao = time.perf_counter() - inicio
+    resumo = resposta.get_json()
+    print(f'conflitos via HTTP {quantidade / duracao:9.0f} linhas/s   {duracao:7.2f} s   '
+          f"{resumo['total_erros']} erros, {len(resumo['erros'])} detalhados")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Mede páginas/s e bytes por etiqueta do motor de layout em cada formato de folha.
+
+Antes de medir, as etiquetas são renderizadas uma vez (cache de QR, fontes e
+modelo) e cada formato renderiza um lote pequeno descartado, para que o
+primeiro formato não pague a preparação que os seguintes reaproveitam.
+
+Uso: python benchmarks/bench_layout.py [etiquetas] [folha ...]
+"""
+import sys
+import time
+from io import BytesIO
+
+from comum import RAIZ, gerar_etiqueta
+
+sys.path.insert(0, RAIZ)
+
+from reportlab.pdfgen import canvas  # noqa: E402
+
+from layout_pdf import FOLHAS, renderizar  # noqa: E402
+
+CAMPOS = ('nome', 'descricao', 'codigo', 'categoria', 'preco', 'tamanho', 'user_id')
+
+AQUECIMENTO = 50
+
+
+def pdf_descartavel(etiquetas, formato):
+    renderizar(canvas.Canvas(BytesIO()), etiquetas, formato)
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    formatos = sys.argv[2:] or list(FOLHAS)
+
+    etiquetas = [dict(zip(CAMPOS, gerar_etiqueta(i, 1)), id=i, simbologia='qr') for i in range(quantidade)]
+    print(f'{quantidade} etiquetas\n')
+    pdf_descartavel(etiquetas, formatos[0])
+
+    for formato in formatos:
+        pdf_descartavel(etiquetas[:AQUECIMENTO], formato)
+
+        buffer = BytesIO()
+        pdf = canvas.Canvas(buffer)
+
+        inicio = time.perf_counter()
+        total, paginas = renderizar(pdf, etiquetas, formato)
+        pdf.save()
+        duracao = time.perf_counter() - inicio
+
+        tamanho = buffer.getbuffer().nbytes
+        print(f'{formato:<14} {paginas:>6} páginas  {paginas / duracao:8.1f} páginas/s  '
+              f'{total / duracao:8.1f} etiquetas/s  {tamanho / total:8.0f} bytes/etiqueta')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""Impressão de N etiquetas: N downloads de /gerar_pdf x um único POST em /gerar_pdf_lote.
+
+Uso: python benchmarks/bench_lote.py [etiquetas] [folha]
+"""
+import sys
+import time
+
+from comum import preparar_ambiente, criar_cliente, popular_etiquetas
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    formato = sys.argv[2] if len(sys.argv) > 2 else 'a4'
+
+    modulo_app = preparar_ambiente()
+    cliente, user_id = criar_cliente(modulo_app)
+    popular_etiquetas(modulo_app, user_id, quantidade)
+    with modulo_app.app.app_context():
+        ids = [linha['id'] for linha in modulo_app.get_db_connection().execute('SELECT id FROM etiquetas')]
+    print(f'{quantidade} etiquetas, folha {formato}\n')
+
+    # Sem cache para comparar o trabalho de renderização de fato
+    modulo_app.cache_pdf.memoria.max_itens = modulo_app.cache_qr.max_itens = 0
+
+    inicio = time.perf_counter()
+    tamanho = sum(len(cliente.get(f'/gerar_pdf/{id}').data) for id in ids)
+    duracao = time.perf_counter() - inicio
+    print(f'{quantidade} x /gerar_pdf          {duracao:7.2f} s   {duracao / quantidade * 1000:7.2f} ms/etiqueta   '
+          f'{tamanho / 1024:8.1f} KiB em {quantidade} arquivos')
+
+    inicio = time.perf_counter()
+    resposta = cliente.post('/gerar_pdf_lote', data={'ids': ids, 'folha': formato, 'modo': 'ids'})
+    tamanho = len(resposta.data)
+    duracao = time.perf_counter() - inicio
+    print(f'1 x /gerar_pdf_lote          {duracao:7.2f} s   {duracao / quantidade * 1000:7.2f} ms/etiqueta   '
+          f'{tamanho / 1024:8.1f} KiB em 1 arquivo')
+
+
+if __name__ == '__main__':
+    main()
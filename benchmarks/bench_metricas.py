@@ -0,0 +1,61 @@
+"""Custo da instrumentação (middleware + conexão medida) e fases por rota.
+
+Uso: python benchmarks/bench_metricas.py [etiquetas] [repeticoes]
+"""
+import sqlite3
+import sys
+
+from comum import preparar_ambiente, criar_cliente, popular_etiquetas, medir, imprimir
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    modulo_app = preparar_ambiente()
+    cliente, user_id = criar_cliente(modulo_app)
+    popular_etiquetas(modulo_app, user_id, quantidade)
+    with modulo_app.app.app_context():
+        token = modulo_app.criar_token(modulo_app.get_db_connection(), user_id, 'bench')
+    cabecalhos = {'Authorization': f'Bearer {token}'}
+
+    import banco
+    import metricas
+
+    # Consulta pontual: conexão comum x conexão medida, dentro de uma requisição
+    with modulo_app.app.test_request_context():
+        from flask import request
+        request.environ[metricas.CHAVE] = metricas.Medicao('GET')
+        for titulo, fabrica in (('consulta (sqlite3.Connection)', sqlite3.Connection),
+                                ('consulta (ConexaoMedida)', banco.ConexaoMedida)):
+            conn = sqlite3.connect(banco.DATABASE, factory=fabrica)
+            imprimir(titulo, medir(
+                lambda: conn.execute('SELECT * FROM etiquetas WHERE id = ?', (1,)).fetchone(),
+                repeticoes * 20
+            ))
+            conn.close()
+
+    # Rotas com e sem o middleware
+    instrumentado = modulo_app.app.wsgi_app
+    for titulo, wsgi_app in (('sem middleware', instrumentado.wsgi_app), ('com middleware', instrumentado)):
+        modulo_app.app.wsgi_app = wsgi_app
+        imprimir(f'/ {titulo}', medir(lambda: cliente.get('/'), repeticoes))
+        imprimir(f'/api/v1/etiquetas {titulo}',
+                 medir(lambda: cliente.get('/api/v1/etiquetas?limite=50', headers=cabecalhos), repeticoes))
+    modulo_app.app.wsgi_app = instrumentado
+
+    resposta = cliente.get('/')
+    print(f"\nServer-Timing: {resposta.headers.get('Server-Timing')}")
+    print(f"X-Consultas:   {resposta.headers.get('X-Consultas')}")
+
+    metricas.registro.limpar()
+    # A medição de respostas em streaming só é registrada quando o servidor fecha a resposta
+    resposta = cliente.get('/gerar_pdf_todas')
+    resposta.get_data()
+    resposta.close()
+    print('\n' + '\n'.join(linha for linha in metricas.registro.exportar().splitlines()
+                           if 'fase_segundos' in linha or 'consultas_total{' in linha))
+
+
+if __name__ == '__main__':
+    main()
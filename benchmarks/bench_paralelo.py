@@ -0,0 +1,52 @@
+"""Vazão da exportação completa com renderização paralela por número de processos.
+
+Uso: python benchmarks/bench_paralelo.py [etiquetas] [folha] [workers,...]
+"""
+import os
+import sys
+import time
+
+from comum import preparar_ambiente, criar_cliente, popular_etiquetas
+
+SQL = 'SELECT * FROM etiquetas WHERE ativo = 1 AND user_id = ? ORDER BY nome'
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    formato = sys.argv[2] if len(sys.argv) > 2 else 'a4'
+    cpus = os.cpu_count() or 1
+    if len(sys.argv) > 3:
+        contagens = [int(n) for n in sys.argv[3].split(',')]
+    else:
+        contagens = sorted({1, 2, max(cpus // 2, 1), cpus})
+
+    modulo_app = preparar_ambiente()
+    _, user_id = criar_cliente(modulo_app)
+    popular_etiquetas(modulo_app, user_id, quantidade)
+    print(f'{quantidade} etiquetas, folha {formato}, {cpus} CPUs\n')
+
+    # Sem cache de QR para medir só a renderização
+    modulo_app.cache_qr.max_itens = 0
+
+    import layout_pdf
+    base = None
+    for workers in contagens:
+        if workers > 1:
+            # Sobe o pool antes de medir: em produção ele é persistente
+            layout_pdf._obter_pool_render(workers).submit(int).result()
+
+        inicio = time.perf_counter()
+        tamanho = 0
+        with modulo_app.app.app_context():
+            cursor = modulo_app.get_db_connection().execute(SQL, (user_id,))
+            for dados in layout_pdf.gerar_pdf_incremental(layout_pdf.iterar_lotes(cursor), formato, workers):
+                tamanho += len(dados)
+        duracao = time.perf_counter() - inicio
+
+        base = base or duracao
+        print(f'{workers:>3} processo(s) {quantidade / duracao:10.0f} etiquetas/s   '
+              f'total {duracao:7.2f} s   speedup {base / duracao:5.2f}x   {tamanho / 2**20:7.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Latência do PDF de uma etiqueta: QR via arquivo temporário x memória x máscara de 1 bit.
+
+Uso: python benchmarks/bench_qr.py [repeticoes]
+"""
+import os
+import sys
+import tempfile
+from io import BytesIO
+
+from comum import RAIZ, preparar_ambiente, criar_cliente, popular_etiquetas, medir, imprimir
+
+sys.path.insert(0, RAIZ)
+
+import qrcode  # noqa: E402
+from reportlab.lib.pagesizes import A4  # noqa: E402
+from reportlab.lib.utils import ImageReader  # noqa: E402
+from reportlab.pdfgen import canvas  # noqa: E402
+
+from layout_pdf import qr_matriz, desenhar_qr  # noqa: E402
+
+ETIQUETA = {'id': 1, 'codigo': 'SKU-1-0000042', 'nome': 'Pão de açúcar 42'}
+PASTA = tempfile.mkdtemp(prefix='bench_qr_')
+
+
+def qr_pil(etiqueta):
+    qr = qrcode.QRCode(version=1, box_size=2, border=1)
+    qr.add_data(f"Código: {etiqueta['codigo']}\nNome: {etiqueta['nome']}")
+    qr.make(fit=True)
+    return qr.make_image(fill_color="black", back_color="white")
+
+
+def pdf_arquivo_temporario():
+    """Caminho antigo: salva o PNG em disco, o reportlab relê e depois apaga"""
+    pdf = canvas.Canvas(BytesIO(), pagesize=A4)
+    caminho = os.path.join(PASTA, f"qr_{ETIQUETA['id']}.png")
+    qr_pil(ETIQUETA).save(caminho)
+    pdf.drawImage(caminho, 400, 600, 100, 100)
+    pdf.save()
+    os.remove(caminho)
+
+
+def pdf_imagem_em_memoria():
+    pdf = canvas.Canvas(BytesIO(), pagesize=A4)
+    pdf.drawImage(ImageReader(qr_pil(ETIQUETA).get_image()), 400, 600, 100, 100)
+    pdf.save()
+
+
+def pdf_mascara():
+    pdf = canvas.Canvas(BytesIO(), pagesize=A4)
+    desenhar_qr(pdf, qr_matriz(ETIQUETA), 400, 600, 100)
+    pdf.save()
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+
+    imprimir('arquivo temporário (antigo)', medir(pdf_arquivo_temporario, repeticoes))
+    imprimir('ImageReader em memória', medir(pdf_imagem_em_memoria, repeticoes))
+    imprimir('QR máscara de 1 bit (inline)', medir(pdf_mascara, repeticoes))
+
+    modulo_app = preparar_ambiente()
+    cliente, user_id = criar_cliente(modulo_app)
+    popular_etiquetas(modulo_app, user_id, 1)
+    with modulo_app.app.app_context():
+        id = modulo_app.get_db_connection().execute('SELECT id FROM etiquetas').fetchone()[0]
+    imprimir('rota /gerar_pdf/<id>', medir(lambda: cliente.get(f'/gerar_pdf/{id}'), repeticoes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Bytes por etiqueta do PDF: canvas do reportlab x CanvasIncremental em cada
+nível de compressão e na saída para gráfica, para QR e EAN-13.
+
+O cache de QR é aquecido antes, então etiquetas/s mede só desenho e escrita.
+
+Uso: python benchmarks/bench_saida_pdf.py [etiquetas] [folha ...]
+"""
+import sys
+import time
+from io import BytesIO
+
+from comum import RAIZ, gerar_etiqueta
+
+sys.path.insert(0, RAIZ)
+
+from reportlab.pdfgen import canvas  # noqa: E402
+
+from layout_pdf import (TAMANHOS, FOLHAS, renderizar, iniciar_pagina, desenhar_etiqueta,  # noqa: E402
+                        geometria)
+from pdf_incremental import CanvasIncremental, NIVEL_COMPRESSAO  # noqa: E402
+
+CAMPOS = ('nome', 'descricao', 'codigo', 'categoria', 'preco', 'tamanho', 'user_id')
+
+
+def etiquetas_sinteticas(quantidade, simbologia):
+    etiquetas = []
+    for i in range(quantidade):
+        etiqueta = dict(zip(CAMPOS, gerar_etiqueta(i, 1)), id=i, simbologia=simbologia)
+        if simbologia == 'ean13':
+            etiqueta['codigo'] = f'789{i:09d}'
+        etiquetas.append(etiqueta)
+    return etiquetas
+
+
+def pdf_reportlab(etiquetas, formato):
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer)
+    renderizar(pdf, etiquetas, formato)
+    pdf.save()
+    return buffer.getvalue()
+
+
+def pdf_incremental(etiquetas, formato, **opcoes):
+    pdf = CanvasIncremental(**opcoes)
+    renderizar(pdf, etiquetas, formato)
+    pdf.save()
+    return pdf.retirar()
+
+
+def pdf_uma_etiqueta(etiqueta, **opcoes):
+    """Como o /gerar_pdf/<id>: uma etiqueta numa página A4"""
+    pdf = CanvasIncremental(**opcoes)
+    largura, altura = TAMANHOS[etiqueta['tamanho']]
+    iniciar_pagina(pdf)
+    desenhar_etiqueta(pdf, etiqueta, 50, 750 - altura, geometria(largura, altura))
+    pdf.save()
+    return pdf.retirar()
+
+
+VARIANTES = (
+    ('reportlab Canvas', pdf_reportlab, {}),
+    ('incremental nível 1', pdf_incremental, {'nivel_compressao': 1}),
+    (f'incremental nível {NIVEL_COMPRESSAO} (padrão)', pdf_incremental, {}),
+    ('incremental nível 9', pdf_incremental, {'nivel_compressao': 9}),
+    ('incremental para gráfica', pdf_incremental, {'impressao': True}),
+)
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    formatos = sys.argv[2:] or ['a4', 'termica']
+
+    for simbologia in ('qr', 'ean13'):
+        etiquetas = etiquetas_sinteticas(quantidade, simbologia)
+        pdf_incremental(etiquetas, 'a4')
+
+        print(f'\n== {simbologia}: {quantidade} etiquetas ==')
+        for formato in formatos:
+            print(f'-- {FOLHAS[formato].descricao}')
+            for titulo, funcao, opcoes in VARIANTES:
+                inicio = time.perf_counter()
+                tamanho = len(funcao(etiquetas, formato, **opcoes))
+                duracao = time.perf_counter() - inicio
+                print(f'{titulo:<30} {tamanho / quantidade:8.0f} bytes/etiqueta  '
+                      f'{quantidade / duracao:8.0f} etiquetas/s  ({tamanho / 1024:,.0f} KiB)')
+
+        print('-- PDF de uma etiqueta (/gerar_pdf)')
+        for titulo, opcoes in (('tela', {}), ('para gráfica', {'impressao': True})):
+            print(f'{titulo:<30} {len(pdf_uma_etiqueta(etiquetas[0], **opcoes)):8d} bytes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""Tamanho e tempo de geração: PDF (folha termica) x ZPL x EPL para N etiquetas.
+
+Uso: python benchmarks/bench_termica.py [etiquetas] [dpi]
+"""
+import sys
+import time
+
+from comum import preparar_ambiente, criar_cliente, popular_etiquetas
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    dpi = int(sys.argv[2]) if len(sys.argv) > 2 else 203
+
+    modulo_app = preparar_ambiente(RENDER_WORKERS=1)
+    cliente, user_id = criar_cliente(modulo_app)
+    popular_etiquetas(modulo_app, user_id, quantidade)
+    print(f'{quantidade} etiquetas, {dpi} dpi\n')
+
+    # Sem cache de QR: cada caminho paga a própria codificação
+    modulo_app.cache_qr.max_itens = 0
+
+    caminhos = [
+        ('PDF (folha termica)', '/gerar_pdf_todas?folha=termica&stream=1'),
+        ('ZPL', f'/gerar_termica_todas?linguagem=zpl&dpi={dpi}'),
+        ('EPL', f'/gerar_termica_todas?linguagem=epl&dpi={dpi}'),
+    ]
+    for titulo, url in caminhos:
+        inicio = time.perf_counter()
+        tamanho = len(cliente.get(url).data)
+        duracao = time.perf_counter() - inicio
+        print(f'{titulo:<22} {duracao:7.2f} s   {duracao / quantidade * 1000:7.3f} ms/etiqueta   '
+              f'{tamanho / 1024:9.1f} KiB   {tamanho / quantidade:7.0f} bytes/etiqueta')
+
+
+if __name__ == '__main__':
+    main()
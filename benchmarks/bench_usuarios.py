@@ -0,0 +1,37 @@
+"""Rota / (index) com e sem o cache de usuários do load_user.
+
+Uso: python benchmarks/bench_usuarios.py [repeticoes] [etiquetas]
+"""
+import sys
+
+from comum import preparar_ambiente, criar_cliente, popular_etiquetas, medir, imprimir
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    quantidade = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    modulo_app = preparar_ambiente()
+    cliente, user_id = criar_cliente(modulo_app)
+    popular_etiquetas(modulo_app, user_id, quantidade)
+    cache_usuarios = modulo_app.cache_usuarios
+    max_itens = cache_usuarios.max_itens
+
+    cache_usuarios.max_itens = 0
+    cache_usuarios.limpar()
+    imprimir('load_user sem cache', medir(lambda: modulo_app.load_user(user_id), repeticoes))
+    imprimir('rota / sem cache', medir(lambda: cliente.get('/'), repeticoes))
+
+    cache_usuarios.max_itens = max_itens
+    cache_usuarios.acertos = cache_usuarios.falhas = 0
+    imprimir('load_user com cache', medir(lambda: modulo_app.load_user(user_id), repeticoes))
+    imprimir('rota / com cache', medir(lambda: cliente.get('/'), repeticoes))
+
+    estatisticas = cliente.get('/cache/estatisticas').get_json()['usuarios']
+    print(f"\ntaxa de acerto {estatisticas['taxa_acerto']:.1%}   "
+          f"custo médio da consulta {estatisticas['custo_medio_falha_ms']:.3f} ms   "
+          f"economia estimada {estatisticas['economia_estimada_ms']:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
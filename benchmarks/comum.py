@@ -0,0 +1,117 @@
+"""Utilitários compartilhados pelos benchmarks.
+
+Os benchmarks rodam contra um banco SQLite temporário e um diretório de
+trabalho descartável, sem tocar no etiquetas.db do projeto.
+"""
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CATEGORIAS = ['Mercearia', 'Bebidas', 'Hortifruti', 'Padaria', 'Açougue',
+              'Laticínios', 'Limpeza', 'Higiene', 'Congelados', 'Pet']
+PRODUTOS = ['Arroz integral', 'Feijão carioca', 'Açúcar cristal', 'Café torrado',
+            'Pão de açúcar', 'Leite integral', 'Maçã fuji', 'Detergente neutro',
+            'Sabonete líquido', 'Queijo minas', 'Água mineral', 'Suco de maracujá']
+
+
+def preparar_ambiente(**env):
+    """Cria um diretório temporário com banco próprio e importa o app"""
+    pasta = tempfile.mkdtemp(prefix='bench_etiquetas_')
+    os.environ['DATABASE'] = os.path.join(pasta, 'etiquetas.db')
+    os.environ.update({k: str(v) for k, v in env.items()})
+    os.chdir(pasta)
+
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+
+    import app as modulo_app
+    modulo_app.app.config['TESTING'] = True
+    return modulo_app
+
+
+def criar_cliente(modulo_app, username='bench', senha='bench123'):
+    """Registra um usuário, faz login e devolve (cliente, user_id)"""
+    cliente = modulo_app.app.test_client()
+    cliente.post('/registro', data={
+        'username': username,
+        'email': f'{username}@exemplo.com',
+        'password': senha,
+        'password_confirm': senha,
+    })
+    cliente.post('/login', data={'username': username, 'password': senha})
+
+    with modulo_app.app.app_context():
+        conn = modulo_app.get_db_connection()
+        user_id = conn.execute(
+            'SELECT id FROM usuarios WHERE username = ?', (username,)
+        ).fetchone()['id']
+    return cliente, user_id
+
+
+def gerar_etiqueta(i, user_id):
+    """Gera a tupla de uma etiqueta sintética"""
+    nome = f'{random.choice(PRODUTOS)} {i}'
+    return (
+        nome,
+        f'Descrição de {nome.lower()}',
+        f'SKU-{user_id}-{i:07d}',
+        random.choice(CATEGORIAS),
+        round(random.uniform(0.5, 250), 2),
+        random.choice(['pequeno', 'medio', 'grande']),
+        user_id,
+    )
+
+
+def popular_etiquetas(modulo_app, user_id, quantidade, lote=5000):
+    """Insere etiquetas sintéticas em lotes"""
+    with modulo_app.app.app_context():
+        conn = modulo_app.get_db_connection()
+        for inicio in range(0, quantidade, lote):
+            fim = min(inicio + lote, quantidade)
+            conn.executemany(
+                '''INSERT INTO etiquetas
+                   (nome, descricao, codigo, categoria, preco, tamanho, user_id)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                [gerar_etiqueta(i, user_id) for i in range(inicio, fim)]
+            )
+            conn.commit()
+
+
+def medir(funcao, repeticoes):
+    """Executa a função N vezes e devolve estatísticas de latência"""
+    tempos = []
+    inicio_total = time.perf_counter()
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return estatisticas(tempos, time.perf_counter() - inicio_total)
+
+
+def estatisticas(tempos, total):
+    """Percentis e vazão de uma lista de latências (s) medidas em `total` segundos"""
+    tempos = sorted(tempos)
+
+    def percentil(fracao):
+        # Posto mais próximo: o menor valor que cobre a fração pedida
+        return tempos[max(math.ceil(len(tempos) * fracao) - 1, 0)] * 1000
+
+    return {
+        'repeticoes': len(tempos),
+        'por_segundo': len(tempos) / total,
+        'p50_ms': percentil(0.5),
+        'p95_ms': percentil(0.95),
+        'p99_ms': percentil(0.99),
+        'media_ms': statistics.mean(tempos) * 1000,
+    }
+
+
+def imprimir(titulo, resultado):
+    print(f"{titulo:<40} {resultado['por_segundo']:>10.1f} req/s"
+          f"   p50 {resultado['p50_ms']:8.3f} ms   p95 {resultado['p95_ms']:8.3f} ms")
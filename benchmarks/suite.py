@@ -0,0 +1,306 @@
+"""Suíte de carga: login, listagem, busca, criação, edição e PDFs.
+
+Popula um banco sintético (N usuários x M etiquetas), mede as rotas pelo
+test client do Flask e, com --gunicorn, por HTTP contra um gunicorn local
+com C clientes simultâneos. Grava p50/p95/p99 e vazão por rota em JSON
+para comparar commits (--comparar resultado_anterior.json).
+
+Uso: python benchmarks/suite.py [--usuarios 3] [--etiquetas 200] [--repeticoes 100]
+                                [--gunicorn] [--workers N] [--clientes 4] [--config gunicorn.conf.py]
+                                [--saida arquivo.json] [--comparar anterior.json]
+"""
+import argparse
+import http.cookiejar
+import itertools
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from comum import (RAIZ, PRODUTOS, preparar_ambiente, criar_cliente, popular_etiquetas,
+                   gerar_etiqueta, estatisticas)
+
+SENHA = 'bench123'
+CAMPOS = ('nome', 'descricao', 'codigo', 'categoria', 'preco', 'tamanho')
+
+# Rotas pesadas rodam uma fração das repetições
+PESADAS = {'gerar_pdf_todas': 50}
+
+_sequencia = itertools.count()
+
+
+# ==================== CENÁRIOS ====================
+# Cada cenário recebe o usuário e devolve (método, caminho, formulário).
+
+def cenario_login(usuario):
+    return 'POST', '/login', {'username': usuario['username'], 'password': SENHA}
+
+
+def cenario_index(usuario):
+    return 'GET', '/', None
+
+
+def cenario_buscar(usuario):
+    termo = random.choice(PRODUTOS).split()[0]
+    return 'GET', '/buscar?' + urllib.parse.urlencode({'q': termo}), None
+
+
+def cenario_criar(usuario):
+    dados = dict(zip(CAMPOS, gerar_etiqueta(next(_sequencia), usuario['id'])))
+    dados['codigo'] = f"SUITE-{os.getpid()}-{next(_sequencia)}"
+    return 'POST', '/criar', dados
+
+
+def cenario_editar(usuario):
+    id, codigo = random.choice(usuario['etiquetas'])
+    dados = dict(zip(CAMPOS, gerar_etiqueta(id, usuario['id'])))
+    dados['codigo'] = codigo
+    return 'POST', f'/editar/{id}', dados
+
+
+def cenario_gerar_pdf(usuario):
+    id, _ = random.choice(usuario['etiquetas'])
+    return 'GET', f'/gerar_pdf/{id}', None
+
+
+def cenario_gerar_pdf_todas(usuario):
+    return 'GET', '/gerar_pdf_todas', None
+
+
+CENARIOS = {
+    'login': cenario_login,
+    'index': cenario_index,
+    'buscar': cenario_buscar,
+    'criar': cenario_criar,
+    'editar': cenario_editar,
+    'gerar_pdf': cenario_gerar_pdf,
+    'gerar_pdf_todas': cenario_gerar_pdf_todas,
+}
+
+
+# ==================== CLIENTES ====================
+# Os dois clientes voltam ao cookie de sessão do login depois de cada
+# requisição: as mensagens flash de criar/editar cresceriam o cookie e
+# distorceriam as medições seguintes. Redirecionamentos não são seguidos.
+
+class ClienteTeste:
+    def __init__(self, modulo_app, usuario):
+        self.cliente = modulo_app.app.test_client()
+        self.cliente.post('/login', data={'username': usuario['username'], 'password': SENHA})
+        self.sessao = self.cliente.get_cookie('session')
+
+    def requisitar(self, metodo, caminho, dados):
+        resposta = self.cliente.open(caminho, method=metodo, data=dados)
+        resposta.get_data()
+        resposta.close()
+        self.cliente.set_cookie(self.sessao.key, self.sessao.value)
+        return resposta.status_code
+
+
+class _SemRedirecionar(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class ClienteHTTP:
+    def __init__(self, base, usuario):
+        self.base = base
+        self.cookies = http.cookiejar.CookieJar()
+        self.abridor = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _SemRedirecionar
+        )
+        self.requisitar('POST', '/login', {'username': usuario['username'], 'password': SENHA})
+        self.sessao = next(cookie for cookie in self.cookies if cookie.name == 'session')
+
+    def requisitar(self, metodo, caminho, dados):
+        corpo = urllib.parse.urlencode(dados).encode() if dados is not None else None
+        pedido = urllib.request.Request(self.base + caminho, data=corpo, method=metodo)
+        try:
+            with self.abridor.open(pedido, timeout=300) as resposta:
+                resposta.read()
+                status = resposta.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            status = e.code
+        if hasattr(self, 'sessao'):
+            self.cookies.set_cookie(self.sessao)
+        return status
+
+
+# ==================== EXECUÇÃO ====================
+
+def executar(clientes, usuarios, cenario, repeticoes):
+    """Divide as repetições entre os clientes (uma thread cada) e mede tudo junto"""
+    tempos, erros = [], []
+    por_cliente = max(repeticoes // len(clientes), 1)
+
+    def trabalhar(cliente, usuario):
+        for _ in range(por_cliente):
+            metodo, caminho, dados = cenario(usuario)
+            inicio = time.perf_counter()
+            status = cliente.requisitar(metodo, caminho, dados)
+            tempos.append(time.perf_counter() - inicio)
+            if status >= 400:
+                erros.append(status)
+
+    threads = [threading.Thread(target=trabalhar, args=(cliente, usuarios[i % len(usuarios)]))
+               for i, cliente in enumerate(clientes)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    resultado = estatisticas(tempos, time.perf_counter() - inicio)
+    resultado['erros'] = len(erros)
+    return resultado
+
+
+def rodar(titulo, clientes, usuarios, repeticoes):
+    print(f'\n== {titulo} ==')
+    resultados = {}
+    for nome, cenario in CENARIOS.items():
+        vezes = max(repeticoes // PESADAS.get(nome, 1), len(clientes))
+        resultados[nome] = resultado = executar(clientes, usuarios, cenario, vezes)
+        print(f"{nome:<18} {resultado['por_segundo']:>9.1f} req/s   p50 {resultado['p50_ms']:9.2f} ms"
+              f"   p95 {resultado['p95_ms']:9.2f} ms   p99 {resultado['p99_ms']:9.2f} ms"
+              + (f"   ❌ {resultado['erros']} erros" if resultado['erros'] else ''))
+    return resultados
+
+
+def porta_livre():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def iniciar_gunicorn(args, porta):
+    # Opções da linha de comando têm precedência sobre as do --config
+    comando = [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{porta}']
+    if args.config:
+        comando += ['--config', args.config]
+    else:
+        comando += ['--timeout', '300']
+    if args.workers:
+        comando += ['--workers', str(args.workers)]
+    ambiente = dict(os.environ, PYTHONPATH=RAIZ)
+    processo = subprocess.Popen(comando + ['app:app'], env=ambiente)
+
+    limite = time.time() + 60
+    while time.time() < limite:
+        try:
+            socket.create_connection(('127.0.0.1', porta), timeout=1).close()
+            return processo
+        except OSError:
+            if processo.poll() is not None:
+                raise SystemExit('❌ O gunicorn encerrou durante a inicialização')
+            time.sleep(0.2)
+    processo.terminate()
+    raise SystemExit('❌ O gunicorn não respondeu em 60 s')
+
+
+def popular(modulo_app, args):
+    usuarios = []
+    for n in range(args.usuarios):
+        username = f'suite{n}'
+        _, user_id = criar_cliente(modulo_app, username, SENHA)
+        popular_etiquetas(modulo_app, user_id, args.etiquetas)
+        with modulo_app.app.app_context():
+            etiquetas = [tuple(linha) for linha in modulo_app.get_db_connection().execute(
+                'SELECT id, codigo FROM etiquetas WHERE user_id = ?', (user_id,)
+            )]
+        usuarios.append({'username': username, 'id': user_id, 'etiquetas': etiquetas})
+    return usuarios
+
+
+def commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(resultados, parametros, caminho):
+    with open(caminho, encoding='utf-8') as arquivo:
+        anterior = json.load(arquivo)
+    print(f"\n== Comparação com {anterior.get('commit')} (p50 / p95) ==")
+    if anterior.get('parametros') != parametros:
+        print(f"⚠️ Parâmetros diferentes: {anterior.get('parametros')}")
+    for modo, rotas in resultados.items():
+        for nome, atual in rotas.items():
+            antes = anterior['resultados'].get(modo, {}).get(nome)
+            if antes:
+                variacoes = [(atual[chave] / antes[chave] - 1) * 100 for chave in ('p50_ms', 'p95_ms')]
+                print(f"{modo:<12} {nome:<18} {variacoes[0]:+7.1f}%   {variacoes[1]:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--usuarios', type=int, default=3)
+    parser.add_argument('--etiquetas', type=int, default=200, help='etiquetas por usuário')
+    parser.add_argument('--repeticoes', type=int, default=100, help='requisições por rota')
+    parser.add_argument('--gunicorn', action='store_true', help='medir também por HTTP')
+    parser.add_argument('--workers', type=int, help='padrão: o do --config ou 1')
+    parser.add_argument('--clientes', type=int, default=4, help='clientes simultâneos no gunicorn')
+    parser.add_argument('--config', help='arquivo de configuração do gunicorn')
+    parser.add_argument('--saida', help='arquivo JSON (padrão: benchmarks/resultados/<commit>.json)')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.semente)
+    commit = commit_atual()
+    saida = os.path.abspath(args.saida or os.path.join(
+        RAIZ, 'benchmarks', 'resultados', f"{commit or 'sem_commit'}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    ))
+    if args.config:
+        args.config = os.path.abspath(args.config)
+    comparacao = os.path.abspath(args.comparar) if args.comparar else None
+
+    modulo_app = preparar_ambiente()
+    usuarios = popular(modulo_app, args)
+
+    resultados = {
+        'test_client': rodar('test client', [ClienteTeste(modulo_app, usuarios[0])], usuarios, args.repeticoes)
+    }
+
+    if args.gunicorn:
+        porta = porta_livre()
+        processo = iniciar_gunicorn(args, porta)
+        try:
+            base = f'http://127.0.0.1:{porta}'
+            clientes = [ClienteHTTP(base, usuarios[i % len(usuarios)]) for i in range(args.clientes)]
+            resultados['gunicorn'] = rodar(
+                f"gunicorn ({f'{args.workers} workers, ' if args.workers else ''}{args.clientes} clientes)", clientes, usuarios, args.repeticoes
+            )
+        finally:
+            processo.terminate()
+            processo.wait()
+
+    parametros = {chave: valor for chave, valor in vars(args).items() if chave not in ('saida', 'comparar')}
+    os.makedirs(os.path.dirname(saida), exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump({
+            'commit': commit,
+            'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'parametros': parametros,
+            'resultados': resultados,
+        }, arquivo, indent=2)
+    print(f'\n✅ Resultados gravados em {saida}')
+
+    if comparacao:
+        comparar(resultados, parametros, comparacao)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import re
+from datetime import datetime
+
+from paginacao import ORDEM_PADRAO
+
+
+# ==================== BUSCA TEXTUAL (FTS5) ====================
+# O índice etiquetas_fts (migração 4) cobre nome, descrição, código e
+# categoria das etiquetas ativas e é mantido por triggers. O tokenizador
+# unicode61 com remove_diacritics ignora acentos: "acucar" encontra "açúcar".
+
+# Pesos do bm25 por coluna: nome, descricao, codigo, categoria
+PESOS_BM25 = (10.0, 1.0, 5.0, 2.0)
+
+# O id desempata etiquetas com a mesma relevância (textos iguais têm o mesmo
+# bm25), tanto no cursor quanto no ORDER BY do paginar(). Os cursores de
+# busca são aproximados: o bm25 depende das estatísticas do índice inteiro
+# (todos os usuários), então qualquer etiqueta criada, editada ou apagada
+# entre uma página e outra muda as notas e a página seguinte pode repetir
+# ou pular resultados. A listagem sem termo, por (data_criacao, id), é exata.
+ORDEM_RELEVANCIA = ('relevancia', 'id')
+
+
+def expressao_fts(termo):
+    """Converte o texto digitado em uma expressão MATCH por prefixo.
+
+    Cada palavra vira um prefixo entre aspas ("arroz"* "integ"*), o que
+    também neutraliza a sintaxe do FTS5 (AND, OR, NEAR, aspas) no termo.
+    Retorna '' se não houver palavras.
+    """
+    palavras = re.findall(r'\w+', termo)
+    return ' '.join(f'"{palavra}"*' for palavra in palavras)
+
+
+def sql_busca(expressao):
+    """Monta (sql, parametros) da busca ordenável por relevância.
+
+    O SELECT externo fica aberto para que o chamador acrescente filtros
+    com AND (usuário, paginação).
+    """
+    pesos = ', '.join(str(peso) for peso in PESOS_BM25)
+    sql = f'''SELECT * FROM (
+                  SELECT e.*, bm25(etiquetas_fts, {pesos}) AS relevancia
+                  FROM etiquetas_fts
+                  JOIN etiquetas e ON e.id = etiquetas_fts.rowid
+                  WHERE etiquetas_fts MATCH ?
+              ) WHERE ativo = 1'''
+    return sql, (expressao,)
+
+
+def reconstruir_indice(conn):
+    """Recria o índice de busca a partir da tabela etiquetas"""
+    conn.execute("INSERT INTO etiquetas_fts (etiquetas_fts) VALUES ('delete-all')")
+    conn.execute('''
+        INSERT INTO etiquetas_fts (rowid, nome, descricao, codigo, categoria)
+        SELECT id, nome, descricao, codigo, categoria FROM etiquetas WHERE ativo = 1
+    ''')
+    conn.execute("INSERT INTO etiquetas_fts (etiquetas_fts) VALUES ('optimize')")
+    conn.commit()
+    return conn.execute('SELECT COUNT(*) FROM etiquetas WHERE ativo = 1').fetchone()[0]
+
+
+def filtrar(sql, parametros, categoria=None, desde=None, ate=None):
+    """Acrescenta à consulta os filtros opcionais de categoria e período.
+
+    desde e ate são datas 'AAAA-MM-DD' inclusivas, comparadas com
+    data_criacao; valores vazios são ignorados. ValueError se a data
+    for inválida.
+    """
+    for data in (desde, ate):
+        if data:
+            try:
+                datetime.strptime(data, '%Y-%m-%d')
+            except ValueError:
+                raise ValueError(f'Data inválida: {data} (use AAAA-MM-DD)')
+
+    if categoria:
+        sql += ' AND categoria = ?'
+        parametros += (categoria,)
+    if desde:
+        sql += ' AND data_criacao >= ?'
+        parametros += (desde,)
+    if ate:
+        sql += " AND data_criacao < date(?, '+1 day')"
+        parametros += (ate,)
+    return sql, parametros
+
+
+def consulta_filtrada(user_id, termo='', categoria=None, desde=None, ate=None):
+    """Monta (sql, parametros, ordem) das etiquetas ativas do usuário com os filtros da busca.
+
+    Com termo a ordem é por relevância; sem, por (data_criacao, id). O SQL
+    fica sem ORDER BY para servir também ao paginar(). ValueError se
+    alguma data for inválida.
+    """
+    expressao = expressao_fts(termo or '')
+    if expressao:
+        sql, parametros = sql_busca(expressao)
+        sql, parametros = sql + ' AND user_id = ?', parametros + (user_id,)
+        ordem = ORDEM_RELEVANCIA
+    else:
+        sql = 'SELECT * FROM etiquetas WHERE ativo = 1 AND user_id = ?'
+        parametros = (user_id,)
+        ordem = ORDEM_PADRAO
+    sql, parametros = filtrar(sql, parametros, categoria, desde, ate)
+    return sql, parametros, ordem
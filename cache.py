@@ -0,0 +1,234 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+# ==================== CONFIGURAÇÕES ====================
+
+CACHE_PDF_ITENS = int(os.environ.get('CACHE_PDF_ITENS', 512))
+CACHE_QR_ITENS = int(os.environ.get('CACHE_QR_ITENS', 4096))
+
+# Usuários carregados pelo Flask-Login; o TTL limita quanto tempo outro
+# worker pode servir dados antigos depois de uma alteração na conta
+CACHE_USUARIOS_ITENS = int(os.environ.get('CACHE_USUARIOS_ITENS', 1024))
+CACHE_USUARIOS_TTL = float(os.environ.get('CACHE_USUARIOS_TTL', 60))
+
+# Camada em disco opcional, compartilhada entre os workers (vazio desativa)
+CACHE_DISCO_PASTA = os.environ.get('CACHE_DISCO_PASTA', '')
+CACHE_DISCO_MAX_MB = int(os.environ.get('CACHE_DISCO_MAX_MB', 256))
+
+
+def chave_conteudo(*campos):
+    """Hash SHA-256 dos campos que afetam o resultado renderizado"""
+    bruto = '\x1f'.join('' if campo is None else str(campo) for campo in campos)
+    return hashlib.sha256(bruto.encode('utf-8')).hexdigest()
+
+
+# ==================== CAMADAS ====================
+
+class CacheLRU:
+    """Cache em memória com descarte do item usado há mais tempo.
+
+    Com ttl (segundos) os itens também expiram. registrar_custo() informa
+    quanto custou produzir um valor após uma falha, para estimar o tempo
+    economizado pelos acertos.
+    """
+
+    def __init__(self, max_itens, ttl=None):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.custo_falhas = 0.0
+        self.falhas_medidas = 0
+
+    def obter(self, chave):
+        with self._lock:
+            try:
+                expira, valor = self._itens[chave]
+            except KeyError:
+                self.falhas += 1
+                return None
+            if expira is not None and expira <= time.monotonic():
+                del self._itens[chave]
+                self.falhas += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return valor
+
+    def guardar(self, chave, valor):
+        if self.max_itens <= 0:
+            return
+        expira = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._itens[chave] = (expira, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def remover(self, chave):
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def registrar_custo(self, segundos):
+        with self._lock:
+            self.custo_falhas += segundos
+            self.falhas_medidas += 1
+
+    def estatisticas(self):
+        consultas = self.acertos + self.falhas
+        custo_medio = self.custo_falhas / self.falhas_medidas if self.falhas_medidas else 0.0
+        return {
+            'itens': len(self._itens),
+            'max_itens': self.max_itens,
+            'ttl': self.ttl,
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+            'custo_medio_falha_ms': custo_medio * 1000,
+            'economia_estimada_ms': self.acertos * custo_medio * 1000,
+        }
+
+
+class CacheDisco:
+    """Cache em arquivos, um por chave, limitado pelo tamanho total da pasta.
+
+    Ao passar do limite remove os arquivos acessados há mais tempo (mtime)
+    até voltar a 90% do limite. A pasta pode ser compartilhada entre workers.
+    """
+
+    def __init__(self, pasta, max_bytes):
+        self.pasta = pasta
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._bytes = None
+        self.acertos = 0
+        self.falhas = 0
+        os.makedirs(pasta, exist_ok=True)
+
+    def _caminho(self, chave):
+        return os.path.join(self.pasta, chave)
+
+    def obter(self, chave):
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, 'rb') as arquivo:
+                valor = arquivo.read()
+            os.utime(caminho)
+        except OSError:
+            self.falhas += 1
+            return None
+        self.acertos += 1
+        return valor
+
+    def guardar(self, chave, valor):
+        descritor, temporario = tempfile.mkstemp(dir=self.pasta, prefix='.tmp')
+        with os.fdopen(descritor, 'wb') as arquivo:
+            arquivo.write(valor)
+        os.replace(temporario, self._caminho(chave))
+
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = self._medir()
+            self._bytes += len(valor)
+            if self._bytes > self.max_bytes:
+                self._despejar()
+
+    def remover(self, chave):
+        try:
+            os.remove(self._caminho(chave))
+        except OSError:
+            pass
+
+    def _arquivos(self):
+        with os.scandir(self.pasta) as entradas:
+            return [entrada for entrada in entradas
+                    if entrada.is_file() and not entrada.name.startswith('.tmp')]
+
+    def _medir(self):
+        return sum(entrada.stat().st_size for entrada in self._arquivos())
+
+    def _despejar(self):
+        # Relê a pasta: outros workers também escrevem nela
+        arquivos = sorted(self._arquivos(), key=lambda entrada: entrada.stat().st_mtime)
+        total = sum(entrada.stat().st_size for entrada in arquivos)
+        alvo = self.max_bytes * 0.9
+        for entrada in arquivos:
+            if total <= alvo:
+                break
+            tamanho = entrada.stat().st_size
+            try:
+                os.remove(entrada.path)
+                total -= tamanho
+            except OSError:
+                pass
+        self._bytes = total
+
+    def estatisticas(self):
+        consultas = self.acertos + self.falhas
+        return {
+            'pasta': self.pasta,
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+        }
+
+
+class CacheConteudo:
+    """Cache endereçado por conteúdo: LRU em memória com disco opcional atrás"""
+
+    def __init__(self, max_itens, pasta=None, max_bytes=0):
+        self.memoria = CacheLRU(max_itens)
+        self.disco = CacheDisco(pasta, max_bytes) if pasta else None
+
+    def obter(self, chave):
+        valor = self.memoria.obter(chave)
+        if valor is None and self.disco is not None:
+            valor = self.disco.obter(chave)
+            if valor is not None:
+                self.memoria.guardar(chave, valor)
+        return valor
+
+    def guardar(self, chave, valor):
+        self.memoria.guardar(chave, valor)
+        if self.disco is not None:
+            self.disco.guardar(chave, valor)
+
+    def remover(self, chave):
+        self.memoria.remover(chave)
+        if self.disco is not None:
+            self.disco.remover(chave)
+
+    def estatisticas(self):
+        estatisticas = {'memoria': self.memoria.estatisticas()}
+        if self.disco is not None:
+            estatisticas['disco'] = self.disco.estatisticas()
+        return estatisticas
+
+
+# ==================== CACHES DA APLICAÇÃO ====================
+
+# Matrizes de QR: só em memória, são baratas de guardar e não são bytes
+cache_qr = CacheLRU(CACHE_QR_ITENS)
+
+# Dados dos usuários logados, por id
+cache_usuarios = CacheLRU(CACHE_USUARIOS_ITENS, ttl=CACHE_USUARIOS_TTL)
+
+# PDFs de uma etiqueta, com camada em disco se CACHE_DISCO_PASTA estiver definida
+cache_pdf = CacheConteudo(
+    CACHE_PDF_ITENS,
+    os.path.join(CACHE_DISCO_PASTA, 'pdf') if CACHE_DISCO_PASTA else None,
+    CACHE_DISCO_MAX_MB * 1024 * 1024
+)
@@ -0,0 +1,105 @@
+from functools import lru_cache
+
+
+# ==================== SIMBOLOGIAS ====================
+# O QR continua sendo o padrão; EAN-13 e Code 128 atendem os leitores
+# lineares dos caixas. A simbologia é escolhida por etiqueta.
+
+SIMBOLOGIAS = {
+    'qr': 'QR Code',
+    'ean13': 'EAN-13',
+    'code128': 'Code 128',
+}
+
+SIMBOLOGIA_PADRAO = 'qr'
+
+LINEARES = ('ean13', 'code128')
+
+# Zonas de silêncio exigidas por cada simbologia, em módulos (esquerda, direita)
+ZONAS_SILENCIO = {
+    'ean13': (11, 7),
+    'code128': (10, 10),
+}
+
+
+# ==================== DÍGITO VERIFICADOR ====================
+
+def digito_ean13(doze_digitos):
+    """Dígito verificador (módulo 10, pesos 1 e 3) dos 12 primeiros dígitos"""
+    soma = sum(int(digito) * (3 if indice % 2 else 1) for indice, digito in enumerate(doze_digitos))
+    return str((10 - soma % 10) % 10)
+
+
+def normalizar_codigo(codigo, simbologia):
+    """Valida o código para a simbologia e o devolve como deve ser gravado.
+
+    No EAN-13 aceita 12 dígitos (o verificador é calculado) ou 13 (o
+    verificador é conferido). ValueError com a mensagem se inválido.
+    """
+    codigo = (codigo or '').strip()
+    if simbologia not in SIMBOLOGIAS:
+        raise ValueError(f'Simbologia inválida: {simbologia}')
+
+    if simbologia == 'ean13':
+        if not codigo.isascii() or not codigo.isdigit() or len(codigo) not in (12, 13):
+            raise ValueError('EAN-13 requer 12 ou 13 dígitos numéricos')
+        verificador = digito_ean13(codigo[:12])
+        if len(codigo) == 13 and codigo[12] != verificador:
+            raise ValueError(f'Dígito verificador inválido: para {codigo[:12]} o correto é {verificador}')
+        return codigo[:12] + verificador
+
+    if simbologia == 'code128':
+        if not all(32 <= ord(caractere) <= 126 for caractere in codigo):
+            raise ValueError('Code 128 aceita apenas caracteres ASCII imprimíveis (sem acentos)')
+
+    return codigo
+
+
+# ==================== CODIFICAÇÃO ====================
+# Os módulos saem como uma string de '1' (barra) e '0' (espaço), sem as
+# zonas de silêncio; quem desenha decide a largura de cada módulo.
+
+EAN_L = ('0001101', '0011001', '0010011', '0111101', '0100011',
+         '0110001', '0101111', '0111011', '0110111', '0001011')
+EAN_G = ('0100111', '0110011', '0011011', '0100001', '0011101',
+         '0111001', '0000101', '0010001', '0001001', '0010111')
+EAN_R = ('1110010', '1100110', '1101100', '1000010', '1011100',
+         '1001110', '1010000', '1000100', '1001000', '1110100')
+
+# O primeiro dígito não é desenhado: define a paridade dos seis seguintes
+EAN_PARIDADES = ('LLLLLL', 'LLGLGG', 'LLGGLG', 'LLGGGL', 'LGLLGG',
+                 'LGGLLG', 'LGGGLL', 'LGLGLG', 'LGLGGL', 'LGGLGL')
+
+
+def _modulos_ean13(codigo):
+    paridades = EAN_PARIDADES[int(codigo[0])]
+    esquerda = ''.join(
+        (EAN_L if paridade == 'L' else EAN_G)[int(digito)]
+        for paridade, digito in zip(paridades, codigo[1:7])
+    )
+    direita = ''.join(EAN_R[int(digito)] for digito in codigo[7:13])
+    return '101' + esquerda + '01010' + direita + '101'
+
+
+def _modulos_code128(codigo):
+    # O reportlab escolhe os conjuntos (B/C) e calcula o verificador;
+    # a decomposição vem como larguras: maiúsculas são barras, minúsculas espaços.
+    # Import tardio: o pacote barcode do reportlab carrega widgets e platypus
+    # (~80 ms na partida); o aquecimento o faz antes da primeira requisição
+    from reportlab.graphics.barcode.code128 import Code128
+    barras = Code128(codigo, quiet=0)
+    barras.validate()
+    barras.encode()
+    barras.decompose()
+    return ''.join(
+        ('1' if letra.isupper() else '0') * (ord(letra.upper()) - ord('A') + 1)
+        for letra in barras.decomposed
+    )
+
+
+@lru_cache(maxsize=4096)
+def modulos_barras(codigo, simbologia):
+    """Módulos do código linear (string de '1' e '0', sem zonas de silêncio)"""
+    if simbologia == 'ean13':
+        return _modulos_ean13(normalizar_codigo(codigo, simbologia))
+    return _modulos_code128(codigo)
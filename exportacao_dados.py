@@ -0,0 +1,55 @@
+import csv
+import io
+import json
+
+from layout_pdf import LOTE
+
+
+# ==================== EXPORTAÇÃO DE DADOS ====================
+# CSV e JSON Lines gerados lote a lote a partir do cursor: cada fetchmany
+# vira um pedaço da resposta, então a memória não depende do total de linhas.
+
+# Mesma ordem das colunas aceitas pela importação, para permitir o caminho de volta
+COLUNAS = ('id', 'nome', 'descricao', 'codigo', 'categoria', 'preco', 'tamanho', 'simbologia', 'data_criacao',
+           'atualizado_em')
+
+TIPOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _lotes(cursor, tamanho):
+    while True:
+        linhas = cursor.fetchmany(tamanho)
+        if not linhas:
+            return
+        yield linhas
+
+
+def gerar_csv(cursor, tamanho=LOTE):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(COLUNAS)
+    for linhas in _lotes(cursor, tamanho):
+        escritor.writerows([linha[coluna] for coluna in COLUNAS] for linha in linhas)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Só o cabeçalho: resultado vazio
+        yield buffer.getvalue().encode('utf-8')
+
+
+def gerar_ndjson(cursor, tamanho=LOTE):
+    for linhas in _lotes(cursor, tamanho):
+        yield ''.join(
+            json.dumps({coluna: linha[coluna] for coluna in COLUNAS}, ensure_ascii=False) + '\n'
+            for linha in linhas
+        ).encode('utf-8')
+
+
+GERADORES = {
+    'csv': gerar_csv,
+    'ndjson': gerar_ndjson,
+}
@@ -0,0 +1,214 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import banco
+from layout_pdf import renderizar_paginas_paralelo, iterar_lotes, FOLHA_PADRAO
+from pdf_incremental import CanvasIncremental
+
+
+# ==================== CONFIGURAÇÕES ====================
+
+EXPORT_PASTA = os.path.abspath(os.environ.get('EXPORT_PASTA', 'exportacoes'))
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', 2))
+EXPORT_EXPIRACAO_HORAS = float(os.environ.get('EXPORT_EXPIRACAO_HORAS', 24))
+
+# Job sem sinal de vida há mais que isso é considerado perdido (worker reciclado)
+EXPORT_TIMEOUT_MINUTOS = float(os.environ.get('EXPORT_TIMEOUT_MINUTOS', 15))
+
+# Intervalo mínimo entre gravações de progresso no banco
+INTERVALO_PROGRESSO = 1.0
+
+MENSAGEM_INTERRUPCAO = 'Exportação interrompida pela reinicialização do servidor; gere novamente'
+
+
+# ==================== FILA LOCAL ====================
+# O estado dos jobs fica na tabela exportacoes (migração 5), então qualquer
+# worker do gunicorn consegue responder ao polling; a renderização roda em
+# um pool de threads do worker que recebeu o pedido.
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+# Jobs enviados ao pool deste processo e ainda não terminados; na saída do
+# worker (encerrar_exportacoes) os que sobrarem viram erro
+_jobs = set()
+_encerrando = threading.Event()
+
+
+class ExportacaoInterrompida(Exception):
+    pass
+
+
+def _obter_executor():
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix='exportacao')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def caminho_arquivo(job_id):
+    return os.path.join(EXPORT_PASTA, f'{job_id}.pdf')
+
+
+def criar_exportacao(conn, user_id, formato=FOLHA_PADRAO, impressao=False):
+    """Registra o job e o envia ao pool; retorna o id"""
+    total = conn.execute(
+        'SELECT COUNT(*) FROM etiquetas WHERE ativo = 1 AND user_id = ?',
+        (user_id,)
+    ).fetchone()[0]
+
+    job_id = uuid.uuid4().hex
+    conn.execute(
+        '''INSERT INTO exportacoes (id, user_id, formato, impressao, total, expira_em)
+           VALUES (?, ?, ?, ?, ?, datetime('now', ?))''',
+        (job_id, user_id, formato, int(impressao), total, f'+{EXPORT_EXPIRACAO_HORAS} hours')
+    )
+    conn.commit()
+
+    with _executor_lock:
+        _jobs.add(job_id)
+    _obter_executor().submit(_executar, job_id)
+    return job_id
+
+
+def obter_exportacao(conn, job_id, user_id):
+    return conn.execute(
+        'SELECT * FROM exportacoes WHERE id = ? AND user_id = ?',
+        (job_id, user_id)
+    ).fetchone()
+
+
+def _executar(job_id):
+    """Renderiza o PDF do job em arquivo, gravando o progresso no banco"""
+    conn = banco.pool.adquirir()
+    temporario = caminho_arquivo(job_id) + '.parcial'
+    try:
+        job = conn.execute('SELECT * FROM exportacoes WHERE id = ?', (job_id,)).fetchone()
+        conn.execute(
+            "UPDATE exportacoes SET status = 'processando', atualizada_em = CURRENT_TIMESTAMP WHERE id = ?",
+            (job_id,)
+        )
+        conn.commit()
+
+        # Conexão separada para a leitura: os commits de progresso não podem
+        # interferir no cursor que percorre as etiquetas
+        leitura = banco.pool.adquirir()
+        try:
+            cursor = leitura.execute(
+                'SELECT * FROM etiquetas WHERE ativo = 1 AND user_id = ? ORDER BY nome',
+                (job['user_id'],)
+            )
+            os.makedirs(EXPORT_PASTA, exist_ok=True)
+            with open(temporario, 'wb') as arquivo:
+                pdf = CanvasIncremental(impressao=bool(job['impressao']))
+                ultimo_registro = time.monotonic()
+                for feitos, _ in renderizar_paginas_paralelo(pdf, iterar_lotes(cursor), job['formato']):
+                    if _encerrando.is_set():
+                        raise ExportacaoInterrompida(MENSAGEM_INTERRUPCAO)
+                    arquivo.write(pdf.retirar())
+                    if time.monotonic() - ultimo_registro >= INTERVALO_PROGRESSO:
+                        _registrar_progresso(conn, job_id, feitos)
+                        ultimo_registro = time.monotonic()
+                pdf.save()
+                arquivo.write(pdf.retirar())
+        finally:
+            banco.pool.devolver(leitura)
+
+        os.replace(temporario, caminho_arquivo(job_id))
+        conn.execute(
+            '''UPDATE exportacoes
+               SET status = 'concluida', feitos = ?, arquivo = ?,
+                   atualizada_em = CURRENT_TIMESTAMP, concluida_em = CURRENT_TIMESTAMP
+               WHERE id = ?''',
+            (feitos, caminho_arquivo(job_id), job_id)
+        )
+        conn.commit()
+
+    except Exception as e:
+        conn.rollback()
+        conn.execute(
+            "UPDATE exportacoes SET status = 'erro', erro = ?, atualizada_em = CURRENT_TIMESTAMP WHERE id = ?",
+            (str(e), job_id)
+        )
+        conn.commit()
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+    finally:
+        banco.pool.devolver(conn)
+        with _executor_lock:
+            _jobs.discard(job_id)
+
+
+def _registrar_progresso(conn, job_id, feitos):
+    conn.execute(
+        'UPDATE exportacoes SET feitos = ?, atualizada_em = CURRENT_TIMESTAMP WHERE id = ?',
+        (feitos, job_id)
+    )
+    conn.commit()
+
+
+# ==================== SAÍDA DO WORKER ====================
+
+def encerrar_exportacoes():
+    """Chamado na saída do worker (gancho worker_exit do gunicorn).
+
+    Os jobs em renderização param no próximo lote e os que ainda esperavam na
+    fila são cancelados; todos terminam como erro, para o polling avisar o
+    usuário em vez de mostrar 'processando' até o EXPORT_TIMEOUT_MINUTOS.
+    Retorna quantos jobs foram interrompidos.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            return 0
+        executor, _executor = _executor, None
+        interrompidos = len(_jobs)
+
+    _encerrando.set()
+    executor.shutdown(wait=True, cancel_futures=True)
+
+    # Os que estavam rodando já gravaram o erro em _executar; sobram os cancelados
+    with _executor_lock:
+        cancelados = list(_jobs)
+        _jobs.clear()
+    if cancelados:
+        conn = banco.pool.adquirir()
+        try:
+            conn.executemany(
+                """UPDATE exportacoes SET status = 'erro', erro = ?, atualizada_em = CURRENT_TIMESTAMP
+                   WHERE id = ? AND status IN ('pendente', 'processando')""",
+                [(MENSAGEM_INTERRUPCAO, job_id) for job_id in cancelados]
+            )
+            conn.commit()
+        finally:
+            banco.pool.devolver(conn)
+    return interrompidos
+
+
+# ==================== LIMPEZA ====================
+
+def limpar_exportacoes(conn):
+    """Apaga jobs expirados com seus arquivos e marca como erro os jobs perdidos"""
+    conn.execute(
+        '''UPDATE exportacoes SET status = 'erro', erro = 'Exportação interrompida'
+           WHERE status IN ('pendente', 'processando')
+           AND atualizada_em < datetime('now', ?)''',
+        (f'-{EXPORT_TIMEOUT_MINUTOS} minutes',)
+    )
+
+    expiradas = conn.execute(
+        "SELECT id, arquivo FROM exportacoes WHERE expira_em < datetime('now')"
+    ).fetchall()
+    for job in expiradas:
+        if job['arquivo'] and os.path.exists(job['arquivo']):
+            os.remove(job['arquivo'])
+    conn.executemany('DELETE FROM exportacoes WHERE id = ?', [(job['id'],) for job in expiradas])
+    conn.commit()
+    return len(expiradas)
@@ -0,0 +1,103 @@
+"""Configuração do gunicorn (usada pelo Procfile).
+
+Workers gthread: cada processo atende várias requisições em threads, então
+um PDF grande ou uma escrita esperando a trava do SQLite não param o
+worker inteiro. As conexões SQLite são exclusivas por thread (banco.pool)
+e os caches têm trava própria.
+
+Tudo pode ser ajustado por variáveis de ambiente sem mexer neste arquivo.
+"""
+import multiprocessing
+import os
+
+
+# ==================== WORKERS ====================
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+# A renderização de PDF é CPU: mais processos que núcleos só disputam o GIL
+# de cada um; as threads cobrem a espera por banco e rede
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Cada worker tem o próprio pool de renderização de PDF (layout_pdf), usado
+# nas exportações grandes; o padrão de os.cpu_count() processos por worker
+# daria (cpu+1) × cpu processos (272 numa máquina de 16 núcleos). Os núcleos
+# são divididos entre os dois níveis:
+#
+# - Padrão (sem RENDER_WORKERS): cpu+1 workers e RENDER_WORKERS=1, ou seja,
+#   o pool fica DESLIGADO e cada PDF renderiza no processo do worker. Bom
+#   para muitas requisições pequenas ao mesmo tempo.
+# - Com RENDER_WORKERS=N (N >= 2) no ambiente: cpu // N workers, cada um com
+#   um pool de N processos, para que um PDF grande use vários núcleos.
+#
+# GUNICORN_WORKERS, se definido, vale nos dois casos. Processos no total:
+# 1 master + workers × (1 + RENDER_WORKERS, quando RENDER_WORKERS > 1).
+# Threads: workers × threads atendendo requisições.
+_nucleos = multiprocessing.cpu_count()
+_render_workers = int(os.environ.get('RENDER_WORKERS', 0))
+if _render_workers > 1:
+    workers = int(os.environ.get('GUNICORN_WORKERS', max(1, _nucleos // _render_workers)))
+else:
+    workers = int(os.environ.get('GUNICORN_WORKERS', _nucleos + 1))
+    os.environ.setdefault('RENDER_WORKERS', str(max(1, _nucleos // workers)))
+
+# Recicla o worker depois de N requisições (o jitter evita que todos
+# reiniciem juntos); limita o crescimento de memória dos caches
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Downloads longos em streaming (gerar_pdf_todas) não devem derrubar o worker
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Importa o app (migrações incluídas) uma vez no master; os workers
+# nascem prontos e compartilham as páginas de memória por copy-on-write
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# Batimento dos workers em memória: evita travas de I/O em discos lentos
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG')
+
+
+# ==================== GANCHOS ====================
+# Aquecimento (aquecimento.py, desligável com AQUECIMENTO=0): com preload o
+# que é compartilhável carrega uma vez no master, antes dos forks; cada
+# worker só abre as conexões (o pool de renderização sobe no primeiro PDF em lote)
+
+def when_ready(server):
+    import aquecimento
+    if preload_app and aquecimento.AQUECIMENTO:
+        from app import app
+        server.log.info('Aquecimento do master: %s', aquecimento.resumo(aquecimento.aquecer_processo(app)))
+
+
+def pre_fork(server, worker):
+    # Com preload o master abriu conexões para migrar; conexões SQLite
+    # não podem atravessar o fork, então saem do pool antes dele
+    if preload_app:
+        import banco
+        banco.pool.fechar_todas()
+
+
+def post_worker_init(worker):
+    import aquecimento
+    if not aquecimento.AQUECIMENTO:
+        return
+    tempos = {}
+    if not preload_app:
+        from app import app
+        tempos.update(aquecimento.aquecer_processo(app))
+    tempos.update(aquecimento.aquecer_worker())
+    worker.log.info('Aquecimento do worker %s: %s', worker.pid, aquecimento.resumo(tempos))
+
+
+def worker_exit(server, worker):
+    # Reciclagem (max_requests) ou parada: as exportações em andamento neste
+    # worker não terminariam, então viram erro e o usuário pode gerar de novo
+    import exportacoes
+    interrompidos = exportacoes.encerrar_exportacoes()
+    if interrompidos:
+        server.log.warning('Worker %s saiu com %d exportação(ões) interrompida(s)', worker.pid, interrompidos)
@@ -0,0 +1,235 @@
+import csv
+import io
+import itertools
+import json
+import os
+import sqlite3
+import unicodedata
+
+try:
+    import openpyxl
+except ImportError:  # XLSX é opcional
+    openpyxl = None
+
+from codigo_barras import SIMBOLOGIA_PADRAO, normalizar_codigo
+from layout_pdf import TAMANHOS, invalidar_etiqueta
+
+
+# ==================== CONFIGURAÇÕES ====================
+
+# Linhas por transação: cada lote é um executemany seguido de um commit
+IMPORT_LOTE = int(os.environ.get('IMPORT_LOTE', 1000))
+
+# Quantos erros por linha são devolvidos ao usuário (o total é sempre contado)
+IMPORT_MAX_ERROS = int(os.environ.get('IMPORT_MAX_ERROS', 500))
+
+COLUNAS = ('nome', 'descricao', 'codigo', 'categoria', 'preco', 'tamanho', 'simbologia')
+
+# Cabeçalhos aceitos além dos nomes das colunas (comparados sem acento)
+APELIDOS = {
+    'produto': 'nome',
+    'sku': 'codigo',
+    'valor': 'preco',
+}
+
+SQL_INSERIR = '''INSERT INTO etiquetas
+                 (nome, descricao, codigo, categoria, preco, tamanho, simbologia, user_id)
+                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)'''
+
+# O WHERE impede que o upsert altere uma etiqueta de outro usuário
+SQL_UPSERT = SQL_INSERIR + '''
+                 ON CONFLICT (codigo) DO UPDATE SET
+                     nome = excluded.nome, descricao = excluded.descricao,
+                     categoria = excluded.categoria, preco = excluded.preco,
+                     tamanho = excluded.tamanho, simbologia = excluded.simbologia, ativo = 1
+                 WHERE etiquetas.user_id = excluded.user_id'''
+
+
+class ErroImportacao(Exception):
+    """Arquivo que não pode ser lido como um todo (formato, cabeçalho)"""
+
+
+# ==================== LEITURA ====================
+
+def _normalizar_cabecalho(nome):
+    nome = unicodedata.normalize('NFKD', str(nome or '')).encode('ascii', 'ignore').decode()
+    nome = nome.strip().lower()
+    return APELIDOS.get(nome, nome)
+
+
+def _mapear_colunas(cabecalho):
+    """Índice de cada coluna conhecida no cabeçalho do arquivo"""
+    indices = {}
+    for indice, nome in enumerate(cabecalho):
+        nome = _normalizar_cabecalho(nome)
+        if nome in COLUNAS and nome not in indices:
+            indices[nome] = indice
+
+    faltando = [coluna for coluna in ('nome', 'codigo') if coluna not in indices]
+    if faltando:
+        raise ErroImportacao(f"Colunas obrigatórias ausentes no cabeçalho: {', '.join(faltando)}")
+    return indices
+
+
+def _linhas_csv(arquivo):
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+    primeira = texto.readline()
+    # Planilhas em português exportam CSV com ponto e vírgula
+    separador = ';' if primeira.count(';') > primeira.count(',') else ','
+    return csv.reader(itertools.chain([primeira], texto), delimiter=separador)
+
+
+def _linhas_xlsx(arquivo):
+    if openpyxl is None:
+        raise ErroImportacao('Importação de XLSX requer o pacote openpyxl')
+    planilha = openpyxl.load_workbook(arquivo, read_only=True, data_only=True).active
+    return planilha.iter_rows(values_only=True)
+
+
+def ler_linhas(arquivo, nome_arquivo):
+    """Gera (número da linha, dict) a partir de um CSV ou XLSX, sem carregar tudo"""
+    if nome_arquivo.lower().endswith('.xlsx'):
+        linhas = _linhas_xlsx(arquivo)
+    elif nome_arquivo.lower().endswith(('.csv', '.txt')):
+        linhas = _linhas_csv(arquivo)
+    else:
+        raise ErroImportacao('Formato não suportado: envie um arquivo .csv ou .xlsx')
+
+    cabecalho = next(linhas, None)
+    if cabecalho is None:
+        raise ErroImportacao('Arquivo vazio')
+    indices = _mapear_colunas(cabecalho)
+
+    for numero, linha in enumerate(linhas, start=2):
+        if not any(valor not in (None, '') for valor in linha):
+            continue
+        yield numero, {
+            coluna: linha[indice] if indice < len(linha) else None
+            for coluna, indice in indices.items()
+        }
+
+
+# ==================== VALIDAÇÃO ====================
+
+def _texto(valor):
+    return '' if valor is None else str(valor).strip()
+
+
+def validar_linha(dados):
+    """Converte a linha na tupla de inserção; ValueError com a mensagem se inválida"""
+    nome = _texto(dados.get('nome'))
+    codigo = _texto(dados.get('codigo'))
+    if not nome:
+        raise ValueError('Nome é obrigatório')
+    if not codigo:
+        raise ValueError('Código é obrigatório')
+
+    preco = dados.get('preco')
+    if preco in (None, ''):
+        preco = 0.0
+    elif not isinstance(preco, (int, float)):
+        texto = _texto(preco).replace('R$', '').strip()
+        if ',' in texto:
+            # Formato brasileiro: 1.234,56
+            texto = texto.replace('.', '').replace(',', '.')
+        try:
+            preco = float(texto)
+        except ValueError:
+            raise ValueError(f'Preço inválido: {preco}')
+
+    tamanho = _texto(dados.get('tamanho')).lower() or 'medio'
+    if tamanho not in TAMANHOS:
+        raise ValueError(f'Tamanho inválido: {tamanho}')
+
+    simbologia = _texto(dados.get('simbologia')).lower() or SIMBOLOGIA_PADRAO
+    codigo = normalizar_codigo(codigo, simbologia)
+
+    return (nome, _texto(dados.get('descricao')), codigo, _texto(dados.get('categoria')),
+            float(preco), tamanho, simbologia)
+
+
+# ==================== GRAVAÇÃO ====================
+
+def _existentes(conn, codigos):
+    """Etiquetas já gravadas com algum dos códigos, indexadas por código"""
+    linhas = conn.execute(
+        'SELECT * FROM etiquetas WHERE codigo IN (SELECT value FROM json_each(?))',
+        (json.dumps(codigos),)
+    ).fetchall()
+    return {linha['codigo']: linha for linha in linhas}
+
+
+def _gravar_lote(conn, lote, user_id, upsert, resumo):
+    """Grava um lote de (número, tupla) em uma transação, separando os conflitos"""
+    existentes = _existentes(conn, [valores[2] for _, valores in lote])
+    vistos = set()
+    validas = []
+
+    for numero, valores in lote:
+        codigo = valores[2]
+        atual = existentes.get(codigo)
+        if codigo in vistos:
+            _registrar_erro(resumo, numero, codigo, 'Código repetido no arquivo')
+        elif atual is not None and not (upsert and atual['user_id'] == user_id):
+            _registrar_erro(resumo, numero, codigo, 'Código já existe!')
+        else:
+            vistos.add(codigo)
+            validas.append((numero, valores + (user_id,)))
+
+    sql = SQL_UPSERT if upsert else SQL_INSERIR
+    try:
+        conn.executemany(sql, [valores for _, valores in validas])
+    except sqlite3.IntegrityError:
+        # Outra requisição gravou um dos códigos depois da checagem:
+        # desfaz o lote e refaz linha a linha para descobrir quais falham
+        conn.rollback()
+        aceitas = []
+        for numero, valores in validas:
+            try:
+                conn.execute(sql, valores)
+                aceitas.append((numero, valores))
+            except sqlite3.IntegrityError:
+                _registrar_erro(resumo, numero, valores[2], 'Código já existe!')
+        validas = aceitas
+    conn.commit()
+
+    for _, valores in validas:
+        atual = existentes.get(valores[2])
+        if atual is None:
+            resumo['inseridas'] += 1
+        else:
+            resumo['atualizadas'] += 1
+            invalidar_etiqueta(atual)
+
+
+def _registrar_erro(resumo, numero, codigo, mensagem):
+    resumo['total_erros'] += 1
+    if len(resumo['erros']) < IMPORT_MAX_ERROS:
+        resumo['erros'].append({'linha': numero, 'codigo': codigo, 'erro': mensagem})
+
+
+def importar(conn, linhas, user_id, upsert=False, lote=IMPORT_LOTE):
+    """Valida e grava as linhas em transações de até `lote` etiquetas.
+
+    Linhas inválidas ou com código em conflito entram em resumo['erros']
+    sem interromper a importação. Com upsert, códigos do próprio usuário
+    são atualizados (e reativados) em vez de recusados.
+    """
+    resumo = {'linhas': 0, 'inseridas': 0, 'atualizadas': 0, 'total_erros': 0, 'erros': []}
+    pendentes = []
+
+    for numero, dados in linhas:
+        resumo['linhas'] += 1
+        try:
+            pendentes.append((numero, validar_linha(dados)))
+        except ValueError as e:
+            _registrar_erro(resumo, numero, _texto(dados.get('codigo')), str(e))
+            continue
+
+        if len(pendentes) >= lote:
+            _gravar_lote(conn, pendentes, user_id, upsert, resumo)
+            pendentes = []
+
+    if pendentes:
+        _gravar_lote(conn, pendentes, user_id, upsert, resumo)
+    return resumo
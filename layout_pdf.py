@@ -0,0 +1,555 @@
+import multiprocessing
+import os
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from reportlab.lib.pagesizes import A4, letter
+from reportlab.lib.units import mm
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.lib import colors
+import qrcode
+
+from pdf_incremental import CanvasIncremental, OperacoesPDF
+from codigo_barras import LINEARES, ZONAS_SILENCIO, modulos_barras
+from cache import cache_qr, cache_pdf, chave_conteudo
+from metricas import medir_fase, medir_iteracao
+from modelos_etiqueta import CAMPOS, MODELO_ETIQUETA, carregar as carregar_modelo
+
+
+# ==================== TAMANHOS E FOLHAS ====================
+
+TAMANHOS = {
+    'pequeno': (50 * mm, 30 * mm),
+    'medio': (80 * mm, 50 * mm),
+    'grande': (100 * mm, 70 * mm)
+}
+
+# pagina=None: rolo térmico, uma página do tamanho de cada etiqueta
+# celula=None: grade livre, cada etiqueta usa o próprio tamanho
+Folha = namedtuple('Folha', 'descricao pagina margem_x margem_y espaco_x espaco_y celula colunas linhas')
+
+FOLHAS = {
+    'a4': Folha('A4 (grade livre)', A4, 10 * mm, 10 * mm, 2 * mm, 2 * mm, None, None, None),
+    'pimaco_a4256': Folha('Pimaco A4256 (63,5 × 38,1 mm, 21 por folha)', A4,
+                          7.2 * mm, 15.15 * mm, 2.54 * mm, 0, (63.5 * mm, 38.1 * mm), 3, 7),
+    'pimaco_6180': Folha('Pimaco 6180 (66,7 × 25,4 mm, 30 por folha)', letter,
+                         4.8 * mm, 12.7 * mm, 3.1 * mm, 0, (66.7 * mm, 25.4 * mm), 3, 10),
+    'termica': Folha('Rolo térmico (uma etiqueta por página)', None, 0, 0, 0, 0, None, None, None),
+}
+
+FOLHA_PADRAO = 'a4'
+
+# Incremente ao mudar o desenho das etiquetas: invalida PDFs já em cache
+# (mudanças no JSON do modelo já entram na chave pela versão do modelo)
+LAYOUT_VERSAO = 3
+
+# Etiquetas buscadas do cursor por vez ao montar o documento
+LOTE = 500
+
+# Processos que renderizam páginas em paralelo (1 ou menos: sequencial)
+RENDER_WORKERS = int(os.environ.get('RENDER_WORKERS', os.cpu_count() or 1))
+PAGINAS_POR_SHARD = int(os.environ.get('PAGINAS_POR_SHARD', 4))
+
+# 'spawn' não herda locks e threads do worker do gunicorn (fork é inseguro aí)
+RENDER_CONTEXTO = os.environ.get('RENDER_CONTEXTO', 'spawn')
+
+# Vezes que um documento recria o pool quebrado (processo filho morto por
+# OOM ou kill) antes de terminar as páginas restantes no próprio processo
+RENDER_REINICIOS = 1
+
+
+# ==================== GEOMETRIA ====================
+
+class GeometriaEtiqueta:
+    """Medidas de uma etiqueta, calculadas uma única vez por tamanho.
+
+    Usa as proporções da etiqueta 'medio' como referência e escala fontes,
+    margens e QR para os demais tamanhos. Os PDFs seguem o modelo ativo
+    (modelos_etiqueta); estas posições, equivalentes às do modelo padrão,
+    servem à impressão térmica, que usa as fontes internas da impressora.
+    """
+
+    def __init__(self, largura, altura):
+        self.largura = largura
+        self.altura = altura
+
+        escala = min(largura / TAMANHOS['medio'][0], altura / TAMANHOS['medio'][1])
+        self.padding = max(8 * escala, 3)
+        self.fonte_nome = max(12 * escala, 6)
+        self.fonte_texto = max(9 * escala, 5)
+        self.fonte_preco = max(14 * escala, 7)
+
+        self.qr_tamanho = altura * 0.6
+        self.qr_x = largura - self.qr_tamanho - self.padding
+        self.qr_y = self.padding
+
+        # Deslocamentos das linhas de texto a partir do topo da etiqueta
+        self.y_nome = altura - self.padding - self.fonte_nome * 0.85
+        self.y_codigo = self.y_nome - self.fonte_texto * 1.65
+        self.y_categoria = self.y_codigo - self.fonte_texto * 1.45
+        self.y_preco = self.padding + self.fonte_preco * 0.4
+
+        self.largura_nome = largura - 2 * self.padding
+        self.largura_texto = self.qr_x - 2 * self.padding
+
+        # Código linear: faixa inferior direita, abaixo da categoria e ao
+        # lado do preço; com ele o texto pode ocupar a largura toda
+        self.barras_x = largura * 0.4
+        self.barras_y = self.padding
+        self.barras_largura = largura - self.barras_x - self.padding
+        self.barras_altura = self.y_categoria - self.fonte_texto - self.padding
+
+
+@lru_cache(maxsize=None)
+def geometria(largura, altura):
+    return GeometriaEtiqueta(largura, altura)
+
+
+def ajustar_texto(texto, fonte, tamanho, largura, reticencias='…'):
+    """Corta o texto para caber na largura disponível"""
+    texto = texto or ''
+    if stringWidth(texto, fonte, tamanho) <= largura:
+        return texto
+    while texto and stringWidth(texto + reticencias, fonte, tamanho) > largura:
+        texto = texto[:-1]
+    return texto + reticencias
+
+
+# ==================== MODELO ====================
+
+@lru_cache(maxsize=None)
+def modelo_ativo():
+    """Modelo de etiqueta em uso, lido e compilado uma vez por processo"""
+    return carregar_modelo(MODELO_ETIQUETA, TAMANHOS)
+
+
+def iniciar_pagina(pdf):
+    """Estado gráfico comum às etiquetas da página (cores e traço da moldura)"""
+    # Cor explícita também para o texto: na saída para gráfica vira preto K
+    pdf.setStrokeColor(colors.black)
+    pdf.setFillColor(colors.black)
+    pdf.setLineWidth(modelo_ativo().moldura)
+
+
+# ==================== DESENHO ====================
+
+def chave_etiqueta(etiqueta):
+    """Chave de cache com o modelo e todos os campos que ele pode usar no PDF da etiqueta"""
+    return chave_conteudo(
+        LAYOUT_VERSAO, modelo_ativo().versao, *(etiqueta[campo] for campo in CAMPOS_DESENHO)
+    )
+
+
+def dados_qr(etiqueta):
+    """Conteúdo codificado no QR da etiqueta"""
+    return f"Código: {etiqueta['codigo']}\nNome: {etiqueta['nome']}"
+
+
+def chave_qr(etiqueta):
+    return chave_conteudo(dados_qr(etiqueta))
+
+
+def invalidar_etiqueta(etiqueta):
+    """Remove dos caches o QR e o PDF gerados com os dados antigos da etiqueta"""
+    cache_pdf.remover(chave_etiqueta(etiqueta))
+    cache_qr.remover(chave_qr(etiqueta))
+
+
+def qr_matriz(etiqueta):
+    """Calcula os módulos do QR da etiqueta (com borda de 1 módulo)"""
+    dados = dados_qr(etiqueta)
+    chave = chave_conteudo(dados)
+
+    matriz = cache_qr.obter(chave)
+    if matriz is None:
+        with medir_fase('qr'):
+            qr = qrcode.QRCode(version=1, border=1)
+            qr.add_data(dados)
+            qr.make(fit=True)
+            matriz = qr.get_matrix()
+        cache_qr.guardar(chave, matriz)
+    return matriz
+
+
+def mascara_qr(matriz):
+    """Módulos do QR em hexadecimal, 1 bit por módulo (1 = escuro), linha a linha"""
+    digitos = (len(matriz) + 7) // 8 * 2
+    preenchimento = '0' * (digitos * 4 - len(matriz))
+    return ''.join(
+        f"{int(''.join('1' if escuro else '0' for escuro in modulos) + preenchimento, 2):0{digitos}x}"
+        for modulos in matriz
+    )
+
+
+def desenhar_qr(pdf, matriz, x, y, tamanho):
+    """Desenha o QR como máscara de imagem de 1 bit embutida no stream.
+
+    A máscara pinta os módulos escuros com a cor de preenchimento. Em
+    hexadecimal (o stream continua ASCII, o que serve também ao canvas do
+    reportlab) ocupa um terço dos retângulos vetoriais depois da
+    compressão da página; sem interpolação as bordas dos módulos ficam
+    nítidas em qualquer escala e não há emendas entre as linhas.
+    """
+    lado = len(matriz)
+    pdf.saveState()
+    pdf.setFillColor(colors.black)
+    pdf.translate(x, y)
+    pdf.scale(tamanho, tamanho)
+    pdf.addLiteral(f'BI /W {lado} /H {lado} /IM true /BPC 1 /D [1 0] /F /AHx ID {mascara_qr(matriz)}> EI')
+    pdf.restoreState()
+
+
+def desenhar_barras(pdf, modulos, legenda, quietas, x, y, largura, altura):
+    """Desenha um código linear em vetor, com a legenda legível embaixo.
+
+    As barras são retângulos em unidades de módulo sob uma transformação
+    de escala, e barras vizinhas viram um único retângulo. Ficam em vetor
+    (e não em máscara, como o QR): são poucas e o RIP da gráfica pode
+    compensar o ganho de ponto na largura de cada uma.
+    `quietas` são as zonas de silêncio (esquerda, direita) em módulos.
+    """
+    esquerda, direita = quietas
+    modulo = largura / (esquerda + len(modulos) + direita)
+    fonte = min(max(modulo * 9, 5), altura * 0.2)
+    altura_barras = altura - fonte * 1.2
+
+    operacoes = []
+    inicio = None
+    for coluna, barra in enumerate(modulos + '0'):
+        if barra == '1' and inicio is None:
+            inicio = coluna
+        elif barra == '0' and inicio is not None:
+            operacoes.append(f'{inicio} 0 {coluna - inicio} 1 re')
+            inicio = None
+    operacoes.append('f')
+
+    pdf.saveState()
+    pdf.setFillColor(colors.black)
+    pdf.translate(x + esquerda * modulo, y + fonte * 1.2)
+    pdf.scale(modulo, altura_barras)
+    pdf.addLiteral('\n'.join(operacoes))
+    pdf.restoreState()
+
+    pdf.setFont("Helvetica", fonte)
+    pdf.drawString(x + (largura - stringWidth(legenda, "Helvetica", fonte)) / 2, y + fonte * 0.25, legenda)
+
+
+ESCRITA = {'esquerda': 'drawString', 'centro': 'drawCentredString', 'direita': 'drawRightString'}
+
+
+def desenhar_etiqueta(pdf, etiqueta, x, y, geo):
+    """Desenha uma etiqueta com o canto inferior esquerdo em (x, y).
+
+    Executa o plano já compilado do modelo ativo para o tamanho e o tipo
+    de código: aqui só se preenchem os dados da etiqueta.
+    """
+    simbologia = etiqueta['simbologia']
+    plano = modelo_ativo().plano(geo.largura, geo.altura, 'barras' if simbologia in LINEARES else 'qr')
+    valores = plano.valores(etiqueta)
+    fonte_atual = None
+
+    for operacao in plano.operacoes:
+        tipo = operacao[0]
+        if tipo == 'texto':
+            _, fonte, tamanho, dx, dy, largura, formato, quando, alinhar = operacao
+            if quando and not valores[quando]:
+                continue
+            if (fonte, tamanho) != fonte_atual:
+                pdf.setFont(fonte, tamanho)
+                fonte_atual = (fonte, tamanho)
+            texto = ajustar_texto(formato.format_map(valores), fonte, tamanho, largura)
+            getattr(pdf, ESCRITA[alinhar])(x + dx, y + dy, texto)
+        elif tipo == 'qr':
+            _, dx, dy, lado = operacao
+            desenhar_qr(pdf, qr_matriz(etiqueta), x + dx, y + dy, lado)
+        elif tipo == 'barras':
+            _, dx, dy, largura, altura = operacao
+            desenhar_barras(pdf, modulos_barras(etiqueta['codigo'], simbologia), etiqueta['codigo'],
+                            ZONAS_SILENCIO[simbologia], x + dx, y + dy, largura, altura)
+        else:
+            pdf.rect(x, y, operacao[1], operacao[2])
+
+
+# ==================== POSICIONAMENTO ====================
+
+def _tamanho(etiqueta):
+    return TAMANHOS.get(etiqueta['tamanho'], TAMANHOS['medio'])
+
+
+def _posicoes_grade_fixa(folha, etiquetas):
+    """Células de uma folha pré-cortada (Pimaco), na ordem de leitura"""
+    largura_pagina, altura_pagina = folha.pagina
+    largura, altura = folha.celula
+    geo = geometria(largura, altura)
+    por_folha = folha.colunas * folha.linhas
+
+    for indice, etiqueta in enumerate(etiquetas):
+        celula = indice % por_folha
+        if celula == 0:
+            yield None, None, None, None
+        linha, coluna = divmod(celula, folha.colunas)
+        x = folha.margem_x + coluna * (largura + folha.espaco_x)
+        y = altura_pagina - folha.margem_y - (linha + 1) * altura - linha * folha.espaco_y
+        yield etiqueta, x, y, geo
+
+
+def _posicoes_grade_livre(folha, etiquetas):
+    """Empacota etiquetas de tamanhos variados em prateleiras (linhas)"""
+    largura_pagina, altura_pagina = folha.pagina
+    limite_x = largura_pagina - folha.margem_x
+    topo = altura_pagina - folha.margem_y
+
+    x = y_linha = altura_linha = None
+    for etiqueta in etiquetas:
+        largura, altura = _tamanho(etiqueta)
+
+        if x is not None and x + largura > limite_x:
+            # Próxima prateleira
+            y_linha -= altura_linha + folha.espaco_y
+            x, altura_linha = folha.margem_x, 0
+
+        if x is None or y_linha - altura < folha.margem_y:
+            yield None, None, None, None
+            x, y_linha, altura_linha = folha.margem_x, topo, 0
+
+        altura_linha = max(altura_linha, altura)
+        yield etiqueta, x, y_linha - altura, geometria(largura, altura)
+        x += largura + folha.espaco_x
+
+
+def _posicoes_rolo(folha, etiquetas):
+    """Uma etiqueta por página, com a página do tamanho da etiqueta"""
+    for etiqueta in etiquetas:
+        largura, altura = _tamanho(etiqueta)
+        yield None, largura, altura, None
+        yield etiqueta, 0, 0, geometria(largura, altura)
+
+
+def posicoes(folha, etiquetas):
+    """Gera (etiqueta, x, y, geometria); etiqueta None indica nova página.
+
+    Na quebra de página do rolo térmico x e y trazem o tamanho da página.
+    """
+    if folha.pagina is None:
+        return _posicoes_rolo(folha, etiquetas)
+    if folha.celula is None:
+        return _posicoes_grade_livre(folha, etiquetas)
+    return _posicoes_grade_fixa(folha, etiquetas)
+
+
+# ==================== DOCUMENTO ====================
+
+def iterar_lotes(cursor, tamanho=LOTE):
+    """Percorre o cursor em lotes, sem carregar todas as linhas de uma vez"""
+    while True:
+        linhas = cursor.fetchmany(tamanho)
+        if not linhas:
+            return
+        yield from linhas
+
+
+def renderizar_paginas(pdf, etiquetas, formato=FOLHA_PADRAO):
+    """Distribui as etiquetas pelas páginas do canvas.
+
+    Gera (etiquetas, páginas) desenhadas até o momento a cada página
+    concluída, o que permite enviar ou reportar o progresso durante a
+    renderização. A última página só é fechada pelo save() do chamador.
+    """
+    folha = FOLHAS.get(formato, FOLHAS[FOLHA_PADRAO])
+    total = paginas = 0
+
+    for etiqueta, x, y, geo in posicoes(folha, etiquetas):
+        if etiqueta is None:
+            if paginas:
+                pdf.showPage()
+                yield total, paginas
+            pdf.setPageSize(folha.pagina or (x, y))
+            iniciar_pagina(pdf)
+            paginas += 1
+            continue
+
+        desenhar_etiqueta(pdf, etiqueta, x, y, geo)
+        total += 1
+
+    yield total, paginas
+
+
+def renderizar(pdf, etiquetas, formato=FOLHA_PADRAO):
+    """Desenha todas as etiquetas no canvas; retorna (etiquetas, páginas)"""
+    progresso = (0, 0)
+    for progresso in renderizar_paginas(pdf, etiquetas, formato):
+        pass
+    return progresso
+
+
+def gerar_pdf_incremental(etiquetas, formato=FOLHA_PADRAO, workers=None, impressao=False):
+    """Gera os bytes do PDF à medida que as páginas ficam prontas"""
+    pdf = CanvasIncremental(impressao=impressao)
+    for _ in medir_iteracao(renderizar_paginas_paralelo(pdf, etiquetas, formato, workers), 'pdf'):
+        dados = pdf.retirar()
+        if dados:
+            yield dados
+    with medir_fase('pdf'):
+        pdf.save()
+    yield pdf.retirar()
+
+
+# ==================== RENDERIZAÇÃO PARALELA ====================
+# Desenhar texto e QR é CPU puro e o GIL impede ganho com threads. As páginas
+# são planejadas no processo principal (posicionamento é barato e depende da
+# ordem), enviadas em shards a um pool de processos que devolve o stream de
+# conteúdo já comprimido de cada página, e gravadas em ordem pelo
+# CanvasIncremental. Não há junção de PDFs: só os bytes das páginas viajam.
+
+# Campos da etiqueta usados no desenho (sqlite3.Row não é serializável)
+CAMPOS_DESENHO = CAMPOS
+
+_pool_render = None
+_pool_render_chave = None
+_pool_render_lock = threading.Lock()
+
+
+def _obter_pool_render(workers):
+    """Pool de processos persistente, recriado se o worker for outro processo ou se quebrou"""
+    global _pool_render, _pool_render_chave
+    chave = (os.getpid(), workers)
+    with _pool_render_lock:
+        if _pool_render_chave != chave or _pool_render._broken:
+            if _pool_render is not None and _pool_render_chave[0] == os.getpid():
+                _pool_render.shutdown(wait=False, cancel_futures=True)
+            # initializer: cada processo compila o modelo ao subir, não no primeiro shard
+            _pool_render = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context(RENDER_CONTEXTO),
+                initializer=modelo_ativo
+            )
+            _pool_render_chave = chave
+        return _pool_render
+
+
+def _descartar_pool_render(executor):
+    """Tira do cache um pool quebrado; o próximo pedido cria outro"""
+    global _pool_render, _pool_render_chave
+    with _pool_render_lock:
+        if _pool_render is executor:
+            _pool_render = _pool_render_chave = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def planejar_paginas(etiquetas, formato=FOLHA_PADRAO):
+    """Gera (tamanho_pagina, [(etiqueta, x, y, largura, altura)]) por página"""
+    folha = FOLHAS.get(formato, FOLHAS[FOLHA_PADRAO])
+    pagina = None
+
+    for etiqueta, x, y, geo in posicoes(folha, etiquetas):
+        if etiqueta is None:
+            if pagina is not None:
+                yield pagina
+            pagina = (folha.pagina or (x, y), [])
+            continue
+        pagina[1].append((
+            {campo: etiqueta[campo] for campo in CAMPOS_DESENHO},
+            x, y, geo.largura, geo.altura
+        ))
+
+    if pagina is not None:
+        yield pagina
+
+
+def renderizar_shard(paginas, impressao=False):
+    """Executado no processo filho: devolve [(tamanho, conteúdo comprimido, etiquetas)]"""
+    pdf = OperacoesPDF(impressao=impressao)
+    resultado = []
+    for tamanho, itens in paginas:
+        iniciar_pagina(pdf)
+        for etiqueta, x, y, largura, altura in itens:
+            desenhar_etiqueta(pdf, etiqueta, x, y, geometria(largura, altura))
+        resultado.append((tamanho, pdf.conteudo_pagina(), len(itens)))
+    return resultado
+
+
+def _shards(paginas, tamanho):
+    shard = []
+    for pagina in paginas:
+        shard.append(pagina)
+        if len(shard) == tamanho:
+            yield shard
+            shard = []
+    if shard:
+        yield shard
+
+
+def renderizar_paginas_paralelo(pdf, etiquetas, formato=FOLHA_PADRAO, workers=None):
+    """Como renderizar_paginas, mas com as páginas desenhadas em um pool de processos.
+
+    Exige um CanvasIncremental. Mantém no máximo 2 shards por worker em
+    andamento, então a memória continua limitada mesmo com o cursor inteiro
+    pela frente. Com um worker só (ou uma CPU) cai no caminho sequencial.
+    Se um processo do pool morre o documento não se perde: o pool é
+    recriado (RENDER_REINICIOS vezes) e, depois disso, as páginas restantes
+    são desenhadas aqui mesmo.
+    """
+    workers = RENDER_WORKERS if workers is None else workers
+    if workers <= 1:
+        yield from renderizar_paginas(pdf, etiquetas, formato)
+        return
+
+    executor = _obter_pool_render(workers)
+    reinicios = 0
+    pendentes = deque()
+    total = paginas = 0
+
+    def submeter(shard):
+        # None: o shard é desenhado neste processo na hora de gravar
+        if executor is None:
+            return None
+        try:
+            return executor.submit(renderizar_shard, shard, pdf.impressao)
+        except BrokenProcessPool:
+            return None
+
+    def recriar():
+        # Um filho morreu e o pool inteiro ficou inutilizável (os shards em
+        # andamento também falham): recria e reenvia o que está pendente
+        nonlocal executor, reinicios
+        _descartar_pool_render(executor)
+        reinicios += 1
+        executor = _obter_pool_render(workers) if reinicios <= RENDER_REINICIOS else None
+        for item in pendentes:
+            item[1] = submeter(item[0])
+
+    def gravar(shard, futuro):
+        nonlocal total, paginas
+        while True:
+            if futuro is None:
+                resultado = renderizar_shard(shard, pdf.impressao)
+                break
+            try:
+                resultado = futuro.result()
+                break
+            except BrokenProcessPool:
+                recriar()
+                futuro = submeter(shard)
+        for tamanho, conteudo, quantidade in resultado:
+            pdf.adicionar_pagina(conteudo, tamanho)
+            total += quantidade
+            paginas += 1
+
+    try:
+        for shard in _shards(planejar_paginas(etiquetas, formato), PAGINAS_POR_SHARD):
+            pendentes.append([shard, submeter(shard)])
+            if len(pendentes) >= workers * 2:
+                gravar(*pendentes.popleft())
+                yield total, paginas
+        while pendentes:
+            gravar(*pendentes.popleft())
+            yield total, paginas
+    finally:
+        # Cliente desconectou ou erro: não desperdiça CPU com o resto
+        for _, futuro in pendentes:
+            if futuro is not None:
+                futuro.cancel()
+
+    yield total, paginas
@@ -0,0 +1,302 @@
+import cProfile
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, before_render_template, has_request_context, request, template_rendered
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import pyinstrument
+except ImportError:  # pyinstrument é opcional; sem ele o perfil usa cProfile
+    pyinstrument = None
+
+
+# ==================== CONFIGURAÇÕES ====================
+
+# Requisições mais lentas que isso têm o perfil gravado (0 desativa o perfilamento)
+PERFIL_LENTO_MS = float(os.environ.get('PERFIL_LENTO_MS', 0))
+PERFIL_PASTA = os.path.abspath(os.environ.get('PERFIL_PASTA', 'perfis'))
+
+# 'cprofile' (arquivo .prof, abra com snakeviz ou pstats) ou 'pyinstrument' (.html)
+PERFIL_FERRAMENTA = os.environ.get('PERFIL_FERRAMENTA', 'cprofile')
+
+# Limites dos buckets do histograma de latência, em segundos
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Chave da medição no environ WSGI: vale também durante o streaming da resposta
+CHAVE = 'etiquetas.medicao'
+
+# O aviso de requisição lenta sai num logger próprio: sob o gunicorn pode ser
+# filtrado ou encaminhado pelos handlers de log
+logger = logging.getLogger('etiquetas.metricas')
+
+
+# ==================== MEDIÇÃO POR REQUISIÇÃO ====================
+# Cada requisição acumula o tempo gasto por fase. As fases podem se
+# sobrepor: o QR é gerado dentro do PDF, e consultas feitas enquanto o PDF
+# é montado contam nas duas. Fora de uma requisição (CLI, threads de
+# exportação, processos de renderização) as medições são ignoradas.
+
+class Medicao:
+    __slots__ = ('inicio', 'fases', 'consultas', 'rota', 'metodo_http', 'status', 'render_inicio')
+
+    def __init__(self, metodo_http=''):
+        self.inicio = time.perf_counter()
+        self.metodo_http = metodo_http
+        self.fases = defaultdict(float)
+        self.consultas = 0
+        self.rota = None
+        self.status = None
+        self.render_inicio = None
+
+
+def atual():
+    """Medição da requisição em andamento, ou None"""
+    if not has_request_context():
+        return None
+    return request.environ.get(CHAVE)
+
+
+class medir_fase:
+    """Context manager que soma a duração do bloco à fase da requisição atual.
+
+    Classe em vez de @contextmanager: roda em toda consulta ao banco.
+    """
+    __slots__ = ('fase', 'consulta', 'medicao', 'inicio')
+
+    def __init__(self, fase, consulta=False):
+        self.fase = fase
+        self.consulta = consulta
+
+    def __enter__(self):
+        self.medicao = atual()
+        if self.medicao is not None:
+            self.inicio = time.perf_counter()
+
+    def __exit__(self, *excecao):
+        if self.medicao is not None:
+            self.medicao.fases[self.fase] += time.perf_counter() - self.inicio
+            if self.consulta:
+                self.medicao.consultas += 1
+
+
+def medir_iteracao(iteravel, fase):
+    """Repassa os itens medindo o tempo de produzir cada um (respostas em streaming)"""
+    iterador = iter(iteravel)
+    while True:
+        with medir_fase(fase):
+            try:
+                item = next(iterador)
+            except StopIteration:
+                return
+        yield item
+
+
+# ==================== REGISTRO (PROMETHEUS) ====================
+# Agregado por processo: com vários workers do gunicorn cada coleta do
+# /metrics mostra o worker que atendeu (use o rótulo pid para separá-los).
+
+class Registro:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.limpar()
+
+    def limpar(self):
+        with self._lock:
+            self.histogramas = {}
+            self.requisicoes = defaultdict(int)
+            self.fases = defaultdict(float)
+            self.consultas = defaultdict(int)
+
+    def registrar(self, medicao, duracao):
+        rota, metodo = medicao.rota or '<sem rota>', medicao.metodo_http
+        with self._lock:
+            contagens = self.histogramas.get((rota, metodo))
+            if contagens is None:
+                contagens = self.histogramas[(rota, metodo)] = [0] * len(BUCKETS) + [0, 0.0]
+            for indice, limite in enumerate(BUCKETS):
+                if duracao <= limite:
+                    contagens[indice] += 1
+            contagens[-2] += 1
+            contagens[-1] += duracao
+
+            self.requisicoes[(rota, metodo, medicao.status or '')] += 1
+            self.consultas[rota] += medicao.consultas
+            for fase, segundos in medicao.fases.items():
+                self.fases[(rota, fase)] += segundos
+
+    def exportar(self):
+        """Texto no formato de exposição do Prometheus (0.0.4)"""
+        pid = os.getpid()
+        linhas = [
+            '# HELP etiquetas_requisicao_segundos Latência das requisições por rota',
+            '# TYPE etiquetas_requisicao_segundos histogram',
+        ]
+        with self._lock:
+            for (rota, metodo), contagens in sorted(self.histogramas.items()):
+                rotulos = f'rota="{_rotulo(rota)}",metodo="{metodo}",pid="{pid}"'
+                for limite, quantidade in zip(BUCKETS, contagens):
+                    linhas.append(f'etiquetas_requisicao_segundos_bucket{{{rotulos},le="{limite}"}} {quantidade}')
+                linhas.append(f'etiquetas_requisicao_segundos_bucket{{{rotulos},le="+Inf"}} {contagens[-2]}')
+                linhas.append(f'etiquetas_requisicao_segundos_count{{{rotulos}}} {contagens[-2]}')
+                linhas.append(f'etiquetas_requisicao_segundos_sum{{{rotulos}}} {contagens[-1]:.6f}')
+
+            linhas += ['# HELP etiquetas_requisicoes_total Requisições atendidas',
+                       '# TYPE etiquetas_requisicoes_total counter']
+            for (rota, metodo, status), quantidade in sorted(self.requisicoes.items()):
+                linhas.append(f'etiquetas_requisicoes_total{{rota="{_rotulo(rota)}",metodo="{metodo}",'
+                              f'status="{status}",pid="{pid}"}} {quantidade}')
+
+            linhas += ['# HELP etiquetas_fase_segundos_total Tempo acumulado por fase (db, render, qr, pdf)',
+                       '# TYPE etiquetas_fase_segundos_total counter']
+            for (rota, fase), segundos in sorted(self.fases.items()):
+                linhas.append(f'etiquetas_fase_segundos_total{{rota="{_rotulo(rota)}",fase="{fase}",'
+                              f'pid="{pid}"}} {segundos:.6f}')
+
+            linhas += ['# HELP etiquetas_consultas_total Consultas ao banco feitas pelas requisições',
+                       '# TYPE etiquetas_consultas_total counter']
+            for rota, quantidade in sorted(self.consultas.items()):
+                linhas.append(f'etiquetas_consultas_total{{rota="{_rotulo(rota)}",pid="{pid}"}} {quantidade}')
+        return '\n'.join(linhas) + '\n'
+
+
+def _rotulo(valor):
+    return valor.replace('\\', '\\\\').replace('"', '\\"')
+
+
+registro = Registro()
+
+
+# ==================== PERFIL DE REQUISIÇÕES LENTAS ====================
+
+# Um perfil por vez no processo: no Python 3.12 o cProfile usa o
+# sys.monitoring, que é global, e um segundo profiler ativo levanta
+# ValueError. Requisições simultâneas (threads do gthread) seguem sem perfil.
+_perfil_lock = threading.Lock()
+
+
+class _Perfil:
+    """Perfila a requisição inteira (inclusive o streaming) e grava se passar do limite"""
+
+    @classmethod
+    def iniciar(cls):
+        """Perfil da requisição, ou None se outra já está sendo perfilada"""
+        if not _perfil_lock.acquire(blocking=False):
+            return None
+        try:
+            return cls()
+        except ValueError:
+            # Outra ferramenta de perfil (fora deste módulo) já está ativa
+            _perfil_lock.release()
+            return None
+
+    def __init__(self):
+        self.cprofile = PERFIL_FERRAMENTA != 'pyinstrument' or pyinstrument is None
+        if self.cprofile:
+            self.perfilador = cProfile.Profile()
+            self.perfilador.enable()
+        else:
+            self.perfilador = pyinstrument.Profiler(async_mode='disabled')
+            self.perfilador.start()
+
+    def concluir(self, medicao, duracao):
+        try:
+            if self.cprofile:
+                self.perfilador.disable()
+            else:
+                self.perfilador.stop()
+        finally:
+            _perfil_lock.release()
+        if duracao * 1000 < PERFIL_LENTO_MS:
+            return None
+
+        os.makedirs(PERFIL_PASTA, exist_ok=True)
+        rota = re.sub(r'\W+', '_', medicao.rota or 'sem_rota').strip('_') or 'raiz'
+        base = os.path.join(PERFIL_PASTA, f"{time.strftime('%Y%m%d-%H%M%S')}_{rota}_{duracao * 1000:.0f}ms")
+        if self.cprofile:
+            caminho = base + '.prof'
+            self.perfilador.dump_stats(caminho)
+        else:
+            caminho = base + '.html'
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                arquivo.write(self.perfilador.output_html())
+        return caminho
+
+
+# ==================== MIDDLEWARE ====================
+
+class Instrumentacao:
+    """Middleware WSGI: a medição termina quando o servidor fecha a resposta,
+    então rotas em streaming (PDF em lote, exportações) são medidas inteiras."""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        medicao = environ[CHAVE] = Medicao(environ.get('REQUEST_METHOD', ''))
+        perfil = _Perfil.iniciar() if PERFIL_LENTO_MS > 0 else None
+
+        def iniciar_resposta(status, cabecalhos, exc_info=None):
+            medicao.status = status.split(' ', 1)[0]
+            return start_response(status, cabecalhos, exc_info)
+
+        def concluir():
+            duracao = time.perf_counter() - medicao.inicio
+            registro.registrar(medicao, duracao)
+            if perfil is not None:
+                caminho = perfil.concluir(medicao, duracao)
+                if caminho:
+                    fases = ', '.join(f'{fase} {segundos * 1000:.0f} ms' for fase, segundos in medicao.fases.items())
+                    logger.warning('Requisição lenta: %s %s %.0f ms (%s; %d consultas) - perfil em %s',
+                                   medicao.metodo_http, medicao.rota, duracao * 1000, fases,
+                                   medicao.consultas, caminho)
+
+        try:
+            resposta = self.wsgi_app(environ, iniciar_resposta)
+        except Exception:
+            concluir()
+            raise
+        return ClosingIterator(resposta, [concluir])
+
+
+def init_app(app):
+    app.wsgi_app = Instrumentacao(app.wsgi_app)
+
+    @app.before_request
+    def marcar_rota():
+        medicao = atual()
+        if medicao is not None:
+            medicao.rota = request.url_rule.rule if request.url_rule else None
+
+    @app.after_request
+    def server_timing(resposta):
+        # Respostas em streaming ainda não fizeram o trabalho pesado aqui
+        medicao = atual()
+        if medicao is not None and not resposta.is_streamed:
+            fases = [f'{fase};dur={segundos * 1000:.1f}' for fase, segundos in medicao.fases.items()]
+            fases.append(f'total;dur={(time.perf_counter() - medicao.inicio) * 1000:.1f}')
+            resposta.headers['Server-Timing'] = ', '.join(fases)
+            resposta.headers['X-Consultas'] = str(medicao.consultas)
+        return resposta
+
+    def inicio_render(sender, **extra):
+        medicao = atual()
+        if medicao is not None:
+            medicao.render_inicio = time.perf_counter()
+
+    def fim_render(sender, **extra):
+        medicao = atual()
+        if medicao is not None and medicao.render_inicio is not None:
+            medicao.fases['render'] += time.perf_counter() - medicao.render_inicio
+            medicao.render_inicio = None
+
+    before_render_template.connect(inicio_render, app, weak=False)
+    template_rendered.connect(fim_render, app, weak=False)
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(registro.exportar(), mimetype='text/plain; version=0.0.4')
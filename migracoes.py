@@ -0,0 +1,321 @@
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# ==================== MIGRAÇÕES ====================
+# Cada migração é aplicada uma única vez, em ordem, dentro de uma transação.
+# Nunca altere uma migração já publicada: crie uma nova com a próxima versão.
+
+MIGRACOES = [
+    (1, 'tabelas iniciais', [
+        '''CREATE TABLE IF NOT EXISTS usuarios (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               username TEXT UNIQUE NOT NULL,
+               email TEXT UNIQUE NOT NULL,
+               password TEXT NOT NULL,
+               data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+           )''',
+        '''CREATE TABLE IF NOT EXISTS etiquetas (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               nome TEXT NOT NULL,
+               descricao TEXT,
+               codigo TEXT UNIQUE NOT NULL,
+               categoria TEXT,
+               preco REAL,
+               tamanho TEXT DEFAULT 'medio',
+               data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+               ativo INTEGER DEFAULT 1,
+               user_id INTEGER,
+               FOREIGN KEY (user_id) REFERENCES usuarios (id)
+           )''',
+    ]),
+    (2, 'índices das listagens por usuário', [
+        '''CREATE INDEX IF NOT EXISTS idx_etiquetas_usuario_data
+           ON etiquetas (user_id, ativo, data_criacao DESC)''',
+        '''CREATE INDEX IF NOT EXISTS idx_etiquetas_usuario_nome
+           ON etiquetas (user_id, ativo, nome)''',
+        'ANALYZE',
+    ]),
+    (3, 'índice da paginação por (data_criacao, id)', [
+        'DROP INDEX IF EXISTS idx_etiquetas_usuario_data',
+        '''CREATE INDEX IF NOT EXISTS idx_etiquetas_usuario_data_id
+           ON etiquetas (user_id, ativo, data_criacao, id)''',
+        'ANALYZE',
+    ]),
+    (4, 'busca textual FTS5', [
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS etiquetas_fts USING fts5 (
+               nome, descricao, codigo, categoria,
+               content = 'etiquetas',
+               content_rowid = 'id',
+               tokenize = 'unicode61 remove_diacritics 2',
+               prefix = '2 3 4'
+           )''',
+        # Só etiquetas ativas entram no índice; a exclusão lógica as remove
+        '''CREATE TRIGGER IF NOT EXISTS etiquetas_fts_insert AFTER INSERT ON etiquetas
+           WHEN new.ativo = 1 BEGIN
+               INSERT INTO etiquetas_fts (rowid, nome, descricao, codigo, categoria)
+               VALUES (new.id, new.nome, new.descricao, new.codigo, new.categoria);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS etiquetas_fts_delete AFTER DELETE ON etiquetas
+           WHEN old.ativo = 1 BEGIN
+               INSERT INTO etiquetas_fts (etiquetas_fts, rowid, nome, descricao, codigo, categoria)
+               VALUES ('delete', old.id, old.nome, old.descricao, old.codigo, old.categoria);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS etiquetas_fts_update
+           AFTER UPDATE OF nome, descricao, codigo, categoria, ativo ON etiquetas BEGIN
+               INSERT INTO etiquetas_fts (etiquetas_fts, rowid, nome, descricao, codigo, categoria)
+               SELECT 'delete', old.id, old.nome, old.descricao, old.codigo, old.categoria
+               WHERE old.ativo = 1;
+               INSERT INTO etiquetas_fts (rowid, nome, descricao, codigo, categoria)
+               SELECT new.id, new.nome, new.descricao, new.codigo, new.categoria
+               WHERE new.ativo = 1;
+           END''',
+        '''INSERT INTO etiquetas_fts (rowid, nome, descricao, codigo, categoria)
+           SELECT id, nome, descricao, codigo, categoria FROM etiquetas WHERE ativo = 1''',
+    ]),
+    (5, 'fila de exportações em segundo plano', [
+        '''CREATE TABLE IF NOT EXISTS exportacoes (
+               id TEXT PRIMARY KEY,
+               user_id INTEGER NOT NULL,
+               status TEXT NOT NULL DEFAULT 'pendente',
+               formato TEXT NOT NULL,
+               total INTEGER NOT NULL DEFAULT 0,
+               feitos INTEGER NOT NULL DEFAULT 0,
+               arquivo TEXT,
+               erro TEXT,
+               criada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+               atualizada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+               concluida_em TIMESTAMP,
+               expira_em TIMESTAMP,
+               FOREIGN KEY (user_id) REFERENCES usuarios (id)
+           )''',
+        'CREATE INDEX IF NOT EXISTS idx_exportacoes_usuario ON exportacoes (user_id, criada_em)',
+        'CREATE INDEX IF NOT EXISTS idx_exportacoes_expiracao ON exportacoes (expira_em)',
+    ]),
+    (6, 'tokens da API', [
+        # Só o hash SHA-256 do token é guardado; o token aparece uma única vez
+        '''CREATE TABLE IF NOT EXISTS api_tokens (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               user_id INTEGER NOT NULL,
+               token_hash TEXT UNIQUE NOT NULL,
+               descricao TEXT,
+               criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+               revogado_em TIMESTAMP,
+               FOREIGN KEY (user_id) REFERENCES usuarios (id)
+           )''',
+    ]),
+    (7, 'simbologia do código por etiqueta', [
+        # qr, ean13 ou code128 (ver codigo_barras.SIMBOLOGIAS)
+        "ALTER TABLE etiquetas ADD COLUMN simbologia TEXT NOT NULL DEFAULT 'qr'",
+    ]),
+    (8, 'registro de alterações das etiquetas', [
+        # O SQLite não aceita DEFAULT CURRENT_TIMESTAMP em ADD COLUMN: os
+        # triggers abaixo preenchem a coluna
+        'ALTER TABLE etiquetas ADD COLUMN atualizado_em TIMESTAMP',
+        'UPDATE etiquetas SET atualizado_em = data_criacao',
+        '''CREATE TABLE IF NOT EXISTS etiquetas_alteracoes (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               etiqueta_id INTEGER NOT NULL,
+               user_id INTEGER,
+               operacao TEXT NOT NULL,
+               alterada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+           )''',
+        'CREATE INDEX IF NOT EXISTS idx_alteracoes_usuario_id ON etiquetas_alteracoes (user_id, id)',
+        '''CREATE INDEX IF NOT EXISTS idx_alteracoes_usuario_data
+           ON etiquetas_alteracoes (user_id, alterada_em)''',
+        # Última alteração já impressa por usuário ("imprimir alterações")
+        '''CREATE TABLE IF NOT EXISTS pontos_alteracoes (
+               user_id INTEGER PRIMARY KEY,
+               alteracao_id INTEGER NOT NULL,
+               registrado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+           )''',
+        # Os triggers cobrem criar/editar/deletar, a importação e a API.
+        # O UPDATE de atualizado_em não dispara o trigger de edição (nem o
+        # do FTS), que só observam as colunas de conteúdo.
+        '''CREATE TRIGGER IF NOT EXISTS etiquetas_alteracoes_insert AFTER INSERT ON etiquetas BEGIN
+               UPDATE etiquetas SET atualizado_em = CURRENT_TIMESTAMP WHERE id = new.id;
+               INSERT INTO etiquetas_alteracoes (etiqueta_id, user_id, operacao)
+               VALUES (new.id, new.user_id, 'criacao');
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS etiquetas_alteracoes_update
+           AFTER UPDATE OF nome, descricao, codigo, categoria, preco, tamanho, simbologia, ativo ON etiquetas
+           WHEN old.nome IS NOT new.nome OR old.descricao IS NOT new.descricao
+             OR old.codigo IS NOT new.codigo OR old.categoria IS NOT new.categoria
+             OR old.preco IS NOT new.preco OR old.tamanho IS NOT new.tamanho
+             OR old.simbologia IS NOT new.simbologia OR old.ativo IS NOT new.ativo BEGIN
+               UPDATE etiquetas SET atualizado_em = CURRENT_TIMESTAMP WHERE id = new.id;
+               INSERT INTO etiquetas_alteracoes (etiqueta_id, user_id, operacao)
+               VALUES (new.id, new.user_id, CASE
+                   WHEN new.ativo = 0 THEN 'exclusao'
+                   WHEN old.ativo = 0 THEN 'reativacao'
+                   ELSE 'edicao'
+               END);
+           END''',
+    ]),
+    (9, 'arquivo de etiquetas excluídas', [
+        # Mesmas colunas de etiquetas (sem ativo), mais o momento do arquivamento
+        '''CREATE TABLE IF NOT EXISTS etiquetas_arquivo (
+               id INTEGER PRIMARY KEY,
+               nome TEXT NOT NULL,
+               descricao TEXT,
+               codigo TEXT NOT NULL,
+               categoria TEXT,
+               preco REAL,
+               tamanho TEXT,
+               simbologia TEXT NOT NULL DEFAULT 'qr',
+               data_criacao TIMESTAMP,
+               atualizado_em TIMESTAMP,
+               user_id INTEGER,
+               arquivada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+           )''',
+        '''CREATE INDEX IF NOT EXISTS idx_arquivo_usuario
+           ON etiquetas_arquivo (user_id, atualizado_em)''',
+        # Índice parcial: só as excluídas, que o job de arquivamento percorre
+        '''CREATE INDEX IF NOT EXISTS idx_etiquetas_excluidas
+           ON etiquetas (atualizado_em) WHERE ativo = 0''',
+        '''CREATE TABLE IF NOT EXISTS manutencoes (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               iniciada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+               concluida_em TIMESTAMP,
+               arquivadas INTEGER,
+               vacuum INTEGER,
+               erro TEXT
+           )''',
+    ]),
+    (10, 'saída para gráfica nas exportações', [
+        # 1 = CMYK com sangria e TrimBox (pdf_incremental, impressao=True)
+        'ALTER TABLE exportacoes ADD COLUMN impressao INTEGER NOT NULL DEFAULT 0',
+    ]),
+]
+
+
+def versao_atual(conn):
+    """Retorna a versão do schema registrada no banco (0 se nenhuma)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            versao INTEGER PRIMARY KEY,
+            descricao TEXT NOT NULL,
+            aplicada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    return conn.execute('SELECT COALESCE(MAX(versao), 0) FROM schema_version').fetchone()[0]
+
+
+def migrar(conn):
+    """Aplica as migrações pendentes e retorna as versões aplicadas"""
+    aplicadas = []
+    versao = versao_atual(conn)
+
+    for numero, descricao, comandos in MIGRACOES:
+        if numero <= versao:
+            continue
+
+        conn.execute('BEGIN')
+        try:
+            for comando in comandos:
+                conn.execute(comando)
+            conn.execute(
+                'INSERT INTO schema_version (versao, descricao) VALUES (?, ?)',
+                (numero, descricao)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        aplicadas.append(numero)
+
+    return aplicadas
+
+
+@contextmanager
+def trava_arquivo(caminho):
+    """Trava exclusiva entre processos (workers do gunicorn) via arquivo"""
+    with open(caminho, 'a+') as arquivo:
+        if fcntl:
+            fcntl.flock(arquivo, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(arquivo.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(arquivo, fcntl.LOCK_UN)
+            else:
+                arquivo.seek(0)
+                msvcrt.locking(arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def migrar_com_trava(conn, caminho_banco):
+    """Migra o banco garantindo que só um worker execute as migrações"""
+    ultima = MIGRACOES[-1][0]
+    if versao_atual(conn) >= ultima:
+        return []
+
+    with trava_arquivo(os.path.abspath(caminho_banco) + '.migracao.lock'):
+        # Outro worker pode ter migrado enquanto esperávamos a trava
+        return migrar(conn)
+
+
+# ==================== VERIFICAÇÃO DE PLANOS ====================
+# Consultas críticas que precisam usar índice. Mantenha em sincronia
+# com as rotas do app.py.
+
+CONSULTAS_CRITICAS = {
+    'index': (
+        '''SELECT * FROM etiquetas WHERE ativo = 1 AND user_id = ?
+           ORDER BY data_criacao DESC, id DESC LIMIT ?''',
+        (1, 49)
+    ),
+    'index (página seguinte)': (
+        '''SELECT * FROM etiquetas WHERE ativo = 1 AND user_id = ?
+           AND (data_criacao, id) < (?, ?)
+           ORDER BY data_criacao DESC, id DESC LIMIT ?''',
+        (1, '2024-01-01 00:00:00', 100, 49)
+    ),
+    'index (página anterior)': (
+        '''SELECT * FROM etiquetas WHERE ativo = 1 AND user_id = ?
+           AND (data_criacao, id) > (?, ?)
+           ORDER BY data_criacao ASC, id ASC LIMIT ?''',
+        (1, '2024-01-01 00:00:00', 100, 49)
+    ),
+    'gerar_pdf_todas': (
+        'SELECT * FROM etiquetas WHERE ativo = 1 AND user_id = ? ORDER BY nome',
+        (1,)
+    ),
+    # Sem ORDER BY: ordenar em memória as poucas alteradas é o esperado
+    'gerar_pdf_alteracoes': (
+        '''SELECT * FROM etiquetas
+           WHERE ativo = 1 AND user_id = ? AND id IN (
+               SELECT etiqueta_id FROM etiquetas_alteracoes WHERE user_id = ? AND id > ?
+           )''',
+        (1, 1, 0)
+    ),
+    'arquivamento': (
+        '''SELECT id FROM etiquetas
+           WHERE ativo = 0 AND atualizado_em < datetime('now', ?) LIMIT ?''',
+        ('-30 days', 1000)
+    ),
+    'feed de alterações': (
+        '''SELECT id, etiqueta_id, operacao, alterada_em FROM etiquetas_alteracoes
+           WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?''',
+        (1, 0, 100)
+    ),
+}
+
+
+def verificar_planos(conn):
+    """Retorna {consulta: plano} das consultas críticas que não usam índice"""
+    problemas = {}
+    for nome, (sql, parametros) in CONSULTAS_CRITICAS.items():
+        plano = [linha['detail'] for linha in conn.execute(f'EXPLAIN QUERY PLAN {sql}', parametros)]
+        varre_tabela = any(detalhe.startswith('SCAN etiquetas') for detalhe in plano)
+        ordena_em_memoria = any('TEMP B-TREE' in detalhe for detalhe in plano)
+        if varre_tabela or ordena_em_memoria:
+            problemas[nome] = plano
+    return problemas
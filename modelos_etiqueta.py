@@ -0,0 +1,268 @@
+import hashlib
+import json
+import os
+from string import Formatter
+
+from pdf_incremental import FONTES
+
+
+# ==================== CONFIGURAÇÕES ====================
+
+MODELOS_PASTA = os.environ.get('MODELOS_PASTA', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'modelos'))
+
+# Modelo usado nos PDFs (nome do arquivo em MODELOS_PASTA, sem .json)
+MODELO_ETIQUETA = os.environ.get('MODELO_ETIQUETA', 'padrao')
+
+# Campos da etiqueta disponíveis para os textos e condições dos modelos
+CAMPOS = ('nome', 'descricao', 'codigo', 'categoria', 'preco', 'tamanho', 'simbologia')
+
+TIPOS_CODIGO = ('qr', 'barras')
+
+ALINHAMENTOS = ('esquerda', 'centro', 'direita')
+
+
+# ==================== MODELOS DE ETIQUETA ====================
+# Um modelo é um JSON declarativo (veja modelos/padrao.json):
+#
+#   referencia      tamanho em que os números do modelo valem como pontos;
+#                   nos demais são escalados, como as fontes da etiqueta
+#   margem          margem interna (com margem_minima para etiquetas pequenas)
+#   moldura         espessura do contorno (0 para não desenhar)
+#   elementos       lista desenhada em ordem:
+#     texto   valor (formato do str.format com os CAMPOS), fonte, tamanho,
+#             tamanho_minimo, alinhar, quando (campo que precisa ter valor),
+#             largura ("total", "ate_codigo" ou um objeto por tipo de
+#             código: {"qr": "ate_codigo", "barras": "total"}) e a
+#             posição vertical:
+#             topo: k  empilha abaixo do texto anterior, a k × tamanho
+#             base: k  linha de base a k × tamanho acima da margem inferior
+#     qr      lado e alinhar (esquerda/direita), apoiado na margem inferior
+#     barras  x, largura e altura (ou ate: id do texto que fica acima)
+#   variantes       ajustes por tamanho: {"pequeno": {"<id>": {...}}}; a
+#                   variante vale para o tamanho de altura mais próxima
+#
+# Medidas são números (pontos na referência) ou "N%largura" / "N%altura".
+# Cada modelo é validado ao carregar e compilado uma vez por tamanho e tipo
+# de código num PlanoDesenho: só resta à renderização preencher os dados.
+
+class PlanoDesenho:
+    """Operações prontas, em coordenadas relativas ao canto inferior esquerdo.
+
+    ('moldura', largura, altura)
+    ('texto', fonte, tamanho, x, y, largura_maxima, formato, quando, alinhar)
+    ('qr', x, y, lado)
+    ('barras', x, y, largura, altura)
+    """
+    __slots__ = ('operacoes', 'campos')
+
+    def __init__(self, operacoes):
+        self.operacoes = tuple(operacoes)
+        self.campos = tuple(sorted({
+            campo for operacao in self.operacoes if operacao[0] == 'texto'
+            for campo in _campos_formato(operacao[6]) | ({operacao[7]} if operacao[7] else set())
+        }))
+
+    def valores(self, etiqueta):
+        """Dados da etiqueta usados pelos textos, com o preço já numérico"""
+        valores = {campo: etiqueta[campo] or '' for campo in self.campos}
+        if 'preco' in valores:
+            valores['preco'] = max(float(valores['preco'] or 0), 0.0)
+        return valores
+
+
+class Modelo:
+    def __init__(self, nome, definicao, tamanhos, versao):
+        self.nome = nome
+        self.versao = versao
+        self.tamanhos = tamanhos
+        self.descricao = definicao.get('descricao', '')
+        self.referencia = tamanhos[definicao.get('referencia', 'medio')]
+        self.margem = definicao.get('margem', 8)
+        self.margem_minima = definicao.get('margem_minima', 0)
+        self.moldura = definicao.get('moldura', 0.5)
+        self.elementos = definicao['elementos']
+        self.variantes = definicao.get('variantes', {})
+        self._planos = {}
+
+    def plano(self, largura, altura, tipo_codigo):
+        """Plano compilado para o tamanho e o tipo de código ('qr' ou 'barras')"""
+        chave = (largura, altura, tipo_codigo)
+        plano = self._planos.get(chave)
+        if plano is None:
+            plano = self._planos[chave] = self._compilar(largura, altura, tipo_codigo)
+        return plano
+
+    def compilar_todos(self):
+        """Compila todos os tamanhos e tipos de código (validação completa)"""
+        for largura, altura in self.tamanhos.values():
+            for tipo in TIPOS_CODIGO:
+                self.plano(largura, altura, tipo)
+
+    def _variante(self, altura):
+        tamanho = min(self.tamanhos, key=lambda nome: abs(self.tamanhos[nome][1] - altura))
+        return self.variantes.get(tamanho, {})
+
+    def _compilar(self, largura, altura, tipo_codigo):
+        escala = min(largura / self.referencia[0], altura / self.referencia[1])
+        variante = self._variante(altura)
+        # Elementos ocultos pela variante continuam ocupando o lugar na pilha
+        elementos = [dict(elemento, **variante.get(elemento.get('id'), {})) for elemento in self.elementos]
+
+        def medida(valor):
+            if isinstance(valor, str):
+                numero, _, base = valor.partition('%')
+                return float(numero) / 100 * (largura if base == 'largura' else altura)
+            return valor * escala
+
+        margem = max(medida(self.margem), self.margem_minima)
+
+        # Primeira passada: posição de cada texto, necessária para 'ate' e 'ate_codigo'
+        textos = {}
+        cursor = altura - margem
+        for elemento in elementos:
+            if elemento['tipo'] != 'texto':
+                continue
+            tamanho = max(medida(elemento['tamanho']), elemento.get('tamanho_minimo', 0))
+            if 'topo' in elemento:
+                cursor -= tamanho * elemento['topo']
+                y = cursor
+            else:
+                y = margem + tamanho * elemento.get('base', 0)
+            textos[id(elemento)] = (tamanho, y)
+
+        codigo = None
+        for elemento in elementos:
+            if elemento['tipo'] == 'qr' and tipo_codigo == 'qr':
+                lado = medida(elemento['lado'])
+                x = margem if elemento.get('alinhar', 'direita') == 'esquerda' else largura - lado - margem
+                codigo = ('qr', x, margem, lado)
+            elif elemento['tipo'] == 'barras' and tipo_codigo == 'barras':
+                x = medida(elemento['x']) if 'x' in elemento else margem
+                largura_barras = medida(elemento['largura']) if 'largura' in elemento else largura - x - margem
+                if 'ate' in elemento:
+                    acima = next(e for e in elementos if e.get('id') == elemento['ate'])
+                    tamanho, y = textos[id(acima)]
+                    altura_barras = y - tamanho - margem
+                else:
+                    altura_barras = medida(elemento['altura'])
+                codigo = ('barras', x, margem, largura_barras, altura_barras)
+
+        operacoes = [('moldura', largura, altura)] if self.moldura else []
+        for elemento in elementos:
+            if elemento.get('ocultar'):
+                continue
+            if elemento['tipo'] != 'texto':
+                if elemento['tipo'] == tipo_codigo:
+                    operacoes.append(codigo)
+                continue
+            tamanho, y = textos[id(elemento)]
+            alinhar = elemento.get('alinhar', 'esquerda')
+            x = {'esquerda': margem, 'centro': largura / 2, 'direita': largura - margem}[alinhar]
+            largura_maxima = largura - 2 * margem
+            limite = elemento.get('largura', 'total')
+            if isinstance(limite, dict):
+                limite = limite.get(tipo_codigo, 'total')
+            if limite == 'ate_codigo':
+                largura_maxima = min(largura_maxima, codigo[1] - margem - x)
+            operacoes.append(('texto', elemento['fonte'], tamanho, x, y, largura_maxima,
+                              elemento['valor'], elemento.get('quando'), alinhar))
+        return PlanoDesenho(operacoes)
+
+
+def _campos_formato(formato):
+    """Nomes completos dos campos do formato, inclusive os aninhados na especificação.
+
+    Sem cortar em '.' ou '[': {nome.__class__} não é o campo nome, e a
+    validação só aceita nomes simples de CAMPOS. {} vira o nome ''.
+    """
+    campos = set()
+    for _, campo, especificacao, _ in Formatter().parse(formato):
+        if campo is not None:
+            campos.add(campo)
+            if especificacao:
+                campos |= _campos_formato(especificacao)
+    return campos
+
+
+# ==================== CARREGAMENTO E VALIDAÇÃO ====================
+
+def validar(nome, definicao, tamanhos):
+    """ValueError com a primeira inconsistência encontrada no modelo"""
+    def erro(mensagem):
+        raise ValueError(f'Modelo {nome}: {mensagem}')
+
+    if not isinstance(definicao, dict) or not isinstance(definicao.get('elementos'), list):
+        erro('é preciso um objeto com a lista "elementos"')
+    if definicao.get('referencia', 'medio') not in tamanhos:
+        erro(f"referência desconhecida: {definicao['referencia']}")
+
+    ids = set()
+    tipos = set()
+    for posicao, elemento in enumerate(definicao['elementos'], 1):
+        tipo = elemento.get('tipo')
+        rotulo = f"elemento {elemento.get('id', posicao)}"
+        if tipo not in ('texto',) + TIPOS_CODIGO:
+            erro(f'{rotulo}: tipo inválido: {tipo}')
+        tipos.add(tipo)
+        if 'id' in elemento:
+            ids.add(elemento['id'])
+        if elemento.get('alinhar', 'esquerda') not in ALINHAMENTOS:
+            erro(f"{rotulo}: alinhamento inválido: {elemento['alinhar']}")
+        limites = elemento.get('largura', 'total')
+        if tipo == 'texto' and not all(limite in ('total', 'ate_codigo') for limite in (
+                limites.values() if isinstance(limites, dict) else [limites])):
+            erro(f'{rotulo}: largura inválida: {limites}')
+
+        if tipo == 'texto':
+            for chave in ('valor', 'fonte', 'tamanho'):
+                if chave not in elemento:
+                    erro(f'{rotulo}: falta "{chave}"')
+            if ('topo' in elemento) == ('base' in elemento):
+                erro(f'{rotulo}: informe "topo" ou "base"')
+            if elemento['fonte'] not in FONTES:
+                erro(f"{rotulo}: fonte indisponível: {elemento['fonte']} (use {', '.join(FONTES)})")
+            try:
+                desconhecidos = _campos_formato(elemento['valor']) - set(CAMPOS)
+            except ValueError as e:
+                erro(f'{rotulo}: valor inválido: {e}')
+            if desconhecidos or elemento.get('quando', 'nome') not in CAMPOS:
+                erro(f"{rotulo}: campos desconhecidos: "
+                     f"{', '.join(sorted(campo or '{}' for campo in desconhecidos) or [elemento['quando']])}")
+        elif tipo == 'qr' and 'lado' not in elemento:
+            erro(f'{rotulo}: falta "lado"')
+        elif tipo == 'barras' and 'ate' not in elemento and 'altura' not in elemento:
+            erro(f'{rotulo}: informe "altura" ou "ate"')
+
+    for tipo in TIPOS_CODIGO:
+        if tipo not in tipos:
+            erro(f'é preciso um elemento do tipo "{tipo}"')
+    for elemento in definicao['elementos']:
+        if elemento.get('ate') is not None and elemento['ate'] not in ids:
+            erro(f"elemento {elemento.get('id', elemento['tipo'])}: \"ate\" aponta para id inexistente: {elemento['ate']}")
+    for tamanho, ajustes in definicao.get('variantes', {}).items():
+        if tamanho not in tamanhos:
+            erro(f'variante de tamanho desconhecido: {tamanho}')
+        for id_elemento in ajustes:
+            if id_elemento not in ids:
+                erro(f'variante {tamanho}: id inexistente: {id_elemento}')
+
+
+def carregar(nome, tamanhos, pasta=MODELOS_PASTA):
+    """Lê, valida e compila o modelo `nome` para todos os tamanhos"""
+    caminho = os.path.join(pasta, f'{nome}.json')
+    with open(caminho, 'rb') as arquivo:
+        conteudo = arquivo.read()
+    try:
+        definicao = json.loads(conteudo)
+    except ValueError as e:
+        raise ValueError(f'Modelo {nome}: JSON inválido: {e}')
+    validar(nome, definicao, tamanhos)
+
+    modelo = Modelo(nome, definicao, tamanhos, hashlib.sha1(conteudo).hexdigest()[:12])
+    modelo.compilar_todos()
+    return modelo
+
+
+def disponiveis(pasta=MODELOS_PASTA):
+    """Nomes dos modelos na pasta"""
+    return sorted(arquivo[:-5] for arquivo in os.listdir(pasta) if arquivo.endswith('.json'))
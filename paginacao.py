@@ -0,0 +1,89 @@
+import base64
+import json
+import os
+
+
+# ==================== CONFIGURAÇÕES ====================
+
+PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 48))
+PAGE_SIZE_MAX = int(os.environ.get('PAGE_SIZE_MAX', 500))
+
+
+# ==================== CURSORES ====================
+
+ORDEM_PADRAO = ('data_criacao', 'id')
+
+
+def codificar_cursor(etiqueta, ordem=ORDEM_PADRAO):
+    """Gera o cursor opaco com os valores das colunas de ordenação"""
+    bruto = json.dumps([etiqueta[coluna] for coluna in ordem], separators=(',', ':'))
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, ordem=ORDEM_PADRAO):
+    """Converte o cursor de volta para a tupla de valores; None se inválido"""
+    if not cursor:
+        return None
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        valores = json.loads(bruto)
+    except ValueError:
+        return None
+    if not isinstance(valores, list) or len(valores) != len(ordem):
+        return None
+    return tuple(valores)
+
+
+def limite_pagina(valor):
+    """Normaliza o tamanho de página pedido pelo cliente"""
+    try:
+        limite = int(valor)
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+    return max(1, min(limite, PAGE_SIZE_MAX))
+
+
+# ==================== PAGINAÇÃO POR CHAVE ====================
+
+def paginar(conn, sql, parametros, cursor=None, direcao='proxima', limite=PAGE_SIZE,
+            ordem=ORDEM_PADRAO, decrescente=True):
+    """Pagina uma consulta por chave (keyset), por padrão do mais novo ao mais antigo.
+
+    `sql` deve ser um SELECT com WHERE e sem ORDER BY/LIMIT, e `ordem` as
+    colunas que identificam unicamente cada linha (a última deve ser o id).
+    Em vez de OFFSET, cada página parte da chave da última linha vista,
+    então o custo é o mesmo na primeira ou na milésima página.
+
+    Retorna {'etiquetas': [...], 'proximo': cursor|None, 'anterior': cursor|None}.
+    """
+    chave = decodificar_cursor(cursor, ordem)
+    voltando = chave is not None and direcao == 'anterior'
+
+    # Voltar uma página é percorrer a ordem ao contrário e inverter o resultado
+    invertida = decrescente != voltando
+    colunas = ', '.join(ordem)
+    sentido = 'DESC' if invertida else 'ASC'
+    ordenacao = ', '.join(f'{coluna} {sentido}' for coluna in ordem)
+
+    parametros = tuple(parametros)
+    if chave is not None:
+        operador = '<' if invertida else '>'
+        marcadores = ', '.join('?' * len(ordem))
+        sql += f' AND ({colunas}) {operador} ({marcadores})'
+        parametros += chave
+    sql += f' ORDER BY {ordenacao} LIMIT ?'
+    parametros += (limite + 1,)
+
+    linhas = conn.execute(sql, parametros).fetchall()
+    tem_mais = len(linhas) > limite
+    linhas = linhas[:limite]
+
+    if voltando:
+        linhas.reverse()
+        anterior = codificar_cursor(linhas[0], ordem) if tem_mais else None
+        proximo = codificar_cursor(linhas[-1], ordem) if linhas else None
+    else:
+        anterior = codificar_cursor(linhas[0], ordem) if chave is not None and linhas else None
+        proximo = codificar_cursor(linhas[-1], ordem) if tem_mais else None
+
+    return {'etiquetas': linhas, 'proximo': proximo, 'anterior': anterior}
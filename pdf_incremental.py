@@ -0,0 +1,241 @@
+import os
+import zlib
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+
+# ==================== PDF INCREMENTAL ====================
+# O reportlab guarda o conteúdo de todas as páginas até o save(), então a
+# memória cresce com o tamanho do catálogo. Este canvas implementa só a
+# parte da API usada pelo layout_pdf (retângulos, texto nas fontes padrão
+# e operadores literais) e serializa cada página assim que ela termina:
+# a memória fica limitada a uma página e os bytes podem ir direto para a
+# resposta HTTP.
+
+# Fontes padrão do PDF disponíveis aos modelos de etiqueta (modelos_etiqueta)
+FONTES = {
+    'Helvetica': 'F1',
+    'Helvetica-Bold': 'F2',
+    'Times-Roman': 'F3',
+    'Times-Bold': 'F4',
+    'Courier': 'F5',
+    'Courier-Bold': 'F6',
+}
+
+# Nível do zlib nos streams de página (0 a 9). O 9 rende ~4% a menos de
+# bytes por etiqueta ao custo de ~2× a CPU da compressão
+NIVEL_COMPRESSAO = int(os.environ.get('PDF_COMPRESSAO', 6))
+
+# ==================== SAÍDA PARA GRÁFICA ====================
+# Com impressao=True as cores saem em CMYK (preto só no K, sem o preto
+# composto que a conversão de RGB geraria na gráfica), cada página ganha
+# sangria em volta com TrimBox/BleedBox, e o catálogo declara a condição
+# de impressão (OutputIntent). É "estilo PDF/X": as fontes padrão não são
+# embutidas, então o arquivo não se declara conforme à norma.
+
+SANGRIA = float(os.environ.get('PDF_SANGRIA_MM', 3)) * mm
+
+# Condição de impressão registrada no ICC (sem perfil embutido)
+CONDICAO_IMPRESSAO = os.environ.get('PDF_CONDICAO_IMPRESSAO', 'FOGRA39')
+
+
+def _num(valor):
+    """Formata um número com no máximo 3 casas, sem zeros à direita"""
+    texto = f'{valor:.3f}'.rstrip('0').rstrip('.')
+    return texto if texto not in ('', '-0') else '0'
+
+
+def _texto_pdf(texto):
+    """Codifica em WinAnsi (Latin-1 + extras) e escapa a string literal"""
+    dados = texto.encode('cp1252', errors='replace')
+    return dados.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def _cmyk(vermelho, verde, azul):
+    """Conversão ingênua de RGB: cinzas (e o preto) vão inteiros para o K"""
+    preto = 1 - max(vermelho, verde, azul)
+    if preto >= 1:
+        return 0, 0, 0, 1
+    return tuple((1 - canal - preto) / (1 - preto) for canal in (vermelho, verde, azul)) + (preto,)
+
+
+def _cor(cor, operador_rgb, operador_cmyk, impressao=False):
+    if hasattr(cor, 'cyan'):
+        ciano, magenta, amarelo, preto = cor.cyan, cor.magenta, cor.yellow, cor.black
+    elif impressao:
+        ciano, magenta, amarelo, preto = _cmyk(cor.red, cor.green, cor.blue)
+    else:
+        return f'{_num(cor.red)} {_num(cor.green)} {_num(cor.blue)} {operador_rgb}'
+    return f'{_num(ciano)} {_num(magenta)} {_num(amarelo)} {_num(preto)} {operador_cmyk}'
+
+
+class OperacoesPDF:
+    """Grava os operadores de desenho de uma página (subconjunto do Canvas).
+
+    Sozinha serve para renderizar páginas fora do processo principal:
+    conteudo_pagina() devolve o stream comprimido pronto para o
+    CanvasIncremental.adicionar_pagina().
+    """
+
+    def __init__(self, pagesize=A4, nivel_compressao=NIVEL_COMPRESSAO, impressao=False):
+        self._tamanho = pagesize
+        self._nivel = nivel_compressao
+        self.impressao = impressao
+        self._operacoes = []
+        self._fonte = None
+
+    def setPageSize(self, tamanho):
+        self._tamanho = tamanho
+
+    def conteudo_pagina(self):
+        """Comprime e devolve o conteúdo da página atual, começando outra"""
+        conteudo = '\n'.join(self._operacoes).encode('latin-1')
+        self._operacoes = []
+        return zlib.compress(conteudo, self._nivel)
+
+    # ---------- desenho ----------
+
+    def saveState(self):
+        self._operacoes.append('q')
+
+    def restoreState(self):
+        self._operacoes.append('Q')
+
+    def translate(self, dx, dy):
+        self._operacoes.append(f'1 0 0 1 {_num(dx)} {_num(dy)} cm')
+
+    def scale(self, x, y):
+        self._operacoes.append(f'{_num(x)} 0 0 {_num(y)} 0 0 cm')
+
+    def setLineWidth(self, largura):
+        self._operacoes.append(f'{_num(largura)} w')
+
+    def setStrokeColor(self, cor):
+        self._operacoes.append(_cor(cor, 'RG', 'K', self.impressao))
+
+    def setFillColor(self, cor):
+        self._operacoes.append(_cor(cor, 'rg', 'k', self.impressao))
+
+    def rect(self, x, y, largura, altura, stroke=1, fill=0):
+        operador = {(1, 0): 'S', (0, 1): 'f', (1, 1): 'B'}.get((bool(stroke), bool(fill)), 'n')
+        self._operacoes.append(f'{_num(x)} {_num(y)} {_num(largura)} {_num(altura)} re {operador}')
+
+    def setFont(self, nome, tamanho):
+        self._fonte = (nome, tamanho)
+
+    def drawString(self, x, y, texto):
+        nome, tamanho = self._fonte
+        self._operacoes.append(
+            f'BT /{FONTES[nome]} {_num(tamanho)} Tf {_num(x)} {_num(y)} Td ('
+            + _texto_pdf(texto).decode('latin-1') + ') Tj ET'
+        )
+
+    def drawRightString(self, x, y, texto):
+        self.drawString(x - stringWidth(texto, *self._fonte), y, texto)
+
+    def drawCentredString(self, x, y, texto):
+        self.drawString(x - stringWidth(texto, *self._fonte) / 2, y, texto)
+
+    def addLiteral(self, operacoes):
+        self._operacoes.append(operacoes)
+
+
+class CanvasIncremental(OperacoesPDF):
+    """Canvas compatível com o layout_pdf que grava o PDF página a página.
+
+    Os bytes prontos se acumulam em um buffer que o chamador esvazia com
+    retirar() sempre que quiser (por exemplo a cada página).
+    """
+
+    def __init__(self, pagesize=A4, nivel_compressao=NIVEL_COMPRESSAO, impressao=False):
+        super().__init__(pagesize, nivel_compressao, impressao)
+        self._saida = []
+        self._posicao = 0
+        self._deslocamentos = {}
+        self._paginas = []
+
+        # Objetos fixos: 1 catálogo, 2 árvore de páginas, 3 recursos (um só
+        # dicionário referenciado por todas as páginas), 4.. fontes
+        self._proximo_objeto = 4 + len(FONTES)
+        self._emitir(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        fontes = ' '.join(f'/{apelido} {numero} 0 R' for numero, apelido in enumerate(FONTES.values(), start=4))
+        self._objeto(3, f'<< /Font << {fontes} >> /ProcSet [/PDF /Text /ImageB] >>'.encode())
+        for numero, nome in enumerate(FONTES, start=4):
+            self._objeto(numero, (
+                f'<< /Type /Font /Subtype /Type1 /BaseFont /{nome} '
+                f'/Encoding /WinAnsiEncoding >>'
+            ).encode())
+
+    # ---------- saída ----------
+
+    def _emitir(self, dados):
+        self._saida.append(dados)
+        self._posicao += len(dados)
+
+    def _objeto(self, numero, corpo):
+        self._deslocamentos[numero] = self._posicao
+        self._emitir(b'%d 0 obj\n' % numero + corpo + b'\nendobj\n')
+
+    def _novo_objeto(self):
+        numero = self._proximo_objeto
+        self._proximo_objeto += 1
+        return numero
+
+    def retirar(self):
+        """Retorna (e descarta) os bytes já finalizados"""
+        dados = b''.join(self._saida)
+        self._saida = []
+        return dados
+
+    # ---------- páginas ----------
+
+    def getPageNumber(self):
+        return len(self._paginas) + 1
+
+    def showPage(self):
+        self.adicionar_pagina(self.conteudo_pagina(), self._tamanho)
+
+    def adicionar_pagina(self, comprimido, tamanho):
+        """Grava uma página a partir do stream já comprimido"""
+        numero_conteudo = self._novo_objeto()
+        self._objeto(numero_conteudo, (
+            b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(comprimido)
+            + comprimido + b'\nendstream'
+        ))
+
+        largura, altura = tamanho
+        caixas = f'/MediaBox [0 0 {_num(largura)} {_num(altura)}]'
+        if self.impressao:
+            # A página acabada continua em (0, 0); a sangria fica em volta
+            sangria = f'[{_num(-SANGRIA)} {_num(-SANGRIA)} {_num(largura + SANGRIA)} {_num(altura + SANGRIA)}]'
+            caixas = (f'/MediaBox {sangria} /BleedBox {sangria} '
+                      f'/TrimBox [0 0 {_num(largura)} {_num(altura)}]')
+        numero_pagina = self._novo_objeto()
+        self._objeto(numero_pagina, (
+            f'<< /Type /Page /Parent 2 0 R {caixas} /Resources 3 0 R /Contents {numero_conteudo} 0 R >>'
+        ).encode())
+        self._paginas.append(numero_pagina)
+
+    def save(self):
+        if self._operacoes or not self._paginas:
+            self.showPage()
+
+        filhos = ' '.join(f'{numero} 0 R' for numero in self._paginas)
+        self._objeto(2, f'<< /Type /Pages /Kids [{filhos}] /Count {len(self._paginas)} >>'.encode())
+        intencao = b''
+        if self.impressao:
+            intencao = (
+                b' /OutputIntents [<< /Type /OutputIntent /S /GTS_PDFX /OutputConditionIdentifier ('
+                + _texto_pdf(CONDICAO_IMPRESSAO) + b') /RegistryName (http://www.color.org) >>]'
+            )
+        self._objeto(1, b'<< /Type /Catalog /Pages 2 0 R' + intencao + b' >>')
+
+        inicio_xref = self._posicao
+        total = self._proximo_objeto
+        linhas = [b'xref\n0 %d\n' % total, b'0000000000 65535 f \n']
+        for numero in range(1, total):
+            linhas.append(b'%010d 00000 n \n' % self._deslocamentos[numero])
+        self._emitir(b''.join(linhas))
+        self._emitir(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (total, inicio_xref))
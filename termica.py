@@ -0,0 +1,230 @@
+import os
+from functools import lru_cache
+
+import qrcode
+from qrcode.util import QRData, MODE_8BIT_BYTE
+
+from codigo_barras import LINEARES, ZONAS_SILENCIO, modulos_barras
+from layout_pdf import TAMANHOS, LOTE, geometria, ajustar_texto, dados_qr
+
+
+# ==================== IMPRESSORAS TÉRMICAS (ZPL / EPL) ====================
+# Em vez de um PDF que o servidor de impressão precisa rasterizar, gera os
+# comandos nativos da impressora: texto nas fontes internas e o QR pelo
+# comando de código de barras da própria impressora. As posições vêm da
+# mesma GeometriaEtiqueta do PDF (em pontos), convertidas para dots.
+
+# Resolução padrão das impressoras (203 dpi = 8 dots/mm; 300 dpi = 12 dots/mm)
+TERMICA_DPI = int(os.environ.get('TERMICA_DPI', 203))
+
+LINGUAGENS = ('zpl', 'epl')
+
+# Proporção entre o topo da célula de texto e a linha de base, como no PDF
+ASCENDENTE = 0.8
+
+
+class Medidas:
+    """Geometria de um tamanho de etiqueta em dots da impressora"""
+
+    def __init__(self, tamanho, dpi):
+        largura, altura = TAMANHOS.get(tamanho, TAMANHOS['medio'])
+        self.geo = geometria(largura, altura)
+        self.escala = dpi / 72.0
+
+        self.largura = self.dots(largura)
+        self.altura = self.dots(altura)
+        self.borda = max(1, self.dots(0.5))
+        self.x_texto = self.dots(self.geo.padding)
+        self.fonte_nome = self.dots(self.geo.fonte_nome)
+        self.fonte_texto = self.dots(self.geo.fonte_texto)
+        self.fonte_preco = self.dots(self.geo.fonte_preco)
+        self.qr_x = self.dots(self.geo.qr_x)
+        self.qr_topo = self.dots(self.geo.altura - self.geo.qr_y - self.geo.qr_tamanho)
+        self.qr_tamanho = self.dots(self.geo.qr_tamanho)
+        self.barras_x = self.dots(self.geo.barras_x)
+        self.barras_topo = self.dots(self.geo.altura - self.geo.barras_y - self.geo.barras_altura)
+        self.barras_largura = self.dots(self.geo.barras_largura)
+        # A legenda legível é escrita pela impressora abaixo das barras
+        self.barras_altura = int(self.dots(self.geo.barras_altura) * 0.8)
+
+    def dots(self, pontos):
+        return int(round(pontos * self.escala))
+
+    def topo(self, y_base, fonte):
+        """Converte a linha de base do PDF (de baixo) no topo do campo (de cima)"""
+        return self.altura - self.dots(y_base) - int(fonte * ASCENDENTE)
+
+    def qr(self, modulos):
+        """(x, y, ampliação) do QR: módulos inteiros centralizados na área do PDF"""
+        ampliacao = max(1, min(10, self.qr_tamanho // modulos))
+        folga = (self.qr_tamanho - ampliacao * modulos) // 2
+        return self.qr_x + folga, self.qr_topo + folga, ampliacao
+
+    def barras(self, etiqueta):
+        """(x, y, largura do módulo) do código linear, centralizado na faixa do PDF"""
+        modulos = len(modulos_barras(etiqueta['codigo'], etiqueta['simbologia']))
+        esquerda, direita = ZONAS_SILENCIO[etiqueta['simbologia']]
+        modulo = max(1, self.barras_largura // (esquerda + modulos + direita))
+        return self.barras_x + (self.barras_largura - modulo * modulos) // 2, self.barras_topo, modulo
+
+
+@lru_cache(maxsize=None)
+def medidas(tamanho, dpi):
+    return Medidas(tamanho, dpi)
+
+
+@lru_cache(maxsize=None)
+def _modulos_por_tamanho(bytes_dados):
+    qr = qrcode.QRCode(border=0)
+    qr.add_data(QRData(b'0' * bytes_dados, mode=MODE_8BIT_BYTE))
+    return qr.best_fit() * 4 + 17
+
+
+def modulos_qr(dados):
+    """Módulos por lado do QR que a impressora vai gerar para os dados.
+
+    A matriz fica a cargo da impressora; aqui só interessa a versão, que
+    no modo byte depende apenas do tamanho dos dados em UTF-8.
+    """
+    return _modulos_por_tamanho(len(dados.encode('utf-8')))
+
+
+def _linhas_texto(etiqueta, m, reticencias):
+    """(topo, fonte, texto, largura máxima em pontos) das linhas, cortadas como no PDF"""
+    geo = m.geo
+    largura_texto = geo.largura_nome if etiqueta['simbologia'] in LINEARES else geo.largura_texto
+    linhas = [
+        (m.topo(geo.y_nome, m.fonte_nome), m.fonte_nome,
+         ajustar_texto(etiqueta['nome'], 'Helvetica-Bold', geo.fonte_nome, geo.largura_nome, reticencias),
+         geo.largura_nome),
+        (m.topo(geo.y_codigo, m.fonte_texto), m.fonte_texto,
+         ajustar_texto(f"Código: {etiqueta['codigo']}", 'Helvetica', geo.fonte_texto, largura_texto,
+                       reticencias),
+         largura_texto),
+    ]
+    if etiqueta['categoria']:
+        linhas.append((m.topo(geo.y_categoria, m.fonte_texto), m.fonte_texto,
+                       ajustar_texto(f"Categoria: {etiqueta['categoria']}", 'Helvetica', geo.fonte_texto,
+                                     largura_texto, reticencias),
+                       largura_texto))
+    if etiqueta['preco'] and float(etiqueta['preco']) > 0:
+        linhas.append((m.topo(geo.y_preco, m.fonte_preco), m.fonte_preco,
+                       f"R$ {float(etiqueta['preco']):.2f}", largura_texto))
+    return linhas
+
+
+# ==================== ZPL ====================
+
+def _campo_zpl(texto):
+    """Escapa o texto para ^FH (hexadecimal com _): ^, ~, _ e quebras de linha"""
+    return texto.replace('_', '_5F').replace('^', '_5E').replace('~', '_7E').replace('\n', '_0A')
+
+
+def etiqueta_zpl(etiqueta, dpi=TERMICA_DPI):
+    """Comandos ZPL II de uma etiqueta (^XA ... ^XZ), em UTF-8 (^CI28)"""
+    m = medidas(etiqueta['tamanho'], dpi)
+    comandos = [
+        '^XA^CI28',
+        f'^PW{m.largura}^LL{m.altura}^LH0,0',
+        f'^FO0,0^GB{m.largura},{m.altura},{m.borda}^FS',
+    ]
+    for topo, fonte, texto, _ in _linhas_texto(etiqueta, m, '...'):
+        comandos.append(f'^FO{m.x_texto},{topo}^A0N,{fonte},{fonte}^FH^FD{_campo_zpl(texto)}^FS')
+
+    if etiqueta['simbologia'] == 'ean13':
+        x, y, modulo = m.barras(etiqueta)
+        # A impressora calcula o dígito verificador a partir dos 12 primeiros
+        comandos.append(f"^FO{x},{y}^BY{modulo}^BEN,{m.barras_altura},Y,N^FD{etiqueta['codigo'][:12]}^FS")
+    elif etiqueta['simbologia'] == 'code128':
+        x, y, modulo = m.barras(etiqueta)
+        # Modo A: a impressora escolhe os subconjuntos B/C, como o reportlab
+        comandos.append(f"^FO{x},{y}^BY{modulo}^BCN,{m.barras_altura},Y,N,N,A"
+                        f"^FH^FD{_campo_zpl(etiqueta['codigo'])}^FS")
+    else:
+        dados = dados_qr(etiqueta)
+        x, y, ampliacao = m.qr(modulos_qr(dados))
+        # MA: correção de erro M (a mesma do qrcode) e modo de entrada automático
+        comandos.append(f'^FO{x},{y}^BQN,2,{ampliacao}^FH^FDMA,{_campo_zpl(dados)}^FS')
+    comandos.append('^XZ')
+    return '\n'.join(comandos) + '\n'
+
+
+# ==================== EPL ====================
+# O EPL2 só tem fontes de tamanho fixo, ampliadas por multiplicadores
+# inteiros, e não aceita quebra de linha dentro de um campo: no QR as
+# linhas do conteúdo são unidas por " | ".
+
+# (largura, altura) em dots das fontes 1 a 5
+FONTES_EPL = {
+    203: {1: (8, 12), 2: (10, 16), 3: (12, 20), 4: (14, 24), 5: (32, 48)},
+    300: {1: (12, 20), 2: (16, 28), 3: (20, 36), 4: (24, 44), 5: (48, 80)},
+}
+
+
+def _fonte_epl(altura, dpi):
+    """(fonte, multiplicador, largura do caractere) com a maior altura que cabe"""
+    fontes = FONTES_EPL.get(dpi) or {
+        numero: (round(l * dpi / 203), round(a * dpi / 203)) for numero, (l, a) in FONTES_EPL[203].items()
+    }
+    melhor = (1, 1, fontes[1][0], fontes[1][1])
+    for numero, (largura, altura_fonte) in fontes.items():
+        for multiplicador in range(1, 7):
+            if altura_fonte * multiplicador <= altura and altura_fonte * multiplicador > melhor[3]:
+                melhor = (numero, multiplicador, largura * multiplicador, altura_fonte * multiplicador)
+    return melhor[:3]
+
+
+def _campo_epl(texto):
+    texto = texto.replace('\\', '\\\\').replace('"', '\\"')
+    return texto.encode('cp850', errors='replace').decode('cp850')
+
+
+def etiqueta_epl(etiqueta, dpi=TERMICA_DPI):
+    """Comandos EPL2 de uma etiqueta (N ... P1), em cp850"""
+    m = medidas(etiqueta['tamanho'], dpi)
+    comandos = [
+        'I8,1,001',  # página de código 850
+        'N',
+        f'q{m.largura}',
+        f'Q{m.altura},24',
+        f'X0,0,{m.borda},{m.largura},{m.altura}',
+    ]
+    for topo, fonte, texto, limite in _linhas_texto(etiqueta, m, '...'):
+        numero, multiplicador, largura_caractere = _fonte_epl(fonte, dpi)
+        caracteres = max(1, m.dots(limite) // largura_caractere)
+        if len(texto) > caracteres:
+            texto = texto[:max(caracteres - 3, 0)] + '...'
+        comandos.append(f'A{m.x_texto},{topo},0,{numero},{multiplicador},{multiplicador},N,"{_campo_epl(texto)}"')
+
+    if etiqueta['simbologia'] in LINEARES:
+        x, y, modulo = m.barras(etiqueta)
+        # E30: EAN-13 (verificador calculado pela impressora); 1: Code 128 automático
+        tipo, dados = ('E30', etiqueta['codigo'][:12]) if etiqueta['simbologia'] == 'ean13' else ('1', etiqueta['codigo'])
+        comandos.append(f'B{x},{y},0,{tipo},{modulo},{modulo},{m.barras_altura},B,"{_campo_epl(dados)}"')
+    else:
+        dados = dados_qr(etiqueta).replace('\n', ' | ')
+        x, y, ampliacao = m.qr(modulos_qr(dados))
+        comandos.append(f'b{x},{y},Q,m2,s{ampliacao},eM,iA,"{_campo_epl(dados)}"')
+    comandos.append('P1')
+    return '\n'.join(comandos) + '\n'
+
+
+# ==================== LOTES ====================
+
+GERADORES = {
+    'zpl': (etiqueta_zpl, 'utf-8'),
+    'epl': (etiqueta_epl, 'cp850'),
+}
+
+
+def gerar_termica(etiquetas, linguagem='zpl', dpi=TERMICA_DPI, lote=LOTE):
+    """Gera o arquivo de impressão em pedaços de `lote` etiquetas"""
+    funcao, codificacao = GERADORES[linguagem]
+    pedaco = []
+    for etiqueta in etiquetas:
+        pedaco.append(funcao(etiqueta, dpi))
+        if len(pedaco) >= lote:
+            yield ''.join(pedaco).encode(codificacao, errors='replace')
+            pedaco = []
+    if pedaco:
+        yield ''.join(pedaco).encode(codificacao, errors='replace')
@@ -0,0 +1,67 @@
+"""Ambiente dos testes: banco e pastas temporários, importados antes do app."""
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASTA = tempfile.mkdtemp(prefix='testes_etiquetas_')
+
+os.environ['DATABASE'] = os.path.join(PASTA, 'etiquetas.db')
+os.environ['EXPORT_PASTA'] = os.path.join(PASTA, 'exportacoes')
+os.environ['PERFIL_PASTA'] = os.path.join(PASTA, 'perfis')
+os.environ['CACHE_DISCO_PASTA'] = ''
+
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+
+@pytest.fixture(scope='session')
+def modulo_app():
+    import app as modulo_app
+    modulo_app.app.config['TESTING'] = True
+    return modulo_app
+
+
+@pytest.fixture
+def usuario(modulo_app):
+    """Registra e loga um usuário novo; devolve (cliente, user_id)"""
+    nome = f'teste_{uuid.uuid4().hex[:8]}'
+    cliente = modulo_app.app.test_client()
+    cliente.post('/registro', data={
+        'username': nome, 'email': f'{nome}@exemplo.com',
+        'password': 'senha123', 'password_confirm': 'senha123',
+    })
+    cliente.post('/login', data={'username': nome, 'password': 'senha123'})
+    with modulo_app.app.app_context():
+        user_id = modulo_app.get_db_connection().execute(
+            'SELECT id FROM usuarios WHERE username = ?', (nome,)
+        ).fetchone()['id']
+    return cliente, user_id
+
+
+def inserir_etiquetas(modulo_app, user_id, quantidade):
+    """Etiquetas sintéticas do usuário; devolve os ids"""
+    with modulo_app.app.app_context():
+        conn = modulo_app.get_db_connection()
+        conn.executemany(
+            '''INSERT INTO etiquetas (nome, descricao, codigo, categoria, preco, tamanho, user_id)
+               VALUES (?, ?, ?, ?, ?, ?, ?)''',
+            [(f'Produto {i}', '', f'T{user_id}-{i:06d}', 'Mercearia', 1.5 + i, 'medio', user_id)
+             for i in range(quantidade)]
+        )
+        conn.commit()
+        return [linha[0] for linha in conn.execute(
+            'SELECT id FROM etiquetas WHERE user_id = ? ORDER BY id', (user_id,))]
+
+
+@pytest.fixture
+def banco_vazio(tmp_path):
+    """Conexão a um banco novo, sem migrações, com os pragmas do app; devolve (conn, caminho)"""
+    import banco
+    caminho = str(tmp_path / 'migracao.db')
+    conn = banco.PoolConexoes(caminho, tamanho=0).conectar()
+    yield conn, caminho
+    conn.close()
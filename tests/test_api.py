@@ -0,0 +1,109 @@
+import uuid
+
+import pytest
+
+from conftest import inserir_etiquetas
+
+from api import criar_token, revogar_token
+
+
+@pytest.fixture
+def cliente_api(modulo_app, usuario):
+    """Cliente sem sessão com um token do usuário; devolve (cliente, cabecalhos, user_id)"""
+    _, user_id = usuario
+    with modulo_app.app.app_context():
+        token = criar_token(modulo_app.get_db_connection(), user_id, 'testes')
+    return modulo_app.app.test_client(), {'Authorization': f'Bearer {token}'}, user_id
+
+
+def contar(modulo_app, user_id):
+    with modulo_app.app.app_context():
+        return modulo_app.get_db_connection().execute(
+            'SELECT COUNT(*) FROM etiquetas WHERE ativo = 1 AND user_id = ?', (user_id,)
+        ).fetchone()[0]
+
+
+def item(codigo, nome='Produto'):
+    return {'nome': nome, 'codigo': codigo, 'preco': 9.9}
+
+
+def test_lote_cria_todas_e_devolve_ids_na_ordem(modulo_app, cliente_api):
+    cliente, cabecalhos, user_id = cliente_api
+    codigos = [f'API-{uuid.uuid4().hex[:10]}' for _ in range(3)]
+
+    resposta = cliente.post('/api/v1/etiquetas', json={'etiquetas': [item(c) for c in codigos]},
+                            headers=cabecalhos)
+
+    assert resposta.status_code == 201
+    ids = resposta.get_json()['ids']
+    obtidos = [cliente.get(f'/api/v1/etiquetas/{id}', headers=cabecalhos).get_json()['codigo'] for id in ids]
+    assert obtidos == codigos
+
+
+def test_lote_com_codigo_existente_nao_grava_nada(modulo_app, cliente_api):
+    cliente, cabecalhos, user_id = cliente_api
+    existente = f'T{user_id}-000000'
+    inserir_etiquetas(modulo_app, user_id, 1)
+
+    resposta = cliente.post('/api/v1/etiquetas', headers=cabecalhos, json={'etiquetas': [
+        item(f'API-{uuid.uuid4().hex[:10]}'), item(existente), item(f'API-{uuid.uuid4().hex[:10]}'),
+    ]})
+
+    assert resposta.status_code == 409
+    assert resposta.get_json()['detalhes'] == [{'indice': 1, 'erro': 'Código já existe!'}]
+    assert contar(modulo_app, user_id) == 1
+
+
+def test_lote_invalido_aponta_os_indices(modulo_app, cliente_api):
+    cliente, cabecalhos, user_id = cliente_api
+    codigo = f'API-{uuid.uuid4().hex[:10]}'
+
+    resposta = cliente.post('/api/v1/etiquetas', headers=cabecalhos, json={'etiquetas': [
+        item(codigo), {'codigo': f'API-{uuid.uuid4().hex[:10]}'}, item(codigo),
+    ]})
+
+    assert resposta.status_code == 422
+    assert [detalhe['indice'] for detalhe in resposta.get_json()['detalhes']] == [1]
+    assert contar(modulo_app, user_id) == 0
+
+
+def test_patch_em_etiqueta_de_outro_usuario(modulo_app, cliente_api):
+    cliente, cabecalhos, user_id = cliente_api
+    propria, = inserir_etiquetas(modulo_app, user_id, 1)
+
+    with modulo_app.app.app_context():
+        conn = modulo_app.get_db_connection()
+        conn.execute("INSERT INTO usuarios (username, email, password) VALUES (?, ?, 'x')",
+                     (f'outro_{user_id}', f'outro_{user_id}@exemplo.com'))
+        outro_id = conn.execute('SELECT id FROM usuarios WHERE username = ?', (f'outro_{user_id}',)).fetchone()[0]
+        conn.commit()
+    alheia, = inserir_etiquetas(modulo_app, outro_id, 1)
+
+    resposta = cliente.patch('/api/v1/etiquetas', headers=cabecalhos, json={'etiquetas': [
+        {'id': propria, 'nome': 'Alterada'}, {'id': alheia, 'nome': 'Invadida'},
+    ]})
+
+    assert resposta.status_code == 422
+    assert resposta.get_json()['detalhes'] == [{'indice': 1, 'erro': 'Etiqueta não encontrada'}]
+    with modulo_app.app.app_context():
+        nomes = dict(modulo_app.get_db_connection().execute(
+            'SELECT id, nome FROM etiquetas WHERE id IN (?, ?)', (propria, alheia)).fetchall())
+    assert nomes == {propria: 'Produto 0', alheia: 'Produto 0'}
+
+    resposta = cliente.delete('/api/v1/etiquetas', headers=cabecalhos, json={'ids': [alheia]})
+    assert resposta.get_json() == {'removidas': 0, 'nao_encontradas': [alheia]}
+    assert contar(modulo_app, outro_id) == 1
+
+
+def test_token_revogado(modulo_app, cliente_api):
+    cliente, cabecalhos, user_id = cliente_api
+    assert cliente.get('/api/v1/etiquetas', headers=cabecalhos).status_code == 200
+
+    with modulo_app.app.app_context():
+        conn = modulo_app.get_db_connection()
+        token_id = conn.execute('SELECT MAX(id) FROM api_tokens WHERE user_id = ?', (user_id,)).fetchone()[0]
+        assert revogar_token(conn, token_id) == 1
+
+    resposta = cliente.get('/api/v1/etiquetas', headers=cabecalhos)
+    assert resposta.status_code == 401
+    assert resposta.get_json() == {'erro': 'Token inválido ou revogado'}
@@ -0,0 +1,32 @@
+import logging
+
+import pytest
+
+import arquivo
+
+
+class FimDoLaco(BaseException):
+    pass
+
+
+def test_erro_na_manutencao_vai_para_o_log_com_traceback(caplog, monkeypatch):
+    esperas = []
+
+    def dormir(segundos):
+        if esperas:
+            raise FimDoLaco
+        esperas.append(segundos)
+
+    def reivindicar(conn, intervalo_horas):
+        raise RuntimeError('disco cheio')
+
+    monkeypatch.setattr(arquivo.time, 'sleep', dormir)
+    monkeypatch.setattr(arquivo, '_reivindicar', reivindicar)
+
+    with caplog.at_level(logging.ERROR, logger='etiquetas.arquivo'), pytest.raises(FimDoLaco):
+        arquivo._laco(24)
+
+    registro, = caplog.records
+    assert registro.getMessage() == 'Erro na manutenção do banco'
+    assert 'disco cheio' in caplog.text
+    assert registro.exc_info[0] is RuntimeError
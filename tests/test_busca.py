@@ -0,0 +1,35 @@
+from conftest import inserir_etiquetas
+
+from busca import consulta_filtrada, ORDEM_RELEVANCIA
+from paginacao import paginar
+
+
+def test_paginacao_por_relevancia_desempata_pelo_id(modulo_app, usuario):
+    _, user_id = usuario
+    ids = inserir_etiquetas(modulo_app, user_id, 30)
+
+    with modulo_app.app.app_context():
+        conn = modulo_app.get_db_connection()
+        sql, parametros, ordem = consulta_filtrada(user_id, 'produto')
+        assert ordem == ORDEM_RELEVANCIA
+        # Textos equivalentes: todas empatam na relevância
+        assert len({linha['relevancia'] for linha in conn.execute(sql, parametros)}) == 1
+
+        paginas, cursor = [], None
+        while True:
+            pagina = paginar(conn, sql, parametros, cursor=cursor, limite=7, ordem=ordem, decrescente=False)
+            paginas.append([linha['id'] for linha in pagina['etiquetas']])
+            cursor = pagina['proximo']
+            if not cursor:
+                break
+        assert sum(paginas, []) == ids
+
+        # E voltando a partir da última página
+        voltando = [paginas[-1]]
+        cursor = pagina['anterior']
+        while cursor:
+            pagina = paginar(conn, sql, parametros, cursor=cursor, direcao='anterior', limite=7,
+                             ordem=ordem, decrescente=False)
+            voltando.insert(0, [linha['id'] for linha in pagina['etiquetas']])
+            cursor = pagina['anterior']
+        assert voltando == paginas
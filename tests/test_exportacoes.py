@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+from conftest import inserir_etiquetas
+
+import exportacoes
+
+
+@pytest.fixture
+def pool_proprio(monkeypatch):
+    """Pool de exportação novo, com uma thread, para este teste"""
+    monkeypatch.setattr(exportacoes, 'EXPORT_WORKERS', 1)
+    monkeypatch.setattr(exportacoes, '_executor', None)
+    yield
+    exportacoes._encerrando.clear()
+
+
+def status(modulo_app, job_id):
+    with modulo_app.app.app_context():
+        return modulo_app.get_db_connection().execute(
+            'SELECT status, erro FROM exportacoes WHERE id = ?', (job_id,)
+        ).fetchone()
+
+
+def test_saida_do_worker_marca_jobs_em_andamento_como_erro(modulo_app, usuario, pool_proprio, monkeypatch):
+    _, user_id = usuario
+    inserir_etiquetas(modulo_app, user_id, 3)
+    rodando = threading.Event()
+
+    def renderizar_sem_fim(pdf, lotes, formato):
+        rodando.set()
+        feitos = 0
+        while True:
+            time.sleep(0.01)
+            feitos += 1
+            yield feitos, 1
+
+    monkeypatch.setattr(exportacoes, 'renderizar_paginas_paralelo', renderizar_sem_fim)
+
+    with modulo_app.app.app_context():
+        conn = modulo_app.get_db_connection()
+        em_renderizacao = exportacoes.criar_exportacao(conn, user_id)
+        na_fila = exportacoes.criar_exportacao(conn, user_id)
+    assert rodando.wait(10)
+    assert status(modulo_app, em_renderizacao)['status'] == 'processando'
+    assert status(modulo_app, na_fila)['status'] == 'pendente'
+
+    assert exportacoes.encerrar_exportacoes() == 2
+
+    for job_id in (em_renderizacao, na_fila):
+        job = status(modulo_app, job_id)
+        assert job['status'] == 'erro'
+        assert job['erro'] == exportacoes.MENSAGEM_INTERRUPCAO
+    assert not exportacoes._jobs
+
+
+def test_saida_do_worker_sem_exportacoes(pool_proprio):
+    assert exportacoes.encerrar_exportacoes() == 0
+
+
+@pytest.mark.parametrize('impressao', [False, True])
+def test_exportacao_em_segundo_plano_respeita_saida_para_grafica(modulo_app, usuario, impressao):
+    cliente, user_id = usuario
+    inserir_etiquetas(modulo_app, user_id, 3)
+
+    dados = {'impressao': '1'} if impressao else {}
+    job_id = cliente.post('/exportacoes?formato=json', data=dados).get_json()['id']
+
+    for _ in range(200):
+        with modulo_app.app.app_context():
+            job = modulo_app.get_db_connection().execute(
+                'SELECT status, arquivo FROM exportacoes WHERE id = ?', (job_id,)
+            ).fetchone()
+        if job['status'] not in ('pendente', 'processando'):
+            break
+        time.sleep(0.05)
+    assert job['status'] == 'concluida'
+
+    with open(job['arquivo'], 'rb') as arquivo:
+        assert (b'/TrimBox' in arquivo.read()) == impressao
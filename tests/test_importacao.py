@@ -0,0 +1,70 @@
+import io
+import sqlite3
+
+import openpyxl
+
+from conftest import inserir_etiquetas
+
+
+def planilha(*linhas):
+    livro = openpyxl.Workbook()
+    for linha in linhas:
+        livro.active.append(linha)
+    arquivo = io.BytesIO()
+    livro.save(arquivo)
+    arquivo.seek(0)
+    return arquivo
+
+
+def test_importa_xlsx(modulo_app, usuario):
+    cliente, user_id = usuario
+    arquivo = planilha(
+        ('Produto', 'SKU', 'Categoria', 'Preço', 'Tamanho', 'Simbologia'),
+        ('Pão de Açúcar', f'X{user_id}-1', 'Padaria', 4.5, 'pequeno', 'qr'),
+        ('Feijão carioca', f'X{user_id}-2', 'Mercearia', '8,90', None, None),
+        ('Café', f'789{user_id:09d}', 'Mercearia', 12, 'grande', 'ean13'),
+        ('Sem código', None, None, None, None, None),
+    )
+
+    resposta = cliente.post('/importar?formato=json', data={'arquivo': (arquivo, 'produtos.xlsx')},
+                            content_type='multipart/form-data')
+
+    assert resposta.status_code == 200
+    resumo = resposta.get_json()
+    assert (resumo['linhas'], resumo['inseridas'], resumo['total_erros']) == (4, 3, 1)
+    assert resumo['erros'][0]['linha'] == 5
+    with modulo_app.app.app_context():
+        linhas = modulo_app.get_db_connection().execute(
+            'SELECT nome, preco, tamanho, simbologia FROM etiquetas WHERE user_id = ? ORDER BY id', (user_id,)
+        ).fetchall()
+    assert [tuple(linha) for linha in linhas] == [
+        ('Pão de Açúcar', 4.5, 'pequeno', 'qr'),
+        ('Feijão carioca', 8.9, 'medio', 'qr'),
+        ('Café', 12.0, 'grande', 'ean13'),
+    ]
+
+
+def test_xlsx_com_codigo_existente(modulo_app, usuario):
+    cliente, user_id = usuario
+    inserir_etiquetas(modulo_app, user_id, 1)
+    arquivo = planilha(('nome', 'codigo'), ('Repetido', f'T{user_id}-000000'))
+
+    resumo = cliente.post('/importar?formato=json', data={'arquivo': (arquivo, 'produtos.xlsx')},
+                          content_type='multipart/form-data').get_json()
+
+    assert (resumo['inseridas'], resumo['erros'][0]['erro']) == (0, 'Código já existe!')
+
+
+
+def test_lote_maior_que_o_limite_de_variaveis_do_sqlite(modulo_app, usuario):
+    # Com um IN (?, ?, ...) por código o lote estouraria o limite de variáveis
+    _, user_id = usuario
+    linhas = ((numero, {'nome': f'Item {numero}', 'codigo': f'L{user_id}-{numero}'}) for numero in range(2, 2002))
+    with modulo_app.app.app_context():
+        conn = modulo_app.get_db_connection()
+        anterior = conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+        try:
+            resumo = modulo_app.importacao.importar(conn, linhas, user_id, lote=2000)
+        finally:
+            conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, anterior)
+    assert (resumo['inseridas'], resumo['total_erros']) == (2000, 0)
@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+
+import metricas
+
+
+def status_get(cliente, caminho):
+    """Status da resposta já consumida e fechada (o fechamento conclui a medição, como no gunicorn)"""
+    resposta = cliente.get(caminho)
+    resposta.get_data()
+    resposta.close()
+    return resposta.status_code
+
+
+@pytest.fixture
+def perfil_ligado(monkeypatch):
+    monkeypatch.setattr(metricas, 'PERFIL_LENTO_MS', 60_000)
+    yield
+    assert not metricas._perfil_lock.locked()
+
+
+def test_requisicoes_simultaneas_com_perfil(modulo_app, perfil_ligado):
+    # Com gthread várias requisições são perfiladas ao mesmo tempo; só uma
+    # pega o perfil e nenhuma pode falhar (no 3.12 o segundo cProfile levanta)
+    status = []
+    barreira = threading.Barrier(8)
+
+    def requisitar():
+        cliente = modulo_app.app.test_client()
+        barreira.wait()
+        for _ in range(10):
+            status.append(status_get(cliente, '/login'))
+
+    threads = [threading.Thread(target=requisitar) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert status == [200] * 80
+
+
+def test_perfil_ocupado_nao_perfila(modulo_app, perfil_ligado):
+    with metricas._perfil_lock:
+        assert metricas._Perfil.iniciar() is None
+        assert status_get(modulo_app.app.test_client(), '/login') == 200
+
+
+def test_outro_profiler_ativo_nao_derruba_requisicao(modulo_app, perfil_ligado, monkeypatch):
+    class ProfilerOcupado:
+        def enable(self):
+            raise ValueError('Another profiling tool is already active')
+
+    monkeypatch.setattr(metricas.cProfile, 'Profile', ProfilerOcupado)
+    assert status_get(modulo_app.app.test_client(), '/login') == 200
+
+
+def test_requisicao_lenta_vai_para_o_log(modulo_app, monkeypatch, caplog):
+    monkeypatch.setattr(metricas, 'PERFIL_LENTO_MS', 0.001)
+    with caplog.at_level('WARNING', logger='etiquetas.metricas'):
+        assert status_get(modulo_app.app.test_client(), '/login') == 200
+    assert [registro.levelname for registro in caplog.records] == ['WARNING']
+    assert 'Requisição lenta: GET /login' in caplog.records[0].getMessage()
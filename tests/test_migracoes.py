@@ -0,0 +1,20 @@
+import pytest
+
+from migracoes import MIGRACOES, CONSULTAS_CRITICAS, migrar_com_trava, verificar_planos
+
+
+def test_migrar_com_trava_duas_vezes_registra_cada_versao_uma_vez(banco_vazio):
+    conn, caminho = banco_vazio
+    assert migrar_com_trava(conn, caminho) == [numero for numero, _, _ in MIGRACOES]
+    assert migrar_com_trava(conn, caminho) == []
+
+    versoes = [linha[0] for linha in conn.execute('SELECT versao FROM schema_version ORDER BY versao')]
+    assert versoes == [numero for numero, _, _ in MIGRACOES]
+
+
+@pytest.mark.parametrize('consulta', CONSULTAS_CRITICAS)
+def test_consultas_criticas_usam_indice(banco_vazio, consulta, monkeypatch):
+    conn, caminho = banco_vazio
+    migrar_com_trava(conn, caminho)
+    monkeypatch.setattr('migracoes.CONSULTAS_CRITICAS', {consulta: CONSULTAS_CRITICAS[consulta]})
+    assert verificar_planos(conn) == {}
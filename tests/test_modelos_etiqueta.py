@@ -0,0 +1,30 @@
+import copy
+import json
+import os
+
+import pytest
+
+from layout_pdf import TAMANHOS
+from modelos_etiqueta import MODELOS_PASTA, validar
+
+with open(os.path.join(MODELOS_PASTA, 'padrao.json'), encoding='utf-8') as arquivo:
+    PADRAO = json.load(arquivo)
+
+
+def com_valor(valor):
+    definicao = copy.deepcopy(PADRAO)
+    next(elemento for elemento in definicao['elementos'] if elemento['tipo'] == 'texto')['valor'] = valor
+    return definicao
+
+
+@pytest.mark.parametrize('valor', ['{nome}', 'R$ {preco:.2f}', '{codigo} - {categoria!s:>10}'])
+def test_aceita_campos_simples(valor):
+    validar('teste', com_valor(valor), TAMANHOS)
+
+
+@pytest.mark.parametrize('valor', [
+    '{nome.__class__.__mro__}', '{nome[0]}', '{preco:{nome.__class__}}', '{}', '{0}', '{senha}',
+])
+def test_rejeita_atributos_indices_e_campos_fora_de_CAMPOS(valor):
+    with pytest.raises(ValueError, match='campos desconhecidos'):
+        validar('teste', com_valor(valor), TAMANHOS)
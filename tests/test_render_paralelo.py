@@ -0,0 +1,55 @@
+import os
+import signal
+import time
+
+import pytest
+
+import layout_pdf
+from layout_pdf import gerar_pdf_incremental
+
+renderizar_shard_original = layout_pdf.renderizar_shard
+
+
+def etiquetas(quantidade=60):
+    return [{'nome': f'Produto {i}', 'descricao': '', 'codigo': f'SKU-{i:05d}', 'categoria': 'Mercearia',
+             'preco': 2.5 + i, 'tamanho': 'medio', 'simbologia': 'qr'} for i in range(quantidade)]
+
+
+def pdf(workers):
+    return b''.join(gerar_pdf_incremental(etiquetas(), 'termica', workers=workers))
+
+
+def morrer_no_filho(paginas, impressao=False):
+    # Importado pelos processos do pool: só eles morrem
+    if os.getpid() != int(os.environ['PID_TESTE']):
+        os._exit(1)
+    return renderizar_shard_original(paginas, impressao)
+
+
+@pytest.fixture
+def sem_pool():
+    yield
+    if layout_pdf._pool_render is not None:
+        layout_pdf._descartar_pool_render(layout_pdf._pool_render)
+
+
+def test_pool_com_processo_morto_e_recriado(sem_pool):
+    esperado = pdf(workers=1)
+    quebrado = layout_pdf._obter_pool_render(2)
+    for futuro in [quebrado.submit(os.getpid) for _ in range(2)]:
+        futuro.result()
+    for processo in list(quebrado._processes.values()):
+        os.kill(processo.pid, signal.SIGKILL)
+    time.sleep(0.2)
+
+    assert pdf(workers=2) == esperado
+    assert layout_pdf._pool_render is not quebrado
+    assert not layout_pdf._pool_render._broken
+
+
+def test_pool_que_quebra_de_novo_termina_no_processo(sem_pool, monkeypatch):
+    monkeypatch.setenv('PID_TESTE', str(os.getpid()))
+    monkeypatch.setattr(layout_pdf, 'renderizar_shard', morrer_no_filho)
+    esperado = b''.join(gerar_pdf_incremental(etiquetas(), 'termica', workers=1))
+
+    assert pdf(workers=2) == esperado